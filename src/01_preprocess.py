@@ -1,92 +1,325 @@
 # src/01_preprocess.py
 
+import glob
 import pandas as pd
-from utils import calc_work_hours
+from pathlib import Path
+from utils import FLOW_MAP, calc_work_hours_array, calendar_params
+from cache import has_parquet, file_digest, params_digest, load_frame, save_frame, source_prefix
+from profiling import profile_stage
+from sources import is_multi_source, resolve_sources, preprocess_sources
+from result_writer import FORMATS, OVERSIZE_MODES, configure_output, write_result
 
-def preprocess_data(data_path: str) -> pd.DataFrame:
+# 预处理逻辑变更时递增，使旧缓存失效
+PREPROCESS_VERSION = 2
+
+TIME_COLS = ["dUPDATE_TIME", "dNODE_TIME", "dPROC_TIME"]
+
+# 紧凑列类型：字符串 ID / 工序名 -> 类别型，编号与状态码 -> 最小整数类型
+CATEGORY_COLS = ["sARCH_ID", "sBatch_number", "工序"]
+SMALL_INT_COLS = ["iFLOW_NODE_NO", "iNODE_STATUS", "iUSER_ID"]
+
+def preprocess_params() -> dict:
     """"
-    读取并预处理原始数据，返回可分析的 DataFrame
+    影响预处理结果的全部参数（缓存键的一部分）
+    """
+    return {
+        "version": PREPROCESS_VERSION,
+        "time_cols": TIME_COLS,
+        "flow_map": FLOW_MAP,
+        "category_cols": CATEGORY_COLS,
+        "small_int_cols": SMALL_INT_COLS,
+        "calendar": calendar_params(),
+    }
+
+def dataset_key(data_path: str) -> str:
+    """"
+    数据集版本：源文件内容哈希 + 预处理参数哈希
+    同时用作预处理缓存的文件名与聚合表记忆化的键
+    """
+    return params_digest({
+        "source": file_digest(data_path),
+        "params": preprocess_params(),
+    })[:16]
+
+def cache_path_for(data_path: str, cache_dir: str | None = None, key: str | None = None) -> Path:
+    """"
+    源文件对应的缓存路径：<cache_dir>/<源文件前缀>_<数据集版本>.parquet（前缀见 cache.source_prefix）
+    """
+    data_path = Path(data_path)
+    cache_dir = Path(cache_dir) if cache_dir else data_path.parent / ".cache"
+    key = key or dataset_key(data_path)
+    return cache_dir / f"{source_prefix(data_path)}_{key}.parquet"
+
+def _stale_cache_pattern(data_path: str) -> str:
+    """"
+    同一源文件的旧缓存（数据集版本不同）的文件名模式
+
+    版本固定为 16 位十六进制：data.csv 的模式不会匹配 data_2020.csv 等前缀相同的源文件的缓存
+    """
+    return f"{glob.escape(source_prefix(data_path))}_{'[0-9a-f]' * 16}.parquet"
+
+def memory_footprint(df: pd.DataFrame) -> int:
+    """DataFrame 实际占用的内存（字节，含字符串对象）"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def apply_compact_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """"
+    转换为紧凑列类型
+
+    类别的取值按字典序排列，与原来 object 列的 groupby / pivot / sort 顺序一致；
+    按类别列分组时需要指定 observed=True
+    """
+    for col in CATEGORY_COLS:
+        df[col] = df[col].astype("category")
+
+    # 含缺失值的列无法转为整数，保持原类型
+    for col in SMALL_INT_COLS:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+
+    return df
+
+def _preprocess_frame(df: pd.DataFrame, report_memory: bool = False,
+                      compact: bool = True) -> pd.DataFrame:
+    """"
+    对原始记录做预处理（时间转换、工序映射、工时计算、辅助字段）
+
+    compact: 是否转换为紧凑列类型（分块处理时各块的类别不一致，不做转换）
     """
-    # 1. 读取数据
-    df = pd.read_excel(data_path)
-    
     # 2. 时间字段统一转换
-    time_cols = ["dUPDATE_TIME", "dNODE_TIME", "dPROC_TIME"]
-    for col in time_cols:
+    for col in TIME_COLS:
         df[col] = pd.to_datetime(df[col], errors="coerce")
     
     # 3. 工序编号 -> 中文名称
-    flow_map = {
-        1: "扫描",
-        2: "图像处理",
-        3: "自检全检",
-        4: "PDF处理"
-    }
-    df["工序"] = df["iFLOW_NODE_NO"].map(flow_map)
+    df["工序"] = df["iFLOW_NODE_NO"].map(FLOW_MAP)
 
     # 4. 计算每条记录的工序有效时长
-    df["work_hours"] = df.apply(
-        lambda row: calc_work_hours(
-            row["dUPDATE_TIME"],
-            row["dNODE_TIME"]
-        ),
-        axis=1
-    )
-
-    # 5. 常用分析辅助字段
-    df["finish_date"] = df["dNODE_TIME"].dt.date
+    with profile_stage("calc_work_hours_array") as stage:
+        df["work_hours"] = calc_work_hours_array(
+            df["dUPDATE_TIME"],
+            df["dNODE_TIME"],
+            operators=df["iUSER_ID"]
+        )
+        stage.rows_in = stage.rows_out = len(df)
+
+    # 5. 常用分析辅助字段（完成日期为当天 00:00 的 datetime64，而非 Python date 对象）
+    df["finish_date"] = df["dNODE_TIME"].dt.normalize()
     df["is_rework"] = df["iNODE_STATUS"] == 5
     df["is_finished"] = df["iNODE_STATUS"].isin([2, 5])
 
+    # 6. 紧凑列类型
+    if not compact:
+        return df
+    if report_memory:
+        before = memory_footprint(df)
+    df = apply_compact_schema(df)
+    if report_memory:
+        after = memory_footprint(df)
+        print(f"内存占用: {before / 2**20:.2f} MB -> {after / 2**20:.2f} MB")
+
+    return df
+
+@profile_stage("read_source")
+def _read_source(data_path: str) -> pd.DataFrame:
+    """读取整个源文件（.csv 或 Excel）"""
+    if Path(data_path).suffix.lower() == ".csv":
+        return pd.read_csv(data_path)
+    return pd.read_excel(data_path)
+
+def iter_raw_chunks(data_path: str, chunk_size: int = 100_000):
+    """"
+    按块读取源文件，每次产出不超过 chunk_size 行的原始 DataFrame
+
+    .xlsx 使用 openpyxl 只读模式逐行迭代（与 pd.read_excel 一样只读第一个工作表），
+    .csv 使用 pandas 的分块读取；内存占用只与块大小有关，与文件大小无关
+    """
+    if Path(data_path).suffix.lower() == ".csv":
+        yield from pd.read_csv(data_path, chunksize=chunk_size)
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(data_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        buffer = []
+        for row in rows:
+            # 跳过空行
+            if all(v is None for v in row):
+                continue
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+def iter_preprocessed_chunks(data_path: str, chunk_size: int = 100_000):
+    """"
+    流式预处理：逐块做与 preprocess_data 相同的时间转换、工序映射与工时计算
+    """
+    for chunk in iter_raw_chunks(data_path, chunk_size):
+        yield _preprocess_frame(chunk, compact=False)
+
+@profile_stage("combine_frames")
+def combine_frames(frames: list) -> pd.DataFrame:
+    """"
+    合并多个源文件预处理后的 DataFrame（按给定顺序），去掉重叠导出中重复的记录
+
+    - 类别列统一为全部取值按字典序排列的类别，与单个文件预处理的结果一致
+    - 重复记录：所有列都相同的记录。同一文件内本来就有的重复保留，
+      即某条记录在各文件中分别出现 k1、k2 ... 次时，合并后出现 max(k1, k2, ...) 次
+    """
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return pd.DataFrame()
+
+    for col in CATEGORY_COLS:
+        categories = sorted(set().union(*(df[col].cat.categories for df in frames)))
+        for df in frames:
+            df[col] = df[col].cat.set_categories(categories)
+
+    columns = list(frames[0].columns)
+    for df in frames:
+        df["_occurrence"] = df.groupby(columns, sort=False, dropna=False, observed=True).cumcount()
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset=columns + ["_occurrence"], keep="first", ignore_index=True)
+    df = df.drop(columns="_occurrence")
+
+    # 各文件的整数列可能下转为不同的类型
+    for col in SMALL_INT_COLS:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+def _preprocess_many(data_path: str, use_cache: bool, cache_dir: str | None,
+                     report_memory: bool, jobs: int | None) -> pd.DataFrame:
+    """目录 / 通配符：各文件并行预处理后合并去重"""
+    results = preprocess_sources(resolve_sources(data_path), use_cache, cache_dir, jobs)
+    df = combine_frames([frame for _, frame in results])
+    if report_memory:
+        print(f"内存占用: {memory_footprint(df) / 2**20:.2f} MB（{len(results)} 个文件合并后）")
+
+    df.attrs["dataset_version"] = params_digest({
+        "sources": [key for key, _ in results],
+        "version": PREPROCESS_VERSION,
+    })[:16]
+    df.attrs["source_prefix"] = source_prefix(data_path)
+    return df
+
+@profile_stage("preprocess_data")
+def preprocess_data(data_path: str, use_cache: bool = True, cache_dir: str | None = None,
+                    report_memory: bool = False, jobs: int | None = None) -> pd.DataFrame:
+    """"
+    读取并预处理原始数据，返回可分析的 DataFrame
+
+    data_path: 源文件，或目录 / 通配符（多个导出文件，见 sources.py）
+    use_cache: 是否使用列式缓存（按源文件内容 + 预处理参数的哈希命名，
+               源文件或 utils 中的工序/工作时间定义变化后自动失效；多个文件时逐个缓存）
+    report_memory: 打印紧凑列类型转换前后的内存占用（命中缓存时只打印当前占用）
+    jobs: 多个文件时的预处理进程数（默认 CPU 核数）
+    """
+    if is_multi_source(data_path):
+        return _preprocess_many(data_path, use_cache, cache_dir, report_memory, jobs)
+
+    key = dataset_key(data_path)
+
+    cache_path = None
+    if use_cache and has_parquet():
+        cache_path = cache_path_for(data_path, cache_dir, key)
+        cached = load_frame(cache_path)
+        if cached is not None:
+            cached.attrs["dataset_version"] = key
+            cached.attrs["source_prefix"] = source_prefix(data_path)
+            if report_memory:
+                print(f"内存占用: {memory_footprint(cached) / 2**20:.2f} MB（缓存）")
+            return cached
+
+    # 1. 读取数据
+    df = _read_source(data_path)
+    df = _preprocess_frame(df, report_memory=report_memory)
+
+    if cache_path is not None:
+        save_frame(df, cache_path, stale_pattern=_stale_cache_pattern(data_path))
+
+    df.attrs["dataset_version"] = key
+    df.attrs["source_prefix"] = source_prefix(data_path)
     return df
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="预处理并输出 preprocessed_data_analysis")
+    parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径（也可以是目录或通配符）")
+    parser.add_argument("--output-format", choices=FORMATS, default="xlsx",
+                        help="输出格式（默认 xlsx；parquet / csv 时每个工作表一个文件）")
+    parser.add_argument("--oversize", choices=OVERSIZE_MODES, default="split",
+                        help="超过 Excel 行数上限的工作表：拆分（默认）或报错")
+    parser.add_argument("--calendar", default=None,
+                        help="排班配置文件（JSON，见 calendars.py；默认使用 utils.py 的固定工作日历）")
+    args = parser.parse_args()
+    configure_output(fmt=args.output_format, oversize=args.oversize)
+    if args.calendar:
+        from calendars import configure_calendar
+        try:
+            configure_calendar(args.calendar)
+        except ValueError as e:
+            parser.error(str(e))
+
      # 手动运行时用于检查
-    df_clean = preprocess_data("data/data.xlsx")
+    df_clean = preprocess_data(args.data, report_memory=True)
     
     # 创建输出文件路径
     output_file = "result/preprocessed_data_analysis.xlsx"
     
-    # 使用ExcelWriter创建多个工作表
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        # 1. 完整的预处理数据
-        df_clean.to_excel(writer, sheet_name='预处理数据', index=False)
-        
-        # 2. 工序分布统计
-        flow_stats = df_clean["工序"].value_counts().reset_index()
-        flow_stats.columns = ['工序', '数量']
-        flow_stats.to_excel(writer, sheet_name='工序分布', index=False)
-        
-        # 3. 工作时长统计
-        work_hours_stats = df_clean["work_hours"].describe().reset_index()
-        work_hours_stats.columns = ['统计项', '数值']
-        work_hours_stats.to_excel(writer, sheet_name='工作时长统计', index=False)
-        
-        # 4. 状态分布
-        status_stats = df_clean["iNODE_STATUS"].value_counts().reset_index()
-        status_stats.columns = ['状态码', '数量']
-        status_stats.to_excel(writer, sheet_name='状态分布', index=False)
-        
-        # 5. 返工和完成情况
-        summary_stats = pd.DataFrame({
-            '项目': ['返工记录', '非返工记录', '已完成记录', '未完成记录'],
-            '数量': [
-                df_clean["is_rework"].sum(),
-                (~df_clean["is_rework"]).sum(),
-                df_clean["is_finished"].sum(),
-                (~df_clean["is_finished"]).sum()
-            ]
-        })
-        summary_stats.to_excel(writer, sheet_name='汇总统计', index=False)
-        
-        # 6. 按工序的详细统计
-        flow_detail = df_clean.groupby('工序').agg({
-            'work_hours': ['count', 'mean', 'std', 'min', 'max'],
-            'is_rework': 'sum',
-            'is_finished': 'sum'
-        }).round(4)
-        flow_detail.columns = ['记录数', '平均工时', '工时标准差', '最小工时', '最大工时', '返工数', '完成数']
-        flow_detail.to_excel(writer, sheet_name='按工序统计')
+    # 多个工作表（逐行写出，超过 Excel 行数上限的工作表拆分，见 result_writer.py）
+    sheets = {}
+
+    # 1. 完整的预处理数据
+    sheets['预处理数据'] = df_clean
+
+    # 2. 工序分布统计
+    flow_stats = df_clean["工序"].value_counts().reset_index()
+    flow_stats.columns = ['工序', '数量']
+    sheets['工序分布'] = flow_stats
+
+    # 3. 工作时长统计
+    work_hours_stats = df_clean["work_hours"].describe().reset_index()
+    work_hours_stats.columns = ['统计项', '数值']
+    sheets['工作时长统计'] = work_hours_stats
+
+    # 4. 状态分布
+    status_stats = df_clean["iNODE_STATUS"].value_counts().reset_index()
+    status_stats.columns = ['状态码', '数量']
+    sheets['状态分布'] = status_stats
+
+    # 5. 返工和完成情况
+    summary_stats = pd.DataFrame({
+        '项目': ['返工记录', '非返工记录', '已完成记录', '未完成记录'],
+        '数量': [
+            df_clean["is_rework"].sum(),
+            (~df_clean["is_rework"]).sum(),
+            df_clean["is_finished"].sum(),
+            (~df_clean["is_finished"]).sum()
+        ]
+    })
+    sheets['汇总统计'] = summary_stats
+
+    # 6. 按工序的详细统计
+    flow_detail = df_clean.groupby('工序', observed=True).agg({
+        'work_hours': ['count', 'mean', 'std', 'min', 'max'],
+        'is_rework': 'sum',
+        'is_finished': 'sum'
+    }).round(4)
+    flow_detail.columns = ['记录数', '平均工时', '工时标准差', '最小工时', '最大工时', '返工数', '完成数']
+    sheets['按工序统计'] = flow_detail.reset_index()
+
+    output_file = write_result(sheets, output_file)
     
     print(f"数据已成功输出到: {output_file}")
     print(f"包含以下工作表:")
@@ -1,9 +1,17 @@
 # src/02_task1_statistics.py
 
+import argparse
+import numpy as np
 import pandas as pd
 import importlib.util
 import os
-from utils import calc_work_hours
+from pathlib import Path
+from aggregates import get_aggregate, batch_time_table
+from cube import ArchiveCube
+from archive_index import FLOW_BITS, ALL_FLOWS_MASK, build_archive_index, flows_in_mask
+from segments import as_segments
+from profiling import profile_stage
+from result_writer import FORMATS, OVERSIZE_MODES, configure_output, concurrent_writes, submit_result
 
 # 动态导入 01_preprocess.py 模块
 spec = importlib.util.spec_from_file_location("preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py"))
@@ -11,364 +19,460 @@ preprocess_module = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(preprocess_module)
 preprocess_data = preprocess_module.preprocess_data
 
-df = preprocess_data("data/data.xlsx")
 
-"""
-开始 1.1 
-"""
-# 1. 只保留“完成的工序记录”
-df_finished = df[df["is_finished"]].copy()
-
-# 2. 找出“完成四道工序的案卷”
-
-# 2.1 按案卷 + 工序去重
-arch_flow = (
-    df_finished
-    .groupby(["sARCH_ID", "工序"])
-    .size()
-    .reset_index(name="cnt")
-)
-
-# 2.2 统计每个案卷完成了多少种工序
-flow_count = (
-    arch_flow
-    .groupby("sARCH_ID")["工序"]
-    .nunique()
-    .reset_index(name="flow_num")
-)
-
-# 2.3 只保留完成 4 道工序的案卷
-completed_archives = flow_count[flow_count["flow_num"] == 4]["sARCH_ID"]
+@profile_stage("save_table")
+def save_table(table: pd.DataFrame, file_name: str, output_dir: str = "result") -> Path:
+    """"
+    保存结果表到 result/ 目录（题目明确要求）
 
-# --- 任务 1.1 完成四道工序的案卷数量
-num_completed_archives = completed_archives.nunique()
-
-# 3. 汇总每个案卷 × 工序的开始 / 结束时间
-
-# 3.1 只保留“完成四道工序”的案卷
-df_valid = df_finished[df_finished["sARCH_ID"].isin(completed_archives)]
+    格式与超行处理见 result_writer.configure_output；在 concurrent_writes() 中
+    由进程池写出，返回时可能尚未写完。返回结果路径（后缀为输出格式）
+    """
+    return submit_result(table, Path(output_dir) / file_name)
 
 
 """
-这一步解决了：“同一案卷 + 同一工序多条记录怎么办？”
-> 用 最早开始 + 最晚结束
+开始 1.1
 """
-# 3.2 对每个案卷 × 工序汇总时间
-flow_time_summary = (
-    df_valid
-    .groupby(["sARCH_ID", "工序"])
-    .agg(
-        start_time=("dUPDATE_TIME", "min"),
-        end_time=("dNODE_TIME", "max")
+@profile_stage("find_completed_archives")
+def find_completed_archives(archive_index: pd.DataFrame) -> pd.Series:
+    """"
+    找出“完成四道工序的案卷”：案卷状态索引中完成工序掩码四位全为 1
+
+    archive_index: 案卷状态索引（见 archive_index.build_archive_index）
+    """
+    completed = archive_index.index[archive_index["flow_mask"] == ALL_FLOWS_MASK]
+    return pd.Series(completed, name="sARCH_ID")
+
+def _completed_rows(archive_index: pd.DataFrame, completed_archives: pd.Series) -> pd.DataFrame:
+    return archive_index[archive_index.index.isin(completed_archives)]
+
+@profile_stage("task1_1")
+def calc_task1_1_archive_flow_table(archive_index: pd.DataFrame, completed_archives: pd.Series) -> pd.DataFrame:
+    """"
+    表 1：完成四道工序的案卷 × 工序开始 / 结束时间 + 案卷完成时长
+
+    每个案卷 × 工序的时间已在索引中汇总好：
+    “同一案卷 + 同一工序多条记录怎么办？” > 用 最早开始 + 最晚结束
+    """
+    # 1. 只保留“完成四道工序”的案卷
+    completed = _completed_rows(archive_index, completed_archives)
+
+    # 2. 宽表（表 1）：列顺序与按工序名透视一致 —— 先全部开始时间，再全部结束时间
+    flows = sorted(FLOW_BITS) if len(completed) else []
+    time_cols = (
+        [f"{flow}_start_time" for flow in flows]
+        + [f"{flow}_end_time" for flow in flows]
+    )
+    table = completed[time_cols].reset_index()
+
+    # 3. 案卷完成时长（任务 1.1 的核心）：只算 3 个工序的工时
+    # 按 案卷 × 工序名 的顺序分组求和，与逐工序汇总再相加的结果逐位一致
+    valid_flows = ["扫描", "图像处理", "自检全检"]
+    hour_cols = [f"{flow}_work_hours" for flow in sorted(valid_flows)]
+    archive_hours = (
+        completed[hour_cols]
+        .stack()
+        .groupby(level=0, sort=False, observed=True)
+        .sum()
     )
-    .reset_index()
-)
+    table["完成时长"] = archive_hours.round(3).to_numpy()
 
-# 4. 把“长表”变成题目要求的“宽表（表 1）
+    return table
 
-# 4.1 透视成宽表
-table = flow_time_summary.pivot(
-    index="sARCH_ID",
-    columns="工序",
-    values=["start_time", "end_time"]
-)
+"""
+开始1.2
+"""
+def completed_archive_records(df: pd.DataFrame, completed_archives: pd.Series) -> pd.DataFrame:
+    """"
+    完成四道工序的案卷的全部记录（含未完成状态的记录）
+    """
+    return df[df["sARCH_ID"].isin(completed_archives)]
 
-# 4.2 整理列名（为了导 Excel 和写报告）
-table.columns = [
-    f"{flow}_{t}"
-    for t, flow in table.columns
-]
+@profile_stage("task1_2")
+def calc_task1_2_rework_table(archive_index: pd.DataFrame, completed_archives: pd.Series):
+    """"
+    表 2：返工案卷 × 工序的返工时间
 
-table = table.reset_index()
+    返工时间 = dPROC_TIME；一个工序有多次返工时取最早（已在索引中汇总）
+    返回 (表 2, 返工案卷占比 %)
+    """
+    completed = _completed_rows(archive_index, completed_archives)
 
-# 5. 计算案卷完成时长（任务 1.1 的核心）
+    # 1. 找出返工案卷（案卷级）
+    rework = completed[completed["has_rework"]]
 
-# 5.1 先算“工序级耗时”（只算 3 个工序）
-valid_flows = ["扫描", "图像处理", "自检全检"]
+    # 2. 计算返工案卷占比
+    rework_ratio = len(rework) / len(completed_archives) * 100
+    rework_ratio = round(rework_ratio, 3)
 
-flow_hours = (
-    df_valid[df_valid["工序"].isin(valid_flows)]
-    .groupby(["sARCH_ID", "工序"])["work_hours"]
-    .sum()
-    .reset_index()
-)
+    # 3. 构造题目要求的「表 2」：只保留有已知工序返工的案卷，列为出现过返工的工序
+    rework = rework[rework["rework_mask"] != 0]
+    flows = flows_in_mask(int(np.bitwise_or.reduce(rework["rework_mask"].to_numpy(), initial=0)))
 
-# 5.2 汇总为“案卷完成时长”
-archive_hours = (
-    flow_hours
-    .groupby("sARCH_ID")["work_hours"]
-    .sum()
-    .reset_index(name="完成时长")
-)
+    table2 = rework[[f"{flow}_rework_time" for flow in flows]]
+    table2.columns = pd.Index(flows, name="工序")
 
-archive_hours["完成时长"] = archive_hours["完成时长"].round(3)
+    return table2.reset_index(), rework_ratio
 
 """
-这一步结束，已经得到了 完整的表 1
+开始 1.3
 """
-# 5.3 合并回表 1
-result_table = table.merge(
-    archive_hours,
-    on="sARCH_ID",
-    how="left"
-)
+@profile_stage("task1_3")
+def calc_task1_3_inspection_rework_table(df_completed: pd.DataFrame) -> pd.DataFrame:
+    """"
+    表 3：自检全检工序各操作人员的返工案卷占比
+
+    df_completed: 完成四道工序的案卷的全部记录，或只含这些案卷的立方体
+                  （即 get_aggregate(df, "cube").restrict(archives=completed_archives)）
+    """
+    if isinstance(df_completed, ArchiveCube):
+        # 立方体：人员维度上卷，案卷集合求并后计数
+        cube_check = df_completed.restrict({"工序": "自检全检"})
+        total_archives = cube_check.agg(["iUSER_ID"], total_archives=("sARCH_ID", "nunique"))
+        rework_archives = cube_check.agg(
+            ["iUSER_ID"], where="is_rework", rework_archives=("sARCH_ID", "nunique")
+        )
+    else:
+        # 1. 只取「自检全检」工序的数据
+        df_check = df_completed[df_completed["工序"] == "自检全检"].copy()
+
+        # 2. 计算每个操作人员的“自检全检案卷总数”
+        total_archives = (
+            df_check
+            .groupby("iUSER_ID")["sARCH_ID"]
+            .nunique()
+            .reset_index(name="total_archives")
+        )
+
+        # 3. 计算每个操作人员的“返工案卷数”
+        rework_archives = (
+            df_check[df_check["is_rework"]]
+            .groupby("iUSER_ID")["sARCH_ID"]
+            .nunique()
+            .reset_index(name="rework_archives")
+        )
+
+    # 4. 合并并计算返工占比
+    result = total_archives.merge(
+        rework_archives,
+        on="iUSER_ID",
+        how="left"
+    )
 
-# 6. 找出完成时长最长的 3 个案卷
-top3 = (
-    result_table
-    .sort_values("完成时长", ascending=False)
-    .head(3)
-)
+    # 没有返工的人员，返工数为 0
+    result["rework_archives"] = result["rework_archives"].fillna(0)
 
+    result["返工案卷占比 (%)"] = (
+        result["rework_archives"] / result["total_archives"] * 100
+    ).round(3)
 
-""""
-在这一步已经完成了1.1
-"""
-# 7. 保存结果（题目明确要求）
-result_table.to_excel(
-    "result/result1_1.xlsx",
-    index=False
-)
+    # 5. 排序并输出表 3
+    result_sorted = result.sort_values(
+        "返工案卷占比 (%)",
+        ascending=False
+    )
 
-"""
-开始1.2
-"""
+    return result_sorted[["iUSER_ID", "返工案卷占比 (%)"]]
 
-# 1. 找出返工案卷（案卷级）
-# 只看完成四道工序的案卷
-df_completed = df[df["sARCH_ID"].isin(completed_archives)]
+""""
+开始 1.4
+"""
+@profile_stage("task1_4")
+def calc_task1_4_process_hours_table(df_finished, batch_time: pd.DataFrame) -> pd.DataFrame:
+    """"
+    表 4：各工序完成案卷数量、总耗时与平均耗时
+
+    df_finished: 完成记录，或按工序开头排好序的 SortedSegments（即 get_aggregate(df, "flow_batch_segments")），
+                 或只含完成记录的立方体（get_aggregate(df, "cube").finished()）
+    batch_time: 「工序 + 批次」时间表（即 get_aggregate(df, "batch_time")）
+    """
+    # 2. 统计每个工序完成案卷数量
+    archive_count = as_segments(df_finished, ["工序"]).agg(
+        ["工序"],
+        完成案卷的数量=("sARCH_ID", "nunique")
+    )
 
-# 案卷级是否返工
-rework_archives = (
-    df_completed[df_completed["is_rework"]]
-    ["sARCH_ID"]
-    .unique()
-)
+    # 4. 按工序汇总“总耗时”
+    total_hours = (
+        batch_time
+        .groupby("工序", observed=True)["batch_hours"]
+        .sum()
+        .reset_index(name="总耗时 (h)")
+    )
 
-num_rework_archives = len(rework_archives)
+    total_hours["总耗时 (h)"] = total_hours["总耗时 (h)"].round(3)
 
-# 2. 计算返工案卷占比
-rework_ratio = num_rework_archives / len(completed_archives) * 100
-rework_ratio = round(rework_ratio, 3)
+    # 5. 合并并计算平均耗时
+    result = archive_count.merge(
+        total_hours,
+        on="工序",
+        how="left"
+    )
 
-# ---- 构造题目要求的「表 2」 ----
-# 3. 只保留返工案卷的记录
-df_rework = df_completed[df_completed["sARCH_ID"].isin(rework_archives)]
+    result["平均耗时 (h/卷)"] = (
+        result["总耗时 (h)"] / result["完成案卷的数量"]
+    ).round(3)
 
-# 4. 提取“返工工序 + 返工时间”
+    # 6. 整理表 4
+    return result[[
+        "工序",
+        "完成案卷的数量",
+        "总耗时 (h)",
+        "平均耗时 (h/卷)"
+    ]]
 
 """
-返工时间 = dPROC_TIME
-一个工序 最多只保留一次返工时间
-如果有多次返工 → 取最早（稳妥）
+开始 1.5
 """
-rework_summary = (
-    df_rework[df_rework["is_rework"]]
-    .groupby(["sARCH_ID", "工序"])
-    .agg(
-        rework_time=("dPROC_TIME", "min")
+@profile_stage("task1_5")
+def calc_task1_5_user_process_hours_table(df_finished, user_batch_time: pd.DataFrame) -> pd.DataFrame:
+    """"
+    表 5：人员 × 工序的完成案卷数量、工作时长与平均耗时
+
+    df_finished: 完成记录，或按 人员 × 工序 开头排好序的 SortedSegments（即 get_aggregate(df, "user_flow_batch_segments")），
+                 或只含完成记录的立方体
+    user_batch_time: 「人员 × 工序 × 批次」时间表（即 get_aggregate(df, "user_batch_time")）
+    """
+    # 2. 计算「人员 × 工序」完成案卷数量
+    archive_count = as_segments(df_finished, ["iUSER_ID", "工序"]).agg(
+        ["iUSER_ID", "工序"],
+        完成案卷的数量=("sARCH_ID", "nunique")
     )
-    .reset_index()
-)
-
-# 5. 变成“案卷 × 工序”的宽表
-table2 = rework_summary.pivot(
-    index="sARCH_ID",
-    columns="工序",
-    values="rework_time"
-).reset_index()
-
-# 6. 保存 result1_2.xlsx
-table2.to_excel(
-    "result/result1_2.xlsx",
-    index=False
-)
 
-"""
-开始 1.3
-"""
+    # 4. 汇总为「人员 × 工序」工作时长
+    work_time = (
+        user_batch_time
+        .groupby(["iUSER_ID", "工序"], observed=True)["batch_hours"]
+        .sum()
+        .reset_index(name="工作时长 (h)")
+    )
 
-# 1. 只取「自检全检」工序的数据
-df_check = df_completed[df_completed["工序"] == "自检全检"].copy()
-
-# 2. 计算每个操作人员的“自检全检案卷总数”
-total_archives = (
-    df_check
-    .groupby("iUSER_ID")["sARCH_ID"]
-    .nunique()
-    .reset_index(name="total_archives")
-)
-
-# 3. 计算每个操作人员的“返工案卷数”
-rework_archives = (
-    df_check[df_check["is_rework"]]
-    .groupby("iUSER_ID")["sARCH_ID"]
-    .nunique()
-    .reset_index(name="rework_archives")
-)
-
-# 4. 合并并计算返工占比
-result = total_archives.merge(
-    rework_archives,
-    on="iUSER_ID",
-    how="left"
-)
-
-# 没有返工的人员，返工数为 0
-result["rework_archives"] = result["rework_archives"].fillna(0)
-
-result["返工案卷占比 (%)"] = (
-    result["rework_archives"] / result["total_archives"] * 100
-).round(3)
-
-# 5. 排序并输出表 3
-result_sorted = result.sort_values(
-    "返工案卷占比 (%)",
-    ascending=False
-)
-
-table3 = result_sorted[["iUSER_ID", "返工案卷占比 (%)"]]
-
-table3.to_excel(
-    "result/result1_3.xlsx",
-    index=False
-)
+    work_time["工作时长 (h)"] = work_time["工作时长 (h)"].round(3)
 
-""""
-开始 1.4
-"""
+    # 5. 合并并计算平均耗时
+    result = archive_count.merge(
+        work_time,
+        on=["iUSER_ID", "工序"],
+        how="left"
+    )
+
+    result["每个案卷的平均耗时 (h/卷)"] = (
+        result["工作时长 (h)"] / result["完成案卷的数量"]
+    ).round(3)
 
-# 1. 先只保留“完成记录”
-df_f = df[df["is_finished"]].copy()
-
-# 2. 统计每个工序完成案卷数量
-archive_count = (
-    df_f
-    .groupby("工序")["sARCH_ID"]
-    .nunique()
-    .reset_index(name="完成案卷的数量")
-)
-
-# 3. 按「工序 + 批次」计算批次耗时（核心）
-
-# 3.1 先聚合出批次时间区间
-batch_time = (
-    df_f
-    .groupby(["工序", "sBatch_number"])
-    .agg(
-        batch_start=("dUPDATE_TIME", "min"),
-        batch_end=("dNODE_TIME", "max")
+    # 6. 排序
+    return result.sort_values(
+        by=["iUSER_ID", "工序"]
     )
-    .reset_index()
-)
-
-# 3.2 对每个批次计算“有效工作时长”
-batch_time["batch_hours"] = batch_time.apply(
-    lambda row: calc_work_hours(
-        row["batch_start"],
-        row["batch_end"]
-    ),
-    axis=1
-)
-
-# 4. 按工序汇总“总耗时”
-total_hours = (
-    batch_time
-    .groupby("工序")["batch_hours"]
-    .sum()
-    .reset_index(name="总耗时 (h)")
-)
-
-total_hours["总耗时 (h)"] = total_hours["总耗时 (h)"].round(3)
-
-# 5. 合并并计算平均耗时
-result = archive_count.merge(
-    total_hours,
-    on="工序",
-    how="left"
-)
-
-result["平均耗时 (h/卷)"] = (
-    result["总耗时 (h)"] / result["完成案卷的数量"]
-).round(3)
-
-# 6. 整理并保存 result1_4.xlsx
-table4 = result[[
-    "工序",
-    "完成案卷的数量",
-    "总耗时 (h)",
-    "平均耗时 (h/卷)"
-]]
-
-table4.to_excel(
-    "result/result1_4.xlsx",
-    index=False
-)
 
+
+# ======================
+# 任务 1 全部结果表
+# ======================
+@profile_stage("task1")
+def calc_task1_tables(df: pd.DataFrame):
+    """"
+    基于完整的预处理结果计算表 1 ~ 表 5
+
+    返回 ({文件名: 结果表}, 返工案卷占比 %)
+    """
+    # 1.1 / 1.2 由案卷状态索引得到完成四道工序的案卷、表 1 与返工情况
+    archive_index = get_aggregate(df, "archive_index")
+    completed_archives = find_completed_archives(archive_index)
+    table1 = calc_task1_1_archive_flow_table(archive_index, completed_archives)
+    table2, rework_ratio = calc_task1_2_rework_table(archive_index, completed_archives)
+
+    # 1.3 只看完成四道工序的案卷
+    df_completed = completed_archive_records(df, completed_archives)
+    table3 = calc_task1_3_inspection_rework_table(df_completed)
+
+    # 1.4 / 1.5 完成记录只按键排序一次，案卷计数与批次时间表共用同一份排序
+    table4 = calc_task1_4_process_hours_table(
+        get_aggregate(df, "flow_batch_segments"), get_aggregate(df, "batch_time")
+    )
+    table5 = calc_task1_5_user_process_hours_table(
+        get_aggregate(df, "user_flow_batch_segments"), get_aggregate(df, "user_batch_time")
+    )
+
+    tables = {
+        "result1_1.xlsx": table1,
+        "result1_2.xlsx": table2,
+        "result1_3.xlsx": table3,
+        "result1_4.xlsx": table4,
+        "result1_5.xlsx": table5,
+    }
+    return tables, rework_ratio
+
+
+# ======================
+# 流式（分块）统计：可合并的部分聚合
+# ======================
 """
-开始 1.5
+每块只保留足以复原表 1 ~ 表 5 的“充分统计量”，块与块之间可以任意合并：
+- 按键再聚合一次（min / max / sum 均满足结合律）
+- 无聚合列的表只保留去重后的键（用于 nunique）
+最终把合并后的部分聚合当作“记录”交给上面的 calc_task1_* 函数，结果与一次性计算一致
 """
-# 1. 只保留完成记录
-df_f = df[df["is_finished"]].copy()
-
-# 2. 计算「人员 × 工序」完成案卷数量
-archive_count = (
-    df_f
-    .groupby(["iUSER_ID", "工序"])["sARCH_ID"]
-    .nunique()
-    .reset_index(name="完成案卷的数量")
-)
-
-# 3. 计算「人员 × 工序 × 批次」的批次时长（核心）
-
-# 3.1 聚合批次时间区间
-batch_time = (
-    df_f
-    .groupby(["iUSER_ID", "工序", "sBatch_number"])
-    .agg(
-        batch_start=("dUPDATE_TIME", "min"),
-        batch_end=("dNODE_TIME", "max")
+# 名称 -> (记录筛选, 分组键, {列: 聚合方式})
+TASK1_PARTIAL_SPECS = {
+    # 1.1 / 1.4：完成记录按 案卷 × 工序 的开始 / 结束时间与工时
+    "arch_flow": ("finished", ["sARCH_ID", "工序"],
+                  {"dUPDATE_TIME": "min", "dNODE_TIME": "max", "work_hours": "sum"}),
+    # 1.2：返工记录按 案卷 × 工序 的最早返工时间
+    "rework": ("rework", ["sARCH_ID", "工序"], {"dPROC_TIME": "min"}),
+    # 1.3：自检全检记录（不限状态）的 人员 × 案卷，以及是否返工过
+    "check": ("check", ["iUSER_ID", "sARCH_ID"], {"is_rework": "max"}),
+    # 1.4：完成记录按 工序 × 批次 的时间区间
+    "batch": ("finished", ["工序", "sBatch_number"], {"dUPDATE_TIME": "min", "dNODE_TIME": "max"}),
+    # 1.5：完成记录按 人员 × 工序 × 批次 的时间区间，以及去重的 人员 × 工序 × 案卷
+    "user_batch": ("finished", ["iUSER_ID", "工序", "sBatch_number"],
+                   {"dUPDATE_TIME": "min", "dNODE_TIME": "max"}),
+    "user_flow_arch": ("finished", ["iUSER_ID", "工序", "sARCH_ID"], {}),
+}
+
+def _reduce_partial(frame: pd.DataFrame, keys: list, aggs: dict) -> pd.DataFrame:
+    """"
+    按键聚合（保留缺失键，交给最终的 calc_task1_* 按原逻辑处理）
+    """
+    if not aggs:
+        return frame[keys].drop_duplicates(ignore_index=True)
+    return (
+        frame
+        .groupby(keys, dropna=False, observed=True)
+        .agg(aggs)
+        .reset_index()
     )
-    .reset_index()
-)
-
-# 3.2 计算每个批次的有效工作时长
-batch_time["batch_hours"] = batch_time.apply(
-    lambda row: calc_work_hours(
-        row["batch_start"],
-        row["batch_end"]
-    ),
-    axis=1
-)
-
-# 4. 汇总为「人员 × 工序」工作时长
-work_time = (
-    batch_time
-    .groupby(["iUSER_ID", "工序"])["batch_hours"]
-    .sum()
-    .reset_index(name="工作时长 (h)")
-)
-
-work_time["工作时长 (h)"] = work_time["工作时长 (h)"].round(3)
-
-# 5. 合并并计算平均耗时
-result = archive_count.merge(
-    work_time,
-    on=["iUSER_ID", "工序"],
-    how="left"
-)
-
-result["每个案卷的平均耗时 (h/卷)"] = (
-    result["工作时长 (h)"] / result["完成案卷的数量"]
-).round(3)
-
-# 6. 排序并保存 result1_5.xlsx
-table5 = result.sort_values(
-    by=["iUSER_ID", "工序"]
-)
-
-table5.to_excel(
-    "result/result1_5.xlsx",
-    index=False
-)
 
+def task1_partial_state(chunk: pd.DataFrame, specs: dict = TASK1_PARTIAL_SPECS) -> dict:
+    """"
+    单块预处理记录 -> 任务 1 的部分聚合
+
+    specs: 部分聚合定义，格式同 TASK1_PARTIAL_SPECS（可追加其他任务需要的统计量）
+    """
+    masks = {
+        "finished": chunk["is_finished"],
+        "rework": chunk["is_rework"],
+        "check": chunk["工序"] == "自检全检",
+    }
+    return {
+        name: _reduce_partial(chunk[masks[row_filter]], keys, aggs)
+        for name, (row_filter, keys, aggs) in specs.items()
+    }
+
+def merge_task1_states(*states: dict, specs: dict = TASK1_PARTIAL_SPECS) -> dict:
+    """"
+    合并多份部分聚合（顺序无关）
+    """
+    merged = {}
+    for name, (_, keys, aggs) in specs.items():
+        parts = [state[name] for state in states if state is not None]
+        merged[name] = _reduce_partial(pd.concat(parts, ignore_index=True), keys, aggs)
+    return merged
+
+@profile_stage("task1_from_state")
+def calc_task1_tables_from_state(state: dict):
+    """"
+    由合并后的部分聚合计算表 1 ~ 表 5，返回值同 calc_task1_tables
+    """
+    arch_flow = state["arch_flow"]
+
+    # 1.1 / 1.2 每个 案卷 × 工序 只剩一行（返工记录单独一行），建索引结果不变
+    archive_index = build_archive_index(pd.concat([
+        arch_flow.assign(is_rework=False),
+        state["rework"].assign(is_rework=True, work_hours=0.0),
+    ], ignore_index=True))
+    completed_archives = find_completed_archives(archive_index)
+    table1 = calc_task1_1_archive_flow_table(archive_index, completed_archives)
+    table2, rework_ratio = calc_task1_2_rework_table(archive_index, completed_archives)
+
+    # 1.3 自检全检的 人员 × 案卷
+    check = state["check"].assign(工序="自检全检")
+    check["is_rework"] = check["is_rework"].astype(bool)
+    check = completed_archive_records(check, completed_archives)
+    table3 = calc_task1_3_inspection_rework_table(check)
+
+    # 1.4 / 1.5 批次时间区间 -> 批次有效工时
+    batch_time = batch_time_table(state["batch"], ["工序", "sBatch_number"])
+    user_batch_time = batch_time_table(state["user_batch"], ["iUSER_ID", "工序", "sBatch_number"])
+    table4 = calc_task1_4_process_hours_table(arch_flow, batch_time)
+    table5 = calc_task1_5_user_process_hours_table(state["user_flow_arch"], user_batch_time)
+
+    tables = {
+        "result1_1.xlsx": table1,
+        "result1_2.xlsx": table2,
+        "result1_3.xlsx": table3,
+        "result1_4.xlsx": table4,
+        "result1_5.xlsx": table5,
+    }
+    return tables, rework_ratio
+
+@profile_stage("task1_streaming")
+def calc_task1_tables_streaming(data_path: str, chunk_size: int = 100_000):
+    """"
+    流式计算表 1 ~ 表 5：逐块读取、预处理并合并部分聚合，
+    内存占用取决于块大小和各统计键的去重数量，而不是文件大小
+    """
+    # 攒够若干块再合并一次，避免每块都对整个累计状态重新分组
+    merge_every = 8
+    state = None
+    pending = []
+    for chunk in preprocess_module.iter_preprocessed_chunks(data_path, chunk_size):
+        pending.append(task1_partial_state(chunk))
+        if len(pending) >= merge_every:
+            state = merge_task1_states(state, *pending)
+            pending = []
+
+    if state is None and not pending:
+        raise ValueError(f"数据文件为空: {data_path}")
+    if pending:
+        state = merge_task1_states(state, *pending)
+    return calc_task1_tables_from_state(state)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任务 1：统计表 1 ~ 表 5")
+    parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径（.xlsx / .csv）")
+    parser.add_argument("--stream", action="store_true", help="分块流式读取，适用于超出内存的大文件")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="流式读取时每块的行数")
+    parser.add_argument("--engine", choices=["pandas", "auto", "duckdb", "sqlite"], default="pandas",
+                        help="计算引擎：pandas（默认），或写入 DuckDB / SQLite 数据库文件后用 SQL 计算"
+                             "（auto 为已安装 DuckDB 时用 DuckDB）")
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB 的线程数（默认全部核）")
+    parser.add_argument("--output-format", choices=FORMATS, default="xlsx",
+                        help="结果表格式（默认 xlsx；parquet / csv 供下游系统读取）")
+    parser.add_argument("--oversize", choices=OVERSIZE_MODES, default="split",
+                        help="超过 Excel 行数上限的表：拆分到多个工作表（默认）或报错")
+    args = parser.parse_args()
+    configure_output(fmt=args.output_format, oversize=args.oversize)
+
+    if args.stream and args.engine != "pandas":
+        parser.error("--stream 只支持 pandas 引擎")
+
+    if args.stream:
+        tables, rework_ratio = calc_task1_tables_streaming(args.data, args.chunk_size)
+    elif args.engine != "pandas":
+        from sql_backend import calc_task1_tables_sql
+        tables, rework_ratio = calc_task1_tables_sql(
+            preprocess_data(args.data), engine=args.engine, threads=args.threads
+        )
+    else:
+        tables, rework_ratio = calc_task1_tables(preprocess_data(args.data))
+
+    with concurrent_writes():
+        for file_name, table in tables.items():
+            save_table(table, file_name)
+
+    result_table = tables["result1_1.xlsx"]
+    # --- 任务 1.1 完成四道工序的案卷数量
+    num_completed_archives = result_table["sARCH_ID"].nunique()
+
+    # 找出完成时长最长的 3 个案卷
+    top3 = (
+        result_table
+        .sort_values("完成时长", ascending=False)
+        .head(3)
+    )
+    print(f"完成四道工序的案卷数量: {num_completed_archives}")
+    print(f"完成时长最长的 3 个案卷: {top3['sARCH_ID'].tolist()}")
+    print(f"返工案卷占比: {rework_ratio}%")
@@ -1,12 +1,15 @@
 # src/03_task2_visualization.py
 
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 from pathlib import Path
 import importlib.util
 import os
 
-from utils import calc_work_hours   # 虽然 2.1 用不到，但后面 2.2 会用
+from aggregates import get_aggregate
+from archive_store import StoreQuery, records_for
+from profiling import profile_stage, timed_import
+from segments import as_segments
 
 
 # ======================
@@ -20,30 +23,46 @@ preprocess_module = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(preprocess_module)
 preprocess_data = preprocess_module.preprocess_data
 
+# 各图用到的列：df 为 archive_store.StoreQuery 时只读取这些列
+# （完成记录按 is_finished 筛选，批次 / 人员维度的排序键含 sBatch_number）
+TASK2_COLUMNS = {
+    "task2_1": ["finish_date", "工序", "sARCH_ID", "is_rework", "is_finished"],
+    "task2_2": ["工序", "sBatch_number", "dUPDATE_TIME", "dNODE_TIME", "is_finished"],
+    "task2_3": ["finish_date", "工序", "sARCH_ID", "is_rework", "is_finished"],
+    "task2_4": ["iUSER_ID", "工序", "sBatch_number", "sARCH_ID", "is_rework", "is_finished"],
+}
+
 
 # ======================
 # Task 2.1
 # ======================
-def plot_task2_1_daily_finished_count(df):
+@profile_stage("task2_1")
+def plot_task2_1_daily_finished_count(df, df_finished=None):
     """
     每天 × 工序 完成案卷数量（簇状柱状图）
     输出：result/figures/task2_1.png
-    """
 
-    # ---------- Step 1：只保留完成记录 ----------
-    df_finished = df[df["is_finished"]].copy()
+    df: 预处理后的记录，或 archive_store.StoreQuery（只读取日期范围内的分区与本图用到的列）
+    df_finished: 可选，已筛选好的完成记录，或按 完成日期 × 工序 × 案卷 排好序的 SortedSegments
+                 （多个任务共用时传入），或只含完成记录的立方体（cube.ArchiveCube.finished()）
+    """
+    # 作图库按需导入：只生成结果表时不加载 matplotlib
+    plt = timed_import("matplotlib.pyplot")
 
-    # ---------- Step 2：提取完成日期 ----------
-    # 使用完成节点时间 dNODE_TIME
-    df_finished["date"] = df_finished["dNODE_TIME"].dt.date
+    # ---------- Step 1：只保留完成记录（按 完成日期 × 工序 × 案卷 排序一次） ----------
+    if df_finished is None:
+        df_finished = get_aggregate(
+            records_for(df, TASK2_COLUMNS["task2_1"]), "daily_flow_archive_segments"
+        )
+    segments = as_segments(df_finished, ["finish_date", "工序", "sARCH_ID"])
 
-    # ---------- Step 3：按 日期 × 工序 统计完成案卷数 ----------
-    daily_count = (
-        df_finished
-        .groupby(["date", "工序"])["sARCH_ID"]
-        .nunique()
-        .reset_index(name="completed_cases")
+    # ---------- Step 2 ~ 3：按 完成日期 × 工序 统计完成案卷数 ----------
+    # 完成日期 finish_date 即完成节点时间 dNODE_TIME 所在的日期
+    daily_count = segments.agg(
+        ["finish_date", "工序"],
+        completed_cases=("sARCH_ID", "nunique")
     )
+    daily_count["date"] = daily_count["finish_date"].dt.date
 
     # ---------- Step 4：工序名称映射为英文（防乱码） ----------
     process_map = {
@@ -53,7 +72,8 @@ def plot_task2_1_daily_finished_count(df):
         "PDF处理": "PDF Generation"
     }
 
-    daily_count["Process"] = daily_count["工序"].map(process_map)
+    # 工序为类别型，先转为字符串，使透视后的列仍按英文名排序
+    daily_count["Process"] = daily_count["工序"].astype(str).map(process_map)
 
     # ---------- Step 5：转换为透视表 ----------
     pivot_data = (
@@ -77,45 +97,35 @@ def plot_task2_1_daily_finished_count(df):
     output_dir = Path("result/figures")
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    plt.savefig(
-        output_dir / "task2_1.png",
-        dpi=300,
-        bbox_inches="tight"
-    )
+    with profile_stage("task2_1.savefig"):
+        plt.savefig(
+            output_dir / "task2_1.png",
+            dpi=300,
+            bbox_inches="tight"
+        )
     plt.close()
 
 
 # ======================
 # Task 2.2
 # ======================
-def plot_task2_2_daily_workload(df):
+@profile_stage("task2_2")
+def plot_task2_2_daily_workload(df, batch_time=None):
     """
     每天 × 工序 投入工作量（人·小时）
     输出：result/figures/task2_2.png
-    """
 
-    # ---------- Step 1：只保留完成记录 ----------
-    df_finished = df[df["is_finished"]].copy()
-
-    # ---------- Step 2：按 工序 × 批次 聚合时间区间 ----------
-    batch_time = (
-        df_finished
-        .groupby(["工序", "sBatch_number"])
-        .agg(
-            batch_start=("dUPDATE_TIME", "min"),
-            batch_end=("dNODE_TIME", "max")
-        )
-        .reset_index()
-    )
+    df: 预处理后的记录，或 archive_store.StoreQuery
+    batch_time: 可选，已计算好的「工序 + 批次」时间表
+    """
+    # 作图库按需导入：只生成结果表时不加载 matplotlib
+    plt = timed_import("matplotlib.pyplot")
 
-    # ---------- Step 3：计算每个批次的有效工作时长 ----------
-    batch_time["work_hours"] = batch_time.apply(
-        lambda row: calc_work_hours(
-            row["batch_start"],
-            row["batch_end"]
-        ),
-        axis=1
-    )
+    # ---------- Step 1 ~ 3：完成记录按 工序 × 批次 聚合时间区间并计算有效工作时长 ----------
+    # 与任务 1.4 共用同一张批次时间表
+    if batch_time is None:
+        batch_time = get_aggregate(records_for(df, TASK2_COLUMNS["task2_2"]), "batch_time")
+    batch_time = batch_time.copy()
 
     # ---------- Step 4：确定批次所属日期（用开始日期） ----------
     batch_time["date"] = batch_time["batch_start"].dt.date
@@ -127,12 +137,13 @@ def plot_task2_2_daily_workload(df):
         "自检全检": "Inspection",
         "PDF处理": "PDF Generation"
     }
-    batch_time["Process"] = batch_time["工序"].map(process_map)
+    # 工序为类别型，先转为字符串，使透视后的列仍按英文名排序
+    batch_time["Process"] = batch_time["工序"].astype(str).map(process_map)
 
     # ---------- Step 6：按 日期 × 工序 汇总工作量 ----------
     daily_workload = (
         batch_time
-        .groupby(["date", "Process"])["work_hours"]
+        .groupby(["date", "Process"], observed=True)["batch_hours"]
         .sum()
         .reset_index(name="Workload (Person-Hours)")
     )
@@ -159,51 +170,58 @@ def plot_task2_2_daily_workload(df):
     output_dir = Path("result/figures")
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    plt.savefig(
-        output_dir / "task2_2.png",
-        dpi=300,
-        bbox_inches="tight"
-    )
+    with profile_stage("task2_2.savefig"):
+        plt.savefig(
+            output_dir / "task2_2.png",
+            dpi=300,
+            bbox_inches="tight"
+        )
     plt.close()
 
 # ======================
 # Task 2.3
 # ======================
-def plot_task2_3_daily_rework_ratio(df):
+@profile_stage("task2_3")
+def plot_task2_3_daily_rework_ratio(df, df_finished=None):
     """
     每天 × 工序 返工占比（堆积面积图）
     输出：result/figures/task2_3.png
-    """
 
-    # ---------- Step 1：只保留完成记录 ----------
-    df_finished = df[df["is_finished"]].copy()
+    df: 预处理后的记录，或 archive_store.StoreQuery
+    df_finished: 可选，已筛选好的完成记录，或按 完成日期 × 工序 × 案卷 排好序的 SortedSegments，
+                 或只含完成记录的立方体
+    """
+    # 作图库按需导入：只生成结果表时不加载 matplotlib
+    plt = timed_import("matplotlib.pyplot")
 
-    # ---------- Step 2：提取完成日期 ----------
-    df_finished["date"] = df_finished["dNODE_TIME"].dt.date
+    # ---------- Step 1 ~ 2：只保留完成记录（按 完成日期 × 工序 × 案卷 排序一次） ----------
+    if df_finished is None:
+        df_finished = get_aggregate(
+            records_for(df, TASK2_COLUMNS["task2_3"]), "daily_flow_archive_segments"
+        )
+    segments = as_segments(df_finished, ["finish_date", "工序", "sARCH_ID"])
 
     # ---------- Step 3：统计每天 × 工序 完成案卷数（分母） ----------
-    total_daily = (
-        df_finished
-        .groupby(["date", "工序"])["sARCH_ID"]
-        .nunique()
-        .reset_index(name="total_cases")
+    total_daily = segments.agg(
+        ["finish_date", "工序"],
+        total_cases=("sARCH_ID", "nunique")
     )
 
     # ---------- Step 4：统计每天 × 工序 返工案卷数（分子） ----------
-    rework_daily = (
-        df_finished[df_finished["is_rework"]]
-        .groupby(["date", "工序"])["sARCH_ID"]
-        .nunique()
-        .reset_index(name="rework_cases")
+    rework_daily = segments.agg(
+        ["finish_date", "工序"],
+        where="is_rework",
+        rework_cases=("sARCH_ID", "nunique")
     )
 
     # ---------- Step 5：合并并计算返工占比 ----------
     daily_ratio = pd.merge(
         total_daily,
         rework_daily,
-        on=["date", "工序"],
+        on=["finish_date", "工序"],
         how="left"
     )
+    daily_ratio["date"] = daily_ratio["finish_date"].dt.date
 
     daily_ratio["rework_cases"] = daily_ratio["rework_cases"].fillna(0)
     daily_ratio["rework_ratio"] = (
@@ -217,7 +235,8 @@ def plot_task2_3_daily_rework_ratio(df):
         "自检全检": "Inspection",
         "PDF处理": "PDF Generation"
     }
-    daily_ratio["Process"] = daily_ratio["工序"].map(process_map)
+    # 工序为类别型，先转为字符串，使透视后的列仍按英文名排序
+    daily_ratio["Process"] = daily_ratio["工序"].astype(str).map(process_map)
 
     # ---------- Step 7：转换为透视表 ----------
     pivot_data = (
@@ -241,43 +260,51 @@ def plot_task2_3_daily_rework_ratio(df):
     output_dir = Path("result/figures")
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    plt.savefig(
-        output_dir / "task2_3.png",
-        dpi=300,
-        bbox_inches="tight"
-    )
+    with profile_stage("task2_3.savefig"):
+        plt.savefig(
+            output_dir / "task2_3.png",
+            dpi=300,
+            bbox_inches="tight"
+        )
     plt.close()
 
 # ======================
 # Task 2.4
 # ======================
-def plot_task2_4_image_user_rework_pie(df, top_n=8):
+@profile_stage("task2_4")
+def plot_task2_4_image_user_rework_pie(df, top_n=8, df_finished=None):
     """
     图像处理工序 —— 操作人员返工占比（饼图）
     输出：result/figures/task2_4.png
-    """
 
-    # ---------- Step 1：只保留完成记录 ----------
-    df_finished = df[df["is_finished"]].copy()
+    df: 预处理后的记录，或 archive_store.StoreQuery
+    df_finished: 可选，已筛选好的完成记录，或按 人员 × 工序 开头排好序的 SortedSegments，
+                 或只含完成记录的立方体
+    """
+    # 作图库按需导入：只生成结果表时不加载 matplotlib
+    plt = timed_import("matplotlib.pyplot")
 
-    # ---------- Step 2：限定工序为“图像处理” ----------
-    df_img = df_finished[df_finished["工序"] == "图像处理"].copy()
+    # ---------- Step 1：只保留完成记录（按 人员 × 工序 排序一次，与任务 1.5 共用） ----------
+    if df_finished is None:
+        df_finished = get_aggregate(
+            records_for(df, TASK2_COLUMNS["task2_4"]), "user_flow_batch_segments"
+        )
+    segments = as_segments(df_finished, ["iUSER_ID", "工序"])
 
-    # ---------- Step 3：统计每个操作人员的完成案卷数（分母） ----------
-    total_cases = (
-        df_img
-        .groupby("iUSER_ID")["sARCH_ID"]
-        .nunique()
-        .reset_index(name="total_cases")
+    # ---------- Step 2 ~ 3：统计每个操作人员的完成案卷数（分母），限定工序为“图像处理” ----------
+    total_cases = segments.agg(
+        ["iUSER_ID", "工序"],
+        total_cases=("sARCH_ID", "nunique")
     )
+    total_cases = total_cases[total_cases["工序"] == "图像处理"].drop(columns="工序")
 
     # ---------- Step 4：统计每个操作人员的返工案卷数（分子） ----------
-    rework_cases = (
-        df_img[df_img["is_rework"]]
-        .groupby("iUSER_ID")["sARCH_ID"]
-        .nunique()
-        .reset_index(name="rework_cases")
+    rework_cases = segments.agg(
+        ["iUSER_ID", "工序"],
+        where="is_rework",
+        rework_cases=("sARCH_ID", "nunique")
     )
+    rework_cases = rework_cases[rework_cases["工序"] == "图像处理"].drop(columns="工序")
 
     # ---------- Step 5：合并并计算返工占比 ----------
     user_ratio = pd.merge(
@@ -335,11 +362,12 @@ def plot_task2_4_image_user_rework_pie(df, top_n=8):
     output_dir = Path("result/figures")
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    plt.savefig(
-        output_dir / "task2_4.png",
-        dpi=300,
-        bbox_inches="tight"
-    )
+    with profile_stage("task2_4.savefig"):
+        plt.savefig(
+            output_dir / "task2_4.png",
+            dpi=300,
+            bbox_inches="tight"
+        )
     plt.close()
 
 
@@ -348,8 +376,23 @@ def plot_task2_4_image_user_rework_pie(df, top_n=8):
 # main
 # ======================
 if __name__ == "__main__":
-    print("Loading and preprocessing data...")
-    df = preprocess_data("data/data.xlsx")
+    parser = argparse.ArgumentParser(description="任务 2 作图")
+    parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径")
+    parser.add_argument("--store", default=None,
+                        help="改为从分区存储库读取（见 archive_store.py），只读取日期范围内的分区")
+    parser.add_argument("--start-date", default=None, help="完成日期起（含，如 2020-07-06）")
+    parser.add_argument("--end-date", default=None, help="完成日期止（含）")
+    parser.add_argument("--process", action="append", default=None,
+                        help="只看指定工序（可重复，如 --process 扫描 --process 图像处理）")
+    args = parser.parse_args()
+
+    if args.store:
+        df = StoreQuery(args.store, args.start_date, args.end_date, args.process)
+    else:
+        if args.start_date or args.end_date or args.process:
+            parser.error("--start-date / --end-date / --process 需配合 --store 使用")
+        print("Loading and preprocessing data...")
+        df = preprocess_data(args.data)
 
     print("Generating Task 2.1 figure...")
     plot_task2_1_daily_finished_count(df)
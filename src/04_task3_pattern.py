@@ -1,9 +1,12 @@
 # src/04_task3_pattern.py
 
 import pandas as pd
-import matplotlib.pyplot as plt
 from pathlib import Path
-from utils import calc_work_hours
+from aggregates import get_aggregate
+from clustering import K_RANGE, fit_clusters, parse_k_range
+from features import BASIC_FEATURES, EXTENDED_FEATURES, operator_features
+from profiling import profile_stage, timed_import
+from result_writer import submit_result
 import importlib.util
 import os
 
@@ -20,25 +23,20 @@ preprocess_data = preprocess_module.preprocess_data
 # ======================
 # Task 3.1
 # ======================
-def analyze_processing_time_distribution(df):
+@profile_stage("task3_1")
+def analyze_processing_time_distribution(df, df_valid=None):
     """
     Task 3.1: Distribution of processing time
-    """
-
-    # ---------- Step 1：只保留有效完成记录 ----------
-    df_valid = df[df["is_finished"]].copy()
 
-    # ---------- Step 2：计算领取-提交工作时长 ----------
-    df_valid["processing_hours"] = df_valid.apply(
-        lambda row: calc_work_hours(
-            row["dUPDATE_TIME"],
-            row["dNODE_TIME"]
-        ),
-        axis=1
-    )
+    df_valid: optional, precomputed get_aggregate(df, "processing_records")
+    """
+    # 作图库按需导入：只生成结果表时不加载 matplotlib
+    plt = timed_import("matplotlib.pyplot")
 
-    # 去除异常
-    df_valid = df_valid[df_valid["processing_hours"] > 0]
+    # ---------- Step 1 & 2：有效完成记录 + 领取-提交工作时长（已去除异常） ----------
+    # processing_hours 复用预处理得到的 work_hours，与 3.2 共用
+    if df_valid is None:
+        df_valid = get_aggregate(df, "processing_records")
 
     # ---------- Step 3：绘制分布图 ----------
     plt.figure(figsize=(8, 5))
@@ -57,84 +55,70 @@ def analyze_processing_time_distribution(df):
     # ---------- Step 4：保存 ----------
     output_dir = Path("result/figures")
     output_dir.mkdir(parents=True, exist_ok=True)
-    plt.savefig(output_dir / "task3_1_processing_time_dist.png", dpi=300)
+    with profile_stage("task3_1.savefig"):
+        plt.savefig(output_dir / "task3_1_processing_time_dist.png", dpi=300)
     plt.close()
 
 # ======================
 # Task 3.2
 # ======================
-def cluster_operator_behavior(df, k=3):
+@profile_stage("task3_2")
+def cluster_operator_behavior(df, k=3, df_valid=None, plot=True, feature_set="basic",
+                              k_range=K_RANGE, jobs=None, model_path=None):
     """
     Task 3.2: Operator behavior clustering
-    """
-
-    from sklearn.cluster import KMeans
-    from sklearn.preprocessing import StandardScaler
-
-    # ---------- Step 1：只保留完成记录 ----------
-    df_valid = df[df["is_finished"]].copy()
-
-    # ---------- Step 2：计算领取-提交工作时长 ----------
-    df_valid["processing_hours"] = df_valid.apply(
-        lambda row: calc_work_hours(
-            row["dUPDATE_TIME"],
-            row["dNODE_TIME"]
-        ),
-        axis=1
-    )
-    df_valid = df_valid[df_valid["processing_hours"] > 0]
 
-    # ---------- Step 3：构建人员级特征 ----------
-    def long_task_ratio(x):
-        return (x > x.quantile(0.9)).mean()
-
-    features = (
-        df_valid
-        .groupby("iUSER_ID")["processing_hours"]
-        .agg(
-            avg_time="mean",
-            median_time="median",
-            p90_time=lambda x: x.quantile(0.9),
-            long_ratio=long_task_ratio,
-            case_count="count"
-        )
-        .reset_index()
-    )
+    df_valid: optional, precomputed get_aggregate(df, "processing_records")
+    plot: False 时只保存聚类结果表（result3.xlsx），不作图、不加载 matplotlib
+    feature_set: "basic"（均值 / 中位数 / P90 / 长耗时占比 / 记录数）或 "extended"
+                 （另加返工率、工序构成与领取时刻分布，见 features.py）
+    k: 簇数，或 "auto" 在 k_range 上并行评估（jobs 个进程）后按轮廓系数选择，见 clustering.py
+    model_path: 可选，保存模型（标准化参数 + 聚类中心）的目录，之后可用
+                python src/clustering.py assign 分配新数据
+    """
+    # ---------- Step 1 & 2：有效完成记录 + 领取-提交工作时长 ----------
+    if df_valid is None:
+        df_valid = get_aggregate(df, "processing_records")
 
-    # ---------- Step 4：标准化 ----------
-    feature_cols = ["avg_time", "median_time", "p90_time", "long_ratio", "case_count"]
-    scaler = StandardScaler()
-    X = scaler.fit_transform(features[feature_cols])
+    # ---------- Step 3：构建人员级特征（一次排序，整列计算） ----------
+    features = operator_features(df_valid, extended=feature_set == "extended")
 
-    # ---------- Step 5：KMeans 聚类 ----------
-    kmeans = KMeans(n_clusters=k, random_state=42)
-    features["cluster"] = kmeans.fit_predict(X)
+    # ---------- Step 4 & 5：标准化 + KMeans 聚类（人员较多时为 MiniBatchKMeans） ----------
+    feature_cols = BASIC_FEATURES if feature_set == "basic" else EXTENDED_FEATURES
+    model = fit_clusters(features, feature_cols, k, k_range, jobs=jobs)
+    features["cluster"] = model.labels
+    k = model.k
+    if model_path is not None:
+        model.save(model_path)
 
     # ---------- Step 6：二维可视化（avg_time × case_count） ----------
-    plt.figure(figsize=(8, 6))
-    for c in range(k):
-        subset = features[features["cluster"] == c]
-        plt.scatter(
-            subset["avg_time"],
-            subset["case_count"],
-            label=f"Cluster {c}",
-            alpha=0.7
-        )
-
-    plt.xlabel("Average Processing Time (hours)")
-    plt.ylabel("Case Count")
-    plt.title("Operator Behavior Clustering")
-    plt.legend()
-    plt.tight_layout()
-
-    # ---------- Step 7：保存 ----------
-    output_dir = Path("result/figures")
-    output_dir.mkdir(parents=True, exist_ok=True)
-    plt.savefig(output_dir / "task3_2_operator_clustering.png", dpi=300)
-    plt.close()
+    if plot:
+        plt = timed_import("matplotlib.pyplot")
+        plt.figure(figsize=(8, 6))
+        for c in range(k):
+            subset = features[features["cluster"] == c]
+            plt.scatter(
+                subset["avg_time"],
+                subset["case_count"],
+                label=f"Cluster {c}",
+                alpha=0.7
+            )
+
+        plt.xlabel("Average Processing Time (hours)")
+        plt.ylabel("Case Count")
+        plt.title("Operator Behavior Clustering")
+        plt.legend()
+        plt.tight_layout()
+
+        # ---------- Step 7：保存 ----------
+        output_dir = Path("result/figures")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        with profile_stage("task3_2.savefig"):
+            plt.savefig(output_dir / "task3_2_operator_clustering.png", dpi=300)
+        plt.close()
 
     # ---------- Step 8：保存聚类结果 ----------
-    features.to_excel("result/result3.xlsx", index=False)
+    submit_result(features, "result/result3.xlsx")
 
     return features
 
@@ -142,13 +126,20 @@ def cluster_operator_behavior(df, k=3):
 # ======================
 # Task 3.3
 # ======================
-def plot_receive_submit_time_heatmap(df):
+@profile_stage("task3_3")
+def plot_receive_submit_time_heatmap(df, df_finished=None):
     """
     Task 3.3: Receive vs Submit time-of-day heatmap
+
+    df_finished: optional, pre-filtered finished records shared between tasks
     """
+    # 作图库按需导入：只生成结果表时不加载 matplotlib
+    plt = timed_import("matplotlib.pyplot")
 
     # ---------- Step 1：只保留完成记录 ----------
-    df_valid = df[df["is_finished"]].copy()
+    if df_finished is None:
+        df_finished = get_aggregate(df, "finished")
+    df_valid = df_finished.copy()
 
     # ---------- Step 2：提取小时 ----------
     df_valid["receive_hour"] = df_valid["dUPDATE_TIME"].dt.hour
@@ -192,22 +183,42 @@ def plot_receive_submit_time_heatmap(df):
     # ---------- Step 6：保存 ----------
     output_dir = Path("result/figures")
     output_dir.mkdir(parents=True, exist_ok=True)
-    plt.savefig(
-        output_dir / "task3_3_receive_submit_heatmap.png",
-        dpi=300,
-        bbox_inches="tight"
-    )
+    with profile_stage("task3_3.savefig"):
+        plt.savefig(
+            output_dir / "task3_3_receive_submit_heatmap.png",
+            dpi=300,
+            bbox_inches="tight"
+        )
     plt.close()
 
 
 if __name__ == "__main__":
-    df = preprocess_data("data/data.xlsx")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="任务 3")
+    parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径")
+    parser.add_argument("--features", choices=["basic", "extended"], default="basic",
+                        help="任务 3.2 的聚类特征（默认 basic；extended 另加返工率、工序构成与活跃时段）")
+    parser.add_argument("--k", default="3", help="任务 3.2 的簇数，或 auto 按轮廓系数选择（默认 3）")
+    parser.add_argument("--k-range", default="2-10", help="--k auto 时的候选 k，如 2-10 或 3,5,8（默认 2-10）")
+    parser.add_argument("--jobs", type=int, default=None, help="--k auto 时选 k 的进程数（默认 CPU 核数）")
+    parser.add_argument("--model", default=None, help="保存任务 3.2 聚类模型的目录（默认不保存）")
+    args = parser.parse_args()
+
+    df = preprocess_data(args.data)
 
     print("Running Task 3.1...")
     analyze_processing_time_distribution(df)
 
     print("Running Task 3.2...")
-    cluster_operator_behavior(df)
+    cluster_operator_behavior(
+        df,
+        k=args.k if args.k == "auto" else int(args.k),
+        feature_set=args.features,
+        k_range=parse_k_range(args.k_range),
+        jobs=args.jobs,
+        model_path=args.model,
+    )
 
     print("Running Task 3.3...")
     plot_receive_submit_time_heatmap(df)
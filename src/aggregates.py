@@ -0,0 +1,215 @@
+# src/aggregates.py
+
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+from utils import calc_work_hours_array
+from cache import load_frame, save_frame
+from archive_index import build_archive_index
+from cube import open_cube
+from lead_time import stage_waits
+from occupancy import operator_occupancy
+from segments import SortedSegments, as_segments
+from profiling import profile_stage
+
+
+def finished_records(df: pd.DataFrame) -> pd.DataFrame:
+    """"
+    只保留“完成的工序记录”（iNODE_STATUS 为 2 或 5）
+    """
+    return df[df["is_finished"]].copy()
+
+def batch_time_table(df_finished, keys: list) -> pd.DataFrame:
+    """"
+    按给定键（须以 sBatch_number 结尾）聚合批次时间区间，并计算批次有效工作时长
+
+    df_finished: 完成记录，或排序键以 keys 开头的 SortedSegments（与其他任务共用一次排序）
+    返回列：keys + batch_start / batch_end / batch_hours
+    """
+    # 1. 聚合出批次时间区间：最早领取 ~ 最晚提交
+    batch_time = as_segments(df_finished, keys).agg(
+        keys,
+        batch_start=("dUPDATE_TIME", "min"),
+        batch_end=("dNODE_TIME", "max")
+    )
+
+    # 2. 对每个批次计算“有效工作时长”（按人员聚合时按各人员的排班）
+    batch_time["batch_hours"] = calc_work_hours_array(
+        batch_time["batch_start"],
+        batch_time["batch_end"],
+        operators=batch_time["iUSER_ID"] if "iUSER_ID" in keys else None
+    )
+    return batch_time
+
+def processing_records(df_finished: pd.DataFrame) -> pd.DataFrame:
+    """"
+    领取-提交工作时长为正的完成记录；processing_hours 直接复用预处理得到的 work_hours
+    """
+    df_valid = df_finished[df_finished["work_hours"] > 0].copy()
+    df_valid["processing_hours"] = df_valid["work_hours"]
+    return df_valid
+
+
+# ======================
+# 命名聚合注册表（按数据集版本记忆化）
+# ======================
+# name -> 计算函数 func(df)，df 为完整的预处理结果；
+# 结果为 DataFrame，或共用排序的 SortedSegments / 预聚合立方体（只在内存中保留，不落盘）
+AGGREGATES = {}
+
+# (数据集版本, 名称) -> DataFrame，按最近使用顺序排列
+_memo = OrderedDict()
+
+_settings = {
+    "max_entries": 32,     # 内存中最多保留的聚合表数量
+    "max_bytes": None,     # 内存中聚合表的总字节上限（None 表示不限）
+    "spill_dir": None,     # 淘汰时落盘的目录（None 表示直接丢弃）
+}
+
+def register_aggregate(name: str):
+    """注册一个命名聚合；函数接收完整的预处理 DataFrame"""
+    def decorator(func):
+        AGGREGATES[name] = func
+        return func
+    return decorator
+
+def configure_aggregates(max_entries: int | None = None, max_bytes: int | None = None,
+                         spill_dir: str | None = None):
+    """"
+    调整记忆化缓存：条目数 / 字节上限，以及淘汰时的落盘目录
+    """
+    if max_entries is not None:
+        _settings["max_entries"] = max_entries
+    if max_bytes is not None:
+        _settings["max_bytes"] = max_bytes
+    if spill_dir is not None:
+        _settings["spill_dir"] = Path(spill_dir)
+    _evict()
+
+def clear_aggregates():
+    """清空内存中的聚合表（不删除已落盘文件）"""
+    _memo.clear()
+
+def dataset_version(df: pd.DataFrame) -> str:
+    """"
+    数据集版本：优先使用 preprocess_data 写入的 df.attrs["dataset_version"]，
+    否则按内容计算哈希
+    """
+    version = df.attrs.get("dataset_version")
+    if version is None:
+        digest = pd.util.hash_pandas_object(df, index=True).sum()
+        version = f"hash-{digest & 0xFFFFFFFFFFFFFFFF:016x}"
+        df.attrs["dataset_version"] = version
+    return version
+
+def _frame_bytes(frame) -> int:
+    if not isinstance(frame, pd.DataFrame):
+        return frame.nbytes
+    return int(frame.memory_usage(index=True).sum())
+
+def _spill_path(key: tuple) -> Path:
+    version, name = key
+    return _settings["spill_dir"] / f"{version}_{name}.parquet"
+
+def _evict():
+    """"
+    按 LRU 淘汰超出上限的聚合表；配置了落盘目录时先写入 Parquet
+    """
+    max_entries = _settings["max_entries"]
+    max_bytes = _settings["max_bytes"]
+
+    def over_limit():
+        if len(_memo) > max_entries:
+            return True
+        if max_bytes is not None and len(_memo) > 1:
+            return sum(_frame_bytes(f) for f in _memo.values()) > max_bytes
+        return False
+
+    while _memo and over_limit():
+        key, frame = _memo.popitem(last=False)
+        # 排序结果只是原始记录的索引，淘汰后重新排序即可；立方体自身已落盘
+        # 连同索引一起保存（如 archive_index 以 sARCH_ID 为索引），读回后与淘汰前一致
+        if _settings["spill_dir"] is not None and isinstance(frame, pd.DataFrame):
+            save_frame(frame, _spill_path(key), index=True)
+
+def get_aggregate(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """"
+    取命名聚合表：同一数据集版本只计算一次，之后直接复用
+
+    df 必须是完整的预处理结果（而不是其子集）；
+    返回值由多个任务共享，调用方需要修改时请先 .copy()
+    """
+    if name not in AGGREGATES:
+        raise KeyError(f"未注册的聚合: {name}")
+
+    key = (dataset_version(df), name)
+    if key in _memo:
+        _memo.move_to_end(key)
+        return _memo[key]
+
+    frame = None
+    if _settings["spill_dir"] is not None:
+        frame = load_frame(_spill_path(key))
+    if frame is None:
+        with profile_stage(f"aggregate:{name}"):
+            frame = AGGREGATES[name](df)
+
+    _memo[key] = frame
+    _evict()
+    return frame
+
+
+@register_aggregate("finished")
+def _finished(df):
+    return finished_records(df)
+
+@register_aggregate("archive_index")
+def _archive_index(df):
+    """案卷状态索引：完成工序掩码 + 各工序时间（任务 1.1、1.2）"""
+    return build_archive_index(get_aggregate(df, "finished"))
+
+@register_aggregate("flow_batch_segments")
+def _flow_batch_segments(df):
+    """完成记录按 工序 × 批次 排序一次（任务 1.4、2.2）"""
+    return SortedSegments(get_aggregate(df, "finished"), ["工序", "sBatch_number"])
+
+@register_aggregate("user_flow_batch_segments")
+def _user_flow_batch_segments(df):
+    """完成记录按 人员 × 工序 × 批次 排序一次（任务 1.5、2.4）"""
+    return SortedSegments(get_aggregate(df, "finished"), ["iUSER_ID", "工序", "sBatch_number"])
+
+@register_aggregate("daily_flow_archive_segments")
+def _daily_flow_archive_segments(df):
+    """完成记录按 完成日期 × 工序 × 案卷 排序一次（任务 2.1、2.3）"""
+    return SortedSegments(get_aggregate(df, "finished"), ["finish_date", "工序", "sARCH_ID"])
+
+@register_aggregate("batch_time")
+def _batch_time(df):
+    """「工序 × 批次」时间表（任务 1.4、2.2）"""
+    return batch_time_table(get_aggregate(df, "flow_batch_segments"), ["工序", "sBatch_number"])
+
+@register_aggregate("user_batch_time")
+def _user_batch_time(df):
+    """「人员 × 工序 × 批次」时间表（任务 1.5）"""
+    return batch_time_table(get_aggregate(df, "user_flow_batch_segments"), ["iUSER_ID", "工序", "sBatch_number"])
+
+@register_aggregate("processing_records")
+def _processing_records(df):
+    """有效完成记录 + processing_hours（任务 3.1、3.2）"""
+    return processing_records(get_aggregate(df, "finished"))
+
+@register_aggregate("cube")
+def _cube(df):
+    """日期 × 工序 × 人员 × 状态 立方体（--engine cube 时的任务 1.3 ~ 1.5、2.1、2.3、2.4）"""
+    return open_cube(df)
+
+@register_aggregate("stage_waits")
+def _stage_waits(df):
+    """案卷的工序间等待明细（工序间等待分析）"""
+    return stage_waits(get_aggregate(df, "archive_index"))
+
+@register_aggregate("operator_occupancy")
+def _operator_occupancy(df):
+    """人员 × 日期 的占用工时与并发（区间并集）"""
+    return operator_occupancy(get_aggregate(df, "finished"))
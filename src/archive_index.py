@@ -0,0 +1,116 @@
+# src/archive_index.py
+
+import numpy as np
+import pandas as pd
+from utils import FLOW_MAP
+
+
+# 工序名称 -> 掩码位（按工序编号顺序：扫描 = bit0 ... PDF处理 = bit3）
+FLOW_BITS = {name: i for i, name in enumerate(FLOW_MAP.values())}
+ALL_FLOWS_MASK = (1 << len(FLOW_BITS)) - 1
+
+_NAT = np.iinfo(np.int64).min
+_MAX = np.iinfo(np.int64).max
+
+
+def _time_ns(series) -> np.ndarray:
+    """datetime 列 -> int64 纳秒（NaT 为 int64 最小值）"""
+    return np.asarray(series, dtype="datetime64[ns]").view(np.int64)
+
+def _min_at(n: int, idx: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """按位置取最小时间（忽略 NaT），无值的位置为 NaT"""
+    out = np.full(n, _MAX, dtype=np.int64)
+    valid = values != _NAT
+    np.minimum.at(out, idx[valid], values[valid])
+    out[out == _MAX] = _NAT
+    return out
+
+def _max_at(n: int, idx: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """按位置取最大时间（NaT 为最小值，自然被忽略）"""
+    out = np.full(n, _NAT, dtype=np.int64)
+    np.maximum.at(out, idx, values)
+    return out
+
+def build_archive_index(records: pd.DataFrame) -> pd.DataFrame:
+    """"
+    完成记录 -> 案卷状态索引（每个案卷一行，按案卷号排序）
+
+    对整数编码后的案卷号做一次向量化遍历，得到：
+    - flow_mask:   已完成工序的 4 位掩码（四位全为 1 即完成四道工序）
+    - rework_mask: 有返工记录的工序掩码
+    - has_rework:  是否有返工记录（包括工序编号无法识别的记录）
+    - 各工序的 <工序>_start_time / <工序>_end_time（最早领取 / 最晚提交）、
+      <工序>_work_hours（工时合计）、<工序>_rework_time（最早返工时间）
+
+    records 需要 sARCH_ID / 工序 / dUPDATE_TIME / dNODE_TIME / work_hours / is_rework / dPROC_TIME 列
+    """
+    codes, archives = pd.factorize(records["sARCH_ID"], sort=True)
+    n_archives = len(archives)
+    n_flows = len(FLOW_BITS)
+
+    bits = np.asarray(records["工序"].map(FLOW_BITS), dtype=np.float64)
+    bits = np.where(np.isnan(bits), -1, bits).astype(np.int64)
+    is_rework = records["is_rework"].to_numpy(dtype=bool)
+
+    # ---------- 有效记录：案卷号、工序都能识别 ----------
+    valid = (codes >= 0) & (bits >= 0)
+    cell = codes[valid] * n_flows + bits[valid]       # 展平后的 (案卷, 工序) 位置
+    n_cells = n_archives * n_flows
+    rework_rows = is_rework[valid]
+
+    present = np.zeros(n_cells, dtype=bool)
+    present[cell] = True
+    reworked = np.zeros(n_cells, dtype=bool)
+    reworked[cell[rework_rows]] = True
+
+    weights = (1 << np.arange(n_flows)).astype(np.uint8)
+    flow_mask = (present.reshape(n_archives, n_flows) * weights).sum(axis=1).astype(np.uint8)
+    rework_mask = (reworked.reshape(n_archives, n_flows) * weights).sum(axis=1).astype(np.uint8)
+
+    has_rework = np.zeros(n_archives, dtype=bool)
+    has_rework[codes[(codes >= 0) & is_rework]] = True
+
+    # ---------- 各工序的时间与工时 ----------
+    start = _min_at(n_cells, cell, _time_ns(records["dUPDATE_TIME"])[valid])
+    end = _max_at(n_cells, cell, _time_ns(records["dNODE_TIME"])[valid])
+    rework_time = _min_at(n_cells, cell[rework_rows], _time_ns(records["dPROC_TIME"])[valid][rework_rows])
+
+    # 工时用 pandas 分组求和（补偿求和），与按记录 groupby(...).sum() 的结果逐位一致
+    hours = np.zeros(n_cells, dtype=np.float64)
+    flow_hours = pd.Series(records["work_hours"].to_numpy(dtype=np.float64)[valid]).groupby(cell).sum()
+    hours[flow_hours.index.to_numpy()] = flow_hours.to_numpy()
+
+    columns = {
+        "flow_mask": flow_mask,
+        "rework_mask": rework_mask,
+        "has_rework": has_rework,
+    }
+    as_time = lambda a: a.reshape(n_archives, n_flows).view("datetime64[ns]")
+    for name, bit in FLOW_BITS.items():
+        columns[f"{name}_start_time"] = as_time(start)[:, bit]
+        columns[f"{name}_end_time"] = as_time(end)[:, bit]
+        columns[f"{name}_work_hours"] = hours.reshape(n_archives, n_flows)[:, bit]
+        columns[f"{name}_rework_time"] = as_time(rework_time)[:, bit]
+
+    return pd.DataFrame(columns, index=pd.Index(archives, name="sARCH_ID"))
+
+def flows_in_mask(mask: int) -> list:
+    """掩码中包含的工序名称（按名称排序，与透视表的列顺序一致）"""
+    return sorted(name for name, bit in FLOW_BITS.items() if mask >> bit & 1)
+
+def completion_hours(archives, flows, hours, valid_flows) -> pd.Series:
+    """"
+    完成记录 -> 各案卷 valid_flows 的工时合计（未舍入），索引为 archives 中的案卷
+
+    与 build_archive_index + calc_task1_1_archive_flow_table 同样的浮点求和：先按 案卷 × 工序
+    分组求和（组内按记录顺序补偿求和），再按工序名顺序逐案卷相加，结果逐位一致。
+    供 SQL / Polars 引擎使用：三列须按原记录顺序排列，archives 可为案卷号或其类别编码
+    """
+    rank = pd.Categorical(flows, categories=sorted(valid_flows)).codes
+    kept = rank >= 0
+    cells = (
+        pd.Series(np.asarray(hours, dtype=np.float64)[kept])
+        .groupby([np.asarray(archives)[kept], rank[kept]])
+        .sum()
+    )
+    return cells.groupby(level=0, sort=False).sum()
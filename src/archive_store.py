@@ -0,0 +1,306 @@
+# src/archive_store.py
+"""
+历史导出的分区存储库：预处理后的记录按完成日期（可选再按工序）分区写成 Parquet（Hive 目录布局）
+
+    data/store/finish_date=2020-07-06/<源文件名>_<来源>_<数据集版本>-0.parquet
+    data/store/finish_date=2020-07-06/工序=扫描/<源文件名>_<来源>_<数据集版本>-0.parquet   （--by-process）
+
+读取时按 start_date / end_date / 工序 只打开匹配的分区目录、只读取需要的列，
+画两周的日报图不必扫描一整年的数据。没有提交时间（完成日期为空）的记录在
+finish_date=__HIVE_DEFAULT_PARTITION__ 下，指定日期范围时不会读到。
+
+同一源文件再次导入时替换它之前导入的记录：元信息中按源文件的绝对路径记录其最近一次导入的
+文件名前缀，只删除该前缀的文件（<来源> 为路径的摘要，不同目录下的同名导出互不影响）。
+
+用法：
+    python src/archive_store.py ingest --data data/data.xlsx
+    python src/archive_store.py ingest --data data/2020-08.xlsx --by-process
+    python src/archive_store.py info
+    python src/03_task2_visualization.py --store data/store --start-date 2020-07-06 --end-date 2020-07-19
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+from cache import params_digest
+from profiling import profile_stage
+
+
+STORE_DIR = "data/store"
+
+# 存储库布局变更时递增
+STORE_VERSION = 1
+
+# 存储库元信息（以 _ 开头，读取数据集时自动忽略）：布局版本、分区列，
+# 以及 sources（源文件绝对路径 -> 最近一次导入的文件名前缀）
+META_FILE = "_store.json"
+
+CATEGORY_COLS = ["sARCH_ID", "sBatch_number", "工序"]
+
+
+def _preprocess_module():
+    spec = importlib.util.spec_from_file_location(
+        "preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _partitioning(partition_by: list):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    types = {"finish_date": pa.date32(), "工序": pa.string()}
+    return ds.partitioning(pa.schema([(col, types[col]) for col in partition_by]), flavor="hive")
+
+def read_meta(store_dir: str = STORE_DIR) -> dict | None:
+    """存储库元信息（布局版本、分区列）；存储库不存在时返回 None"""
+    path = Path(store_dir) / META_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def _write_meta(store_dir: Path, meta: dict):
+    store_dir.mkdir(parents=True, exist_ok=True)
+    (store_dir / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
+# ======================
+# 写入
+# ======================
+@profile_stage("store_write")
+def write_records(df: pd.DataFrame, store_dir: str = STORE_DIR, name: str = "records",
+                  by_process: bool = False) -> int:
+    """"
+    预处理后的记录写入存储库，返回写入的文件数
+
+    name: 文件名前缀（通常为 <源文件名>_<数据集版本>）；同一前缀的文件直接覆盖
+    by_process: 在完成日期下再按工序分区（须与存储库已有的布局一致）
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    store_dir = Path(store_dir)
+    partition_by = ["finish_date", "工序"] if by_process else ["finish_date"]
+    meta = read_meta(store_dir)
+    if meta is not None and (meta["version"], meta["partition_by"]) != (STORE_VERSION, partition_by):
+        raise ValueError(
+            f"存储库 {store_dir} 的布局为 {meta['partition_by']}（版本 {meta['version']}），"
+            f"与本次写入的 {partition_by} 不一致"
+        )
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.set_column(
+        table.schema.get_field_index("finish_date"), "finish_date",
+        table["finish_date"].cast(pa.date32()),
+    )
+    if by_process:
+        table = table.set_column(table.schema.get_field_index("工序"), "工序", table["工序"].cast(pa.string()))
+
+    written = []
+    ds.write_dataset(
+        table, store_dir, format="parquet",
+        partitioning=_partitioning(partition_by),
+        basename_template=f"{name}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_partitions=1 << 20,
+        file_visitor=lambda f: written.append(f.path),
+    )
+
+    meta = dict(meta or {}, version=STORE_VERSION, partition_by=partition_by)
+    _write_meta(store_dir, meta)
+    return len(written)
+
+def _remove_stale(store_dir: Path, previous: str | None, name: str) -> int:
+    """删除同一源文件上一次导入的记录（文件名前缀为 previous），返回删除的文件数"""
+    if previous is None or previous == name:
+        return 0
+    removed = 0
+    for path in store_dir.rglob("*.parquet"):
+        if path.name.rsplit("-", 1)[0] == previous:
+            path.unlink()
+            removed += 1
+    return removed
+
+@profile_stage("store_ingest")
+def ingest(data_path: str, store_dir: str = STORE_DIR, by_process: bool = False,
+           use_cache: bool = True) -> dict:
+    """"
+    预处理源文件并导入存储库，返回 {"rows", "files", "removed"}
+    """
+    preprocess_module = _preprocess_module()
+    df = preprocess_module.preprocess_data(data_path, use_cache=use_cache)
+
+    source = str(Path(data_path).resolve())
+    source_id = params_digest({"source": source})[:8]
+    name = f"{Path(data_path).stem}_{source_id}_{df.attrs['dataset_version']}"
+    files = write_records(df, store_dir, name=name, by_process=by_process)
+
+    meta = read_meta(store_dir)
+    sources = meta.setdefault("sources", {})
+    removed = _remove_stale(Path(store_dir), sources.get(source), name)
+    sources[source] = name
+    _write_meta(Path(store_dir), meta)
+    return {"rows": len(df), "files": files, "removed": removed}
+
+
+# ======================
+# 读取
+# ======================
+def _as_date(value) -> date | None:
+    if value is None:
+        return None
+    return pd.Timestamp(value).date()
+
+def _restore_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """"
+    还原与 preprocess_data 相同的列类型：
+    完成日期为 datetime64（分区中为日期），类别列只保留出现过的取值并按字典序排列
+    """
+    if "finish_date" in df:
+        df["finish_date"] = pd.to_datetime(df["finish_date"]).astype("datetime64[ns]")
+    for col in CATEGORY_COLS:
+        if col not in df:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col].cat.remove_unused_categories()
+            df[col] = values.cat.reorder_categories(sorted(values.cat.categories))
+        else:
+            df[col] = df[col].astype("category")
+    return df
+
+@profile_stage("store_load")
+def load_records(store_dir: str = STORE_DIR, start_date=None, end_date=None,
+                 processes: list | None = None, columns: list | None = None) -> pd.DataFrame:
+    """"
+    从存储库读取记录：完成日期在 [start_date, end_date]（含两端，None 表示不限）、
+    工序在 processes 中（None 表示全部），只读取 columns 列（None 表示全部）
+
+    日期与工序（按工序分区时）条件只打开匹配的分区目录；返回的 DataFrame 带有
+    dataset_version（由匹配的文件与查询条件决定），可直接用于 get_aggregate
+    """
+    import pyarrow.dataset as ds
+
+    meta = read_meta(store_dir)
+    if meta is None:
+        raise FileNotFoundError(f"存储库不存在: {store_dir}（先运行 python src/archive_store.py ingest）")
+
+    dataset = ds.dataset(store_dir, format="parquet", partitioning=_partitioning(meta["partition_by"]))
+
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    conditions = []
+    if start_date is not None:
+        conditions.append(ds.field("finish_date") >= start_date)
+    if end_date is not None:
+        conditions.append(ds.field("finish_date") <= end_date)
+    if processes is not None:
+        conditions.append(ds.field("工序").isin(list(processes)))
+    condition = None
+    for expr in conditions:
+        condition = expr if condition is None else condition & expr
+
+    # 分区条件在这里即排除不匹配的目录，只读取剩下的文件
+    fragments = sorted(fragment.path for fragment in dataset.get_fragments(filter=condition))
+    table = dataset.to_table(columns=columns, filter=condition)
+
+    df = _restore_schema(table.to_pandas())
+    df.attrs["dataset_version"] = params_digest({
+        "files": [os.path.relpath(path, store_dir) for path in fragments],
+        "start_date": start_date, "end_date": end_date,
+        "processes": sorted(processes) if processes is not None else None,
+        "columns": columns,
+    })[:16]
+    return df
+
+class StoreQuery:
+    """"
+    存储库上的一次查询（日期范围 + 工序），作图函数在需要时才读取，且只读取该图用到的列
+
+    可代替预处理后的 df 传给 03_task2_visualization.py 的作图函数：
+        query = StoreQuery(start_date="2020-07-06", end_date="2020-07-19")
+        plot_task2_1_daily_finished_count(query)
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR, start_date=None, end_date=None,
+                 processes: list | None = None):
+        self.store_dir = store_dir
+        self.start_date = start_date
+        self.end_date = end_date
+        self.processes = processes
+        self._frames = {}
+
+    def load(self, columns: list | None = None) -> pd.DataFrame:
+        """读取匹配的记录（同一组列只读取一次）"""
+        key = tuple(columns) if columns is not None else None
+        if key not in self._frames:
+            self._frames[key] = load_records(
+                self.store_dir, self.start_date, self.end_date, self.processes, columns
+            )
+        return self._frames[key]
+
+def records_for(df, columns: list) -> pd.DataFrame:
+    """"
+    作图函数的输入：预处理后的 DataFrame 原样返回；StoreQuery 则只读取 columns 列
+    """
+    if isinstance(df, StoreQuery):
+        return df.load(columns)
+    return df
+
+
+def store_info(store_dir: str = STORE_DIR) -> dict:
+    """"
+    存储库概况：分区列、文件数、完成日期范围、各导入批次（<源文件名>_<来源>_<数据集版本>）的文件数
+    """
+    meta = read_meta(store_dir)
+    if meta is None:
+        raise FileNotFoundError(f"存储库不存在: {store_dir}")
+    paths = sorted(Path(store_dir).rglob("*.parquet"))
+    days = sorted({
+        part.split("=", 1)[1] for path in paths for part in path.relative_to(store_dir).parts
+        if part.startswith("finish_date=") and not part.endswith("__HIVE_DEFAULT_PARTITION__")
+    })
+    exports = {}
+    for path in paths:
+        name = path.name.rsplit("-", 1)[0]
+        exports[name] = exports.get(name, 0) + 1
+    return {
+        "partition_by": meta["partition_by"],
+        "files": len(paths),
+        "first_date": days[0] if days else None,
+        "last_date": days[-1] if days else None,
+        "exports": exports,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按完成日期分区的 Parquet 历史记录库")
+    parser.add_argument("--store", default=STORE_DIR, help="存储库目录（默认 data/store）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="预处理源文件并导入存储库")
+    ingest_parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径")
+    ingest_parser.add_argument("--by-process", action="store_true",
+                               help="在完成日期下再按工序分区（须与已有的布局一致）")
+    ingest_parser.add_argument("--no-cache", action="store_true", help="不使用预处理缓存")
+
+    commands.add_parser("info", help="查看存储库概况")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        try:
+            stats = ingest(args.data, args.store, by_process=args.by_process, use_cache=not args.no_cache)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"已导入 {stats['rows']} 条记录，写入 {stats['files']} 个文件"
+              f"（替换旧记录 {stats['removed']} 个文件）")
+    else:
+        info = store_info(args.store)
+        print(f"分区: {' / '.join(info['partition_by'])}，文件数: {info['files']}，"
+              f"完成日期: {info['first_date']} ~ {info['last_date']}")
+        for name, n_files in info["exports"].items():
+            print(f"  {name}: {n_files} 个文件")
@@ -0,0 +1,332 @@
+# src/benchmark.py
+"""
+基准测试：用合成流转日志（见 synthetic.py）在不同数据量下计时各环节，
+输出 JSON 报告；指定 --baseline 时与旧报告对比，列出变慢的环节。
+
+计时环节：calc_work_hours（逐条 / 向量化）、preprocess_data（无缓存 / 写缓存 / 读缓存）、
+共享中间结果、表 1 ~ 表 5 的计算（pandas 与 SQL 引擎），以及任务 2 / 任务 3 的各作图函数；
+另在新进程中计时冷启动导入（只出表 / 含作图与聚类库）。
+
+用法：
+    python src/benchmark.py                                  # 10k、1m、10m 三档
+    python src/benchmark.py --sizes 10k,1m --repeat 3
+    python src/benchmark.py --sizes 1m --baseline result/benchmark/old.json
+"""
+
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+import sql_backend
+import polars_engine
+from aggregates import clear_aggregates, dataset_version
+from cache import has_parquet
+from pipeline import NODES, TASKS, resolve_order, preprocess_module, task1_module
+from utils import calc_work_hours, calc_work_hours_array
+
+
+# 逐条版 calc_work_hours 太慢，只取前若干行计时
+SCALAR_SAMPLE_ROWS = 20_000
+
+# 表 1 ~ 表 5 只计时计算本身（大数据量的结果表可能超过 Excel 行数上限，不保存）
+TASK1_CALCS = {
+    "task1_1": lambda ctx: task1_module.calc_task1_1_archive_flow_table(
+        ctx["archive_index"], ctx["completed_archives"]),
+    "task1_2": lambda ctx: task1_module.calc_task1_2_rework_table(
+        ctx["archive_index"], ctx["completed_archives"]),
+    "task1_3": lambda ctx: task1_module.calc_task1_3_inspection_rework_table(ctx["df_completed"]),
+    "task1_4": lambda ctx: task1_module.calc_task1_4_process_hours_table(
+        ctx["flow_batch_segments"], ctx["batch_time"]),
+    "task1_5": lambda ctx: task1_module.calc_task1_5_user_process_hours_table(
+        ctx["user_flow_batch_segments"], ctx["user_batch_time"]),
+}
+
+
+# 冷启动导入计时：名称 -> 在新进程中执行的导入语句
+IMPORT_PROBES = {
+    "import pipeline (headless)": "import pipeline",
+    "import pipeline + matplotlib + sklearn":
+        "import pipeline, matplotlib.pyplot, sklearn.cluster",
+}
+
+
+def parse_size(value: str) -> int:
+    """"
+    "10k" / "1m" / "2500" -> 行数
+    """
+    value = value.strip().lower().replace("_", "")
+    units = {"k": 1_000, "m": 1_000_000}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+def _size_label(n_rows: int) -> str:
+    for unit, scale in (("m", 1_000_000), ("k", 1_000)):
+        if n_rows >= scale and n_rows % scale == 0:
+            return f"{n_rows // scale}{unit}"
+    return str(n_rows)
+
+def dataset_path(work_dir: Path, n_rows: int, seed: int, fmt: str) -> Path:
+    """"
+    合成数据文件路径：同样的行数 / 种子 / 生成器版本只生成一次
+    """
+    name = f"synthetic_{_size_label(n_rows)}_s{seed}_v{synthetic.GENERATOR_VERSION}.{fmt}"
+    return work_dir / "data" / name
+
+def ensure_dataset(work_dir: Path, n_rows: int, seed: int, fmt: str) -> Path:
+    path = dataset_path(work_dir, n_rows, seed, fmt)
+    if not path.exists():
+        t0 = time.perf_counter()
+        synthetic.write_workflow_log(synthetic.generate_workflow_log(n_rows, seed=seed), path)
+        print(f"生成 {path.name}: {time.perf_counter() - t0:.1f}s")
+    return path
+
+def _timed(func, repeat: int):
+    """"
+    执行 repeat 次，返回 (最后一次的返回值, 各次用时)
+    """
+    times = []
+    value = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - t0)
+    return value, times
+
+def benchmark_dataset(data_path: Path, repeat: int = 1) -> list:
+    """"
+    对一个数据文件计时全部环节，返回 [{"stage", "rows", "seconds", "runs"}, ...]
+
+    seconds 取 repeat 次中的最小值；中间结果按流水线的依赖顺序各计算一次，
+    表与图复用它们（与 pipeline.py 的执行方式一致）
+    """
+    stages = []
+
+    def record(stage, rows, func, times=repeat):
+        value, runs = _timed(func, times)
+        stages.append({"stage": stage, "rows": int(rows), "seconds": min(runs), "runs": runs})
+        print(f"  [{stage}] {min(runs):.3f}s")
+        return value
+
+    # ---------- 预处理 ----------
+    clear_aggregates()
+    df = record("preprocess_data", 0, lambda: preprocess_module.preprocess_data(
+        data_path, use_cache=False))
+    stages[-1]["rows"] = len(df)
+
+    if has_parquet():
+        cache_path = preprocess_module.cache_path_for(data_path)
+
+        def write_cache():
+            cache_path.unlink(missing_ok=True)
+            return preprocess_module.preprocess_data(data_path, use_cache=True)
+
+        record("preprocess_data (cache write)", len(df), write_cache)
+        df = record("preprocess_data (cache read)", len(df),
+                    lambda: preprocess_module.preprocess_data(data_path, use_cache=True))
+
+    # ---------- 工时计算 ----------
+    sample = df.head(SCALAR_SAMPLE_ROWS)
+    record("calc_work_hours", len(sample), lambda: [
+        calc_work_hours(st, ed)
+        for st, ed in zip(sample["dUPDATE_TIME"], sample["dNODE_TIME"])
+    ])
+    record("calc_work_hours_array", len(df),
+           lambda: calc_work_hours_array(df["dUPDATE_TIME"], df["dNODE_TIME"]))
+
+    # ---------- 共享中间结果（只计算一次） ----------
+    context = {"data_path": str(data_path), "use_cache": True, "headless": False, "df": df}
+    intermediates = [
+        name for name in resolve_order(TASKS)
+        if name not in context and not NODES[name]["task"]
+    ]
+    for name in intermediates:
+        spec = NODES[name]
+        args = [context[dep] for dep in spec["inputs"]]
+        context[name] = record(name, len(df), lambda: spec["func"](*args), times=1)
+
+    # ---------- 表 1 ~ 表 5 ----------
+    for name, calc in TASK1_CALCS.items():
+        record(name, len(df), lambda: calc(context))
+
+    # ---------- 表 1 ~ 表 5（SQL 引擎：建库一次，之后逐表查询） ----------
+    engine = sql_backend.resolve_engine("auto")
+    db_path = sql_backend.database_path_for(dataset_version(df), engine, "data/.sql",
+                                            df.attrs.get("source_prefix"))
+
+    def build_database():
+        db_path.unlink(missing_ok=True)
+        return sql_backend.RecordsDatabase(df, engine=engine, path=db_path)
+
+    db = record(f"sql_build_database[{engine}]", len(df), build_database, times=1)
+    for name in TASK1_CALCS:
+        record(f"{name}_sql[{engine}]", len(df), getattr(db, name))
+    db.close()
+
+    # ---------- 任务 1 / 任务 2 的输入（Polars 引擎：从源文件起的一组惰性查询） ----------
+    if polars_engine.has_polars():
+        record("polars_engine", len(df), lambda: polars_engine.compute(str(data_path)))
+
+    # ---------- 任务 2 / 任务 3 作图 ----------
+    for name in TASKS:
+        if name in TASK1_CALCS:
+            continue
+        spec = NODES[name]
+        args = [context[dep] for dep in spec["inputs"]]
+        record(name, len(df), lambda: spec["func"](*args))
+
+    clear_aggregates()
+    return stages
+
+def measure_imports(repeat: int = 1) -> list:
+    """"
+    在新的 Python 进程中计时各导入语句（取 repeat 次中的最短用时），
+    并检查只出表时是否加载了 matplotlib
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for stage, statement in IMPORT_PROBES.items():
+        code = (
+            "import sys, time; t0 = time.perf_counter(); " + statement + "; "
+            "print(time.perf_counter() - t0, 'matplotlib' in sys.modules)"
+        )
+        runs, loads_matplotlib = [], None
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", code], cwd=src_dir,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            runs.append(float(out[0]))
+            loads_matplotlib = out[1] == "True"
+        results.append({"stage": stage, "seconds": min(runs), "runs": runs,
+                        "matplotlib_loaded": loads_matplotlib})
+        print(f"  [{stage}] {min(runs):.3f}s")
+    return results
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "git_commit": _git_commit(),
+    }
+
+def run_benchmarks(sizes: list, work_dir: str = "data/.bench", fmt: str = "csv",
+                   seed: int = 0, repeat: int = 1) -> dict:
+    """"
+    依次计时各数据量，返回报告（可直接写成 JSON）
+
+    作图与结果文件写在 work_dir 下，不影响仓库中的 result/ 目录
+    """
+    work_dir = Path(work_dir).resolve()
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment_info(),
+        "generator_version": synthetic.GENERATOR_VERSION,
+        "seed": seed,
+        "repeat": repeat,
+        "runs": [],
+    }
+
+    print("冷启动导入")
+    report["imports"] = measure_imports(repeat=repeat)
+
+    cwd = os.getcwd()
+    try:
+        for n_rows in sizes:
+            data_path = ensure_dataset(work_dir, n_rows, seed, fmt).resolve()
+            print(f"数据量 {_size_label(n_rows)}（{data_path.name}）")
+            os.chdir(work_dir)
+            stages = benchmark_dataset(data_path, repeat=repeat)
+            os.chdir(cwd)
+            report["runs"].append({
+                "size": n_rows, "format": fmt, "data": data_path.name, "stages": stages,
+            })
+    finally:
+        os.chdir(cwd)
+    return report
+
+def compare_reports(current: dict, baseline: dict, threshold: float = 0.2,
+                    min_seconds: float = 0.05) -> list:
+    """"
+    对比两份报告中相同数据量、相同文件格式、相同环节的用时，返回变慢超过 threshold 的环节
+
+    两次都短于 min_seconds 的环节计时噪声大，不参与比较
+    """
+    old = {
+        (run["size"], run.get("format"), stage["stage"]): stage["seconds"]
+        for run in baseline["runs"] for stage in run["stages"]
+    }
+    regressions = []
+    for run in current["runs"]:
+        for stage in run["stages"]:
+            key = (run["size"], run.get("format"), stage["stage"])
+            if key not in old:
+                continue
+            before, after = old[key], stage["seconds"]
+            if max(before, after) < min_seconds:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append({
+                    "size": run["size"], "stage": stage["stage"],
+                    "baseline": before, "current": after, "ratio": after / before,
+                })
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成数据基准测试")
+    parser.add_argument("--sizes", default="10k,1m,10m", help="数据量，逗号分隔（如 10k,1m,10m）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个环节重复次数，取最短用时")
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv",
+                        help="合成数据文件格式（xlsx 最多约 100 万行）")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument("--work-dir", default="data/.bench", help="合成数据与作图输出目录")
+    parser.add_argument("--output", default=None,
+                        help="报告路径（默认 result/benchmark/benchmark_<时间>.json）")
+    parser.add_argument("--baseline", default=None, help="对比用的旧报告")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定变慢的比例（默认 20%%）")
+    args = parser.parse_args()
+
+    sizes = [parse_size(v) for v in args.sizes.split(",") if v.strip()]
+    report = run_benchmarks(sizes, work_dir=args.work_dir, fmt=args.format,
+                            seed=args.seed, repeat=args.repeat)
+
+    output = Path(args.output or
+                  f"result/benchmark/benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已保存: {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, threshold=args.threshold)
+        for r in regressions:
+            print(f"变慢 [{_size_label(r['size'])}] {r['stage']}: "
+                  f"{r['baseline']:.3f}s -> {r['current']:.3f}s（x{r['ratio']:.2f}）")
+        if regressions:
+            sys.exit(1)
+        print("未发现变慢的环节")
@@ -0,0 +1,108 @@
+# src/cache.py
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+from profiling import profile_stage
+
+
+def has_parquet() -> bool:
+    """是否安装了 Parquet 读写引擎（pyarrow）"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+@profile_stage("file_digest")
+def file_digest(path, chunk_size: int = 1 << 20) -> str:
+    """"
+    按块读取文件内容计算 sha256，避免一次性读入大文件
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def params_digest(params: dict) -> str:
+    """"
+    参数字典 -> 稳定的 sha256（键排序，无法序列化的值转为字符串）
+    """
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def source_prefix(data_path) -> str:
+    """"
+    源文件（或目录 / 通配符）的文件名前缀：<源文件名>_<完整路径的哈希>
+
+    用于按源区分共用一个目录的缓存、数据库与立方体：不同目录下的同名文件、同名不同扩展名的文件
+    前缀不同，只清理同一个源的旧版本
+    """
+    path = Path(data_path)
+    stem = re.sub(r"[^\w\-]", "_", path.stem) or "source"
+    return f"{stem}_{params_digest({'source': str(path.resolve())})[:8]}"
+
+@profile_stage("load_frame")
+def load_frame(path) -> pd.DataFrame | None:
+    """
+    读取缓存的 DataFrame；不存在或无法读取时返回 None
+    """
+    path = Path(path)
+    if not path.exists() or not has_parquet():
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        print(f"缓存读取失败，将重新计算: {path} ({e})")
+        return None
+
+@profile_stage("save_frame")
+def save_frame(df: pd.DataFrame, path, stale_pattern: str | None = None, index: bool = False) -> bool:
+    """"
+    将 DataFrame 写入 Parquet 缓存（先写临时文件再原子替换）
+    stale_pattern: 同目录下需要清理的旧缓存文件名模式
+    index: 同时保存索引（读取时由 load_frame 还原）
+    """
+    if not has_parquet():
+        return False
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    df.to_parquet(tmp_path, index=index)
+    os.replace(tmp_path, path)
+
+    if stale_pattern:
+        for old in path.parent.glob(stale_pattern):
+            if old != path:
+                old.unlink(missing_ok=True)
+    return True
+
+def write_shared_frame(df: pd.DataFrame, path) -> Path:
+    """"
+    将 DataFrame 写成未压缩的 Arrow IPC（Feather v2）文件，
+    供多个进程以内存映射方式读取，无需逐个任务 pickle 传输
+    """
+    import pyarrow as pa
+
+    path = Path(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+def read_shared_frame(path) -> pd.DataFrame:
+    """"
+    以内存映射方式读取 write_shared_frame 写出的文件
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas()
@@ -0,0 +1,421 @@
+# src/calendars.py
+"""
+可配置的排班日历：节假日、调休上班日、多个班次模板、按人员分配班次。
+
+未配置时沿用 utils.py 中固定的工作日历（周一 ~ 周六，8:30-12:00、13:00-18:00）；
+用 configure_calendar 指定配置文件后，calc_work_hours_array 等有效工时计算改用这里的日历，
+传入人员编号时按各人员自己的班次计算。
+
+配置文件（JSON）示例：
+    {
+      "default": "standard",
+      "shifts": {
+        "standard": {"periods": [["08:30", "12:00"], ["13:00", "18:00"]], "weekdays": [0, 1, 2, 3, 4, 5]},
+        "overtime": {"periods": [["08:30", "12:00"], ["13:00", "18:00"], ["19:00", "21:30"]]}
+      },
+      "holidays": ["2020-10-01~2020-10-08"],
+      "workdays": ["2020-09-27", "2020-10-10"],
+      "operators": {
+        "101": "overtime",
+        "102": [{"shift": "overtime", "start": "2020-07-20", "end": "2020-07-31"}, {"off": ["2020-07-15"]}]
+      }
+    }
+- shifts: 班次模板；periods 为一天内的工作时段（不跨零点，结束可写 24:00），
+  weekdays 为上班的星期（0 为周一，默认周一 ~ 周六）；缺省时只有一个与 utils.py 相同的 "default" 班次
+- holidays / workdays: 全体人员的节假日与调休上班日（"日期" 或 "起~止"，含两端）；
+  调休日不论星期都按当天的班次上班
+- operators: 人员 -> 班次名，或按顺序应用的分配列表（shift + 可选的 start / end 日期范围，
+  off 为该人员的休息日）；未列出的人员与日期使用 default 班次
+
+编译结果是每个“排班”（分配完全相同的人员共用一行）逐日的班次编号与累计工作纳秒数，
+按整年范围落盘到 data/.calendar/，各进程以内存映射方式读取同一份文件；
+任意时刻的累计工作时间只需按日期查一次表再加上当天的时段内时长，每个区间 O(1)。
+
+用法：
+    python src/calendars.py --calendar config/calendar.json --start 2020-01-01 --end 2020-12-31
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from cache import params_digest
+from utils import NS_PER_DAY, NS_PER_SECOND, WORK_PERIODS, work_ns_to_hours, work_periods_ns
+
+
+# 编译结果的落盘目录
+CALENDAR_DIR = "data/.calendar"
+
+# 编译格式变更时递增，使旧的落盘结果失效
+CALENDAR_VERSION = 1
+
+# 未配置 weekdays 时的上班星期（同 utils.is_workday：周一 ~ 周六）
+DEFAULT_WEEKDAYS = [0, 1, 2, 3, 4, 5]
+
+# 当前生效的排班日历（None 表示使用 utils.py 的固定日历）
+_active = {"calendar": None, "path": None}
+
+
+def _parse_time(value: str) -> int:
+    """"HH:MM" / "HH:MM:SS" -> 当天 00:00 起算的纳秒数（允许 24:00）"""
+    parts = [int(p) for p in str(value).split(":")]
+    if len(parts) not in (2, 3) or not (0 <= parts[0] <= 24) or any(not 0 <= p < 60 for p in parts[1:]):
+        raise ValueError(f"无法识别的时间: {value}")
+    seconds = parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) == 3 else 0)
+    if seconds > 86400:
+        raise ValueError(f"无法识别的时间: {value}")
+    return seconds * NS_PER_SECOND
+
+def _parse_days(specs: list) -> np.ndarray:
+    """"日期" / "起~止" 列表 -> 纪元日数组"""
+    days = []
+    for spec in specs or []:
+        start, _, end = str(spec).partition("~")
+        try:
+            first = pd.Timestamp(start.strip()).value // NS_PER_DAY
+            last = pd.Timestamp(end.strip()).value // NS_PER_DAY if end else first
+        except ValueError:
+            raise ValueError(f"无法识别的日期: {spec}") from None
+        if last < first:
+            raise ValueError(f"日期范围的结束早于开始: {spec}")
+        days.extend(range(first, last + 1))
+    return np.array(sorted(set(days)), dtype=np.int64)
+
+def _day_of(value) -> int | None:
+    if value is None:
+        return None
+    try:
+        return pd.Timestamp(value).value // NS_PER_DAY
+    except ValueError:
+        raise ValueError(f"无法识别的日期: {value}") from None
+
+def _operator_key(value) -> str:
+    """人员编号统一为字符串键（配置文件中为 "101"，记录中的 iUSER_ID 为数值 101 或 101.0）"""
+    try:
+        return str(int(float(value)))
+    except (TypeError, ValueError):
+        return str(value)
+
+def load_calendar_config(path) -> dict:
+    """"
+    读取并校验配置文件，返回规范化的配置：
+    {"default", "shifts": {名称: {"periods": [(开始, 结束) ns], "weekdays"}},
+     "holidays", "workdays": [纪元日], "operators": {人员: [分配, ...]}}
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return normalize_config(raw)
+
+def normalize_config(raw: dict) -> dict:
+    """配置字典（同配置文件的结构）-> 规范化的配置；格式错误时抛出 ValueError"""
+    unknown = set(raw) - {"default", "shifts", "holidays", "workdays", "operators"}
+    if unknown:
+        raise ValueError(f"未知的配置项: {', '.join(sorted(unknown))}")
+
+    raw_shifts = raw.get("shifts") or {
+        "default": {"periods": [(a.isoformat(), b.isoformat()) for a, b in WORK_PERIODS]}
+    }
+    shifts = {}
+    for name, spec in raw_shifts.items():
+        periods = sorted((_parse_time(a), _parse_time(b)) for a, b in spec.get("periods", []))
+        for (a, b), nxt in zip(periods, periods[1:] + [(None, None)]):
+            if a >= b:
+                raise ValueError(f"班次 {name} 的时段结束须晚于开始（不支持跨零点）")
+            if nxt[0] is not None and nxt[0] < b:
+                raise ValueError(f"班次 {name} 的时段有重叠")
+        weekdays = sorted(set(spec.get("weekdays", DEFAULT_WEEKDAYS)))
+        if any(not 0 <= d <= 6 for d in weekdays):
+            raise ValueError(f"班次 {name} 的 weekdays 应为 0（周一）~ 6（周日）")
+        shifts[name] = {"periods": periods, "weekdays": weekdays}
+
+    default = raw.get("default", next(iter(shifts)))
+    if default not in shifts:
+        raise ValueError(f"未定义的默认班次: {default}")
+
+    holidays = _parse_days(raw.get("holidays"))
+    workdays = _parse_days(raw.get("workdays"))
+    both = np.intersect1d(holidays, workdays)
+    if len(both):
+        raise ValueError(f"以下日期同时是节假日与调休上班日: {pd.to_datetime(both * NS_PER_DAY).date.tolist()}")
+
+    operators = {}
+    for user, spec in (raw.get("operators") or {}).items():
+        items = [{"shift": spec}] if isinstance(spec, str) else list(spec)
+        assignments = []
+        for item in items:
+            shift = item.get("shift")
+            if shift is not None and shift not in shifts:
+                raise ValueError(f"人员 {user} 分配了未定义的班次: {shift}")
+            assignments.append({
+                "shift": shift,
+                "start": _day_of(item.get("start")),
+                "end": _day_of(item.get("end")),
+                "off": _parse_days(item.get("off")).tolist(),
+            })
+        operators[_operator_key(user)] = assignments
+
+    return {
+        "default": default,
+        "shifts": shifts,
+        "holidays": holidays.tolist(),
+        "workdays": workdays.tolist(),
+        "operators": operators,
+    }
+
+
+class ShiftCalendar:
+    """"
+    编译后的排班日历
+
+    - schedules: 不同的排班（分配列表），第 0 行为未列出人员使用的默认排班
+    - rows:      人员 -> 排班行号
+    - periods:   (班次数 + 1, 最多时段数, 2) 的时段表（ns），最后一行全 0，供“休息”（-1）查表
+    - first_day, day_shift (排班数, 天数)、cum_ns (排班数, 天数 + 1)：按需编译的逐日索引
+    """
+
+    def __init__(self, config: dict, cache_dir: str | None = CALENDAR_DIR):
+        self.config = config
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.digest = params_digest({"version": CALENDAR_VERSION, "config": config})[:16]
+
+        self.shift_names = list(config["shifts"])
+        max_periods = max([len(s["periods"]) for s in config["shifts"].values()] + [1])
+        periods = np.zeros((len(self.shift_names) + 1, max_periods, 2), dtype=np.int64)
+        for i, name in enumerate(self.shift_names):
+            for j, (a, b) in enumerate(config["shifts"][name]["periods"]):
+                periods[i, j] = (a, b)
+        self.periods = periods
+        self.day_ns = (periods[:, :, 1] - periods[:, :, 0]).sum(axis=1)
+
+        # 分配完全相同的人员共用一行
+        self.schedules = [[]]
+        self.rows = {}
+        seen = {"[]": 0}
+        for user, assignments in config["operators"].items():
+            key = json.dumps(assignments, sort_keys=True)
+            if key not in seen:
+                seen[key] = len(self.schedules)
+                self.schedules.append(assignments)
+            self.rows[user] = seen[key]
+
+        self.first_day = 0
+        self.day_shift = np.zeros((len(self.schedules), 0), dtype=np.int16)
+        self.cum_ns = np.zeros((len(self.schedules), 1), dtype=np.int64)
+
+    @classmethod
+    def from_file(cls, path, cache_dir: str | None = CALENDAR_DIR) -> "ShiftCalendar":
+        return cls(load_calendar_config(path), cache_dir)
+
+    # ---------- 编译 ----------
+    def _compile(self, first_day: int, last_day: int):
+        """逐日的班次编号（-1 为休息）与累计工作纳秒数"""
+        config = self.config
+        days = np.arange(first_day, last_day + 1, dtype=np.int64)
+        weekday = (days + 3) % 7  # 1970-01-01 为周四
+        holiday = np.isin(days, config["holidays"])
+        makeup = np.isin(days, config["workdays"])
+
+        shift_index = {name: i for i, name in enumerate(self.shift_names)}
+        works_on = np.zeros((len(self.shift_names), 7), dtype=bool)
+        for name, i in shift_index.items():
+            works_on[i, config["shifts"][name]["weekdays"]] = True
+
+        day_shift = np.empty((len(self.schedules), len(days)), dtype=np.int16)
+        for row, assignments in enumerate(self.schedules):
+            shift = np.full(len(days), shift_index[config["default"]], dtype=np.int16)
+            off = holiday.copy()
+            for item in assignments:
+                in_range = np.ones(len(days), dtype=bool)
+                if item["start"] is not None:
+                    in_range &= days >= item["start"]
+                if item["end"] is not None:
+                    in_range &= days <= item["end"]
+                if item["shift"] is not None:
+                    shift[in_range] = shift_index[item["shift"]]
+                off |= np.isin(days, item["off"])
+            working = (works_on[shift, weekday] | makeup) & ~off
+            day_shift[row] = np.where(working, shift, -1)
+
+        day_len = self.day_ns[day_shift]
+        cum_ns = np.zeros((len(self.schedules), len(days) + 1), dtype=np.int64)
+        np.cumsum(day_len, axis=1, out=cum_ns[:, 1:])
+        return day_shift, cum_ns
+
+    def _index_dir(self, first_day: int, last_day: int) -> Path:
+        return self.cache_dir / f"{self.digest}_{first_day}_{last_day}"
+
+    def _load_or_compile(self, first_day: int, last_day: int):
+        """读取落盘的索引（内存映射，多个进程共享同一份页缓存），不存在时编译并落盘"""
+        if self.cache_dir is None:
+            return self._compile(first_day, last_day)
+
+        index_dir = self._index_dir(first_day, last_day)
+        try:
+            return (np.load(index_dir / "day_shift.npy", mmap_mode="r"),
+                    np.load(index_dir / "cum_ns.npy", mmap_mode="r"))
+        except (OSError, ValueError):
+            pass
+
+        day_shift, cum_ns = self._compile(first_day, last_day)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp_"))
+        try:
+            np.save(tmp_dir / "day_shift.npy", day_shift)
+            np.save(tmp_dir / "cum_ns.npy", cum_ns)
+            os.replace(tmp_dir, index_dir)
+        except OSError:
+            # 其他进程已写好同一份索引
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return day_shift, cum_ns
+
+    def ensure(self, first_day: int, last_day: int) -> "ShiftCalendar":
+        """"
+        确保索引覆盖 [first_day, last_day]（纪元日）；按整年范围编译，同一数据集的查询共用一份索引
+        """
+        cur_last = self.first_day + self.day_shift.shape[1] - 1
+        if self.day_shift.shape[1] and self.first_day <= first_day and last_day <= cur_last:
+            return self
+        if self.day_shift.shape[1]:
+            first_day, last_day = min(first_day, self.first_day), max(last_day, cur_last)
+
+        first_year = pd.Timestamp(first_day * NS_PER_DAY).year
+        last_year = pd.Timestamp(last_day * NS_PER_DAY).year
+        first_day = pd.Timestamp(f"{first_year}-01-01").value // NS_PER_DAY
+        last_day = pd.Timestamp(f"{last_year}-12-31").value // NS_PER_DAY
+
+        self.day_shift, self.cum_ns = self._load_or_compile(first_day, last_day)
+        self.first_day = first_day
+        return self
+
+    # ---------- 查询 ----------
+    def rows_for(self, operators, n: int) -> np.ndarray:
+        """人员编号 -> 排班行号（None、缺失或未列出的人员为默认排班 0）"""
+        if operators is None:
+            return np.zeros(n, dtype=np.int64)
+        codes, uniques = pd.factorize(pd.Series(np.asarray(operators).ravel()))
+        lookup = np.array([self.rows.get(_operator_key(u), 0) for u in uniques] + [0], dtype=np.int64)
+        return lookup[codes]
+
+    def positions(self, times, operators=None) -> np.ndarray:
+        """"
+        时间 -> 所属人员排班的工作时间轴上的位置（索引起点起累计的工作纳秒数），缺失为 -1
+
+        同一次调用内的位置可以相减；不同调用之间索引可能扩展，请把需要相减的时刻放在同一次调用中
+        """
+        t = np.asarray(pd.to_datetime(np.asarray(times).ravel()), dtype="datetime64[ns]")
+        valid = ~np.isnat(t)
+        t_ns = t.view(np.int64)
+        out = np.full(len(t_ns), -1, dtype=np.int64)
+        if not valid.any():
+            return out
+
+        rows = self.rows_for(operators, len(t_ns))[valid]
+        t_ns = t_ns[valid]
+        day = t_ns // NS_PER_DAY
+        self.ensure(int(day.min()), int(day.max()))
+
+        idx = day - self.first_day
+        shift = self.day_shift[rows, idx]
+        tod = (t_ns - day * NS_PER_DAY)[:, None]
+        spans = self.periods[shift]  # 休息日（-1）取到最后一行的全 0 时段
+        intraday = np.clip(tod - spans[:, :, 0], 0, spans[:, :, 1] - spans[:, :, 0]).sum(axis=1)
+        out[valid] = self.cum_ns[rows, idx] + intraday
+        return out
+
+    def work_hours(self, st, ed, operators=None) -> np.ndarray:
+        """"
+        start ~ end 之间的有效工作时长（h，保留 6 位小数），按各行人员的排班计算；
+        缺失值或 start >= end 时为 0（同 utils.calc_work_hours_array）
+        """
+        st = np.asarray(pd.to_datetime(np.asarray(st).ravel()), dtype="datetime64[ns]")
+        ed = np.asarray(pd.to_datetime(np.asarray(ed).ravel()), dtype="datetime64[ns]")
+        if st.shape != ed.shape:
+            raise ValueError("st 与 ed 长度不一致")
+        n = len(st)
+        if operators is not None:
+            operators = np.asarray(operators).ravel()
+            operators = np.concatenate([operators, operators])
+        pos = self.positions(np.concatenate([st, ed]), operators)
+        valid = ~(np.isnat(st) | np.isnat(ed)) & (st < ed)
+        return np.where(valid, work_ns_to_hours(pos[n:] - pos[:n]), 0.0)
+
+    def day_table(self, first_day: int, last_day: int, operator=None) -> pd.DataFrame:
+        """某人员（None 为默认排班）逐日的班次与当天工作时长"""
+        self.ensure(first_day, last_day)
+        row = self.rows.get(_operator_key(operator), 0) if operator is not None else 0
+        idx = np.arange(first_day, last_day + 1) - self.first_day
+        shift = np.asarray(self.day_shift[row, idx])
+        names = np.array(self.shift_names + [""], dtype=object)
+        return pd.DataFrame({
+            "date": pd.to_datetime(np.arange(first_day, last_day + 1) * NS_PER_DAY),
+            "shift": names[shift],
+            "work_hours": work_ns_to_hours(self.day_ns[shift]),
+        })
+
+
+# ======================
+# 当前生效的日历
+# ======================
+def configure_calendar(path=None, cache_dir: str | None = CALENDAR_DIR):
+    """"
+    指定排班配置文件；path 为 None 时恢复 utils.py 的固定日历
+    """
+    if path is None:
+        _active.update(calendar=None, path=None)
+        return
+    _active.update(calendar=ShiftCalendar.from_file(path, cache_dir), path=str(path))
+
+def active_calendar() -> ShiftCalendar | None:
+    """当前生效的排班日历（未配置时为 None）"""
+    return _active["calendar"]
+
+def calendar_settings() -> dict:
+    """当前日历设置（传给工作进程，使其使用同一份配置与落盘索引）"""
+    calendar = _active["calendar"]
+    return {"path": _active["path"], "cache_dir": None if calendar is None else calendar.cache_dir}
+
+def workday_hours() -> float:
+    """"
+    一个工作日的有效工作时长（h）：配置了排班日历时为其 default 班次各时段的合计，
+    否则为 utils.py 固定工作时段的合计
+    """
+    calendar = _active["calendar"]
+    if calendar is None:
+        day_ns = sum(b - a for a, b in work_periods_ns())
+    else:
+        day_ns = calendar.day_ns[calendar.shift_names.index(calendar.config["default"])]
+    return float(day_ns) / NS_PER_SECOND / 3600
+
+def require_fixed_calendar(engine: str):
+    """只支持 utils.py 固定日历的计算引擎在配置了排班日历时报错，而不是给出不一致的工时"""
+    if _active["calendar"] is not None:
+        raise ValueError(f"{engine} 引擎只支持固定工作日历，配置了排班日历（{_active['path']}）时请使用 pandas 引擎")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="编译排班日历并查看各人员的逐日工作时长")
+    parser.add_argument("--calendar", required=True, help="排班配置文件（JSON）")
+    parser.add_argument("--start", required=True, help="起始日期（含）")
+    parser.add_argument("--end", required=True, help="结束日期（含）")
+    parser.add_argument("--operator", action="append", default=[], help="查看指定人员（可重复；默认只看默认排班）")
+    parser.add_argument("--cache-dir", default=CALENDAR_DIR, help="编译结果目录（默认 data/.calendar）")
+    args = parser.parse_args()
+
+    try:
+        calendar = ShiftCalendar.from_file(args.calendar, args.cache_dir)
+        first_day, last_day = _day_of(args.start), _day_of(args.end)
+    except ValueError as e:
+        parser.error(str(e))
+
+    calendar.ensure(first_day, last_day)
+    print(f"{len(calendar.shift_names)} 个班次，{len(calendar.schedules)} 种排班，"
+          f"{len(calendar.rows)} 名人员有单独分配")
+    for operator in [None] + args.operator:
+        table = calendar.day_table(first_day, last_day, operator)
+        label = "默认排班" if operator is None else f"人员 {operator}"
+        print(f"{label}: {int((table['work_hours'] > 0).sum())} 个工作日，共 {table['work_hours'].sum():.2f} h")
@@ -0,0 +1,314 @@
+# src/clustering.py
+"""
+任务 3.2 聚类的可扩展模式：大样本用 MiniBatchKMeans，多个 k 并行评估，选定的模型落盘后增量分配。
+
+- 粒度：operator（每个人员一行，同任务 3.2）或 operator_day（每个「人员 × 日期」一行，
+  数据量大时可达数十万个点），特征见 features.py
+- 拟合：样本数不超过 MINIBATCH_THRESHOLD 时用 KMeans（与任务 3.2 原来的结果一致），
+  超过时用 MiniBatchKMeans 按小批量更新
+- 选 k：每个候选 k 在独立的进程中拟合，给出全量的 inertia 与抽样子集上的轮廓系数
+  （轮廓系数为 O(n²)，所有 k 共用同一个抽样子集以便比较），取轮廓系数最大的 k
+- 模型：标准化参数 + 聚类中心保存为 data/.models/<名称>/ 下的 model.json 与 model.npz，
+  之后的新数据只需按同一标准化找最近的中心，不必重新拟合
+
+用法：
+    python src/clustering.py fit --level operator_day --k auto --k-range 2-10 --jobs 4
+    python src/clustering.py assign --model data/.models/operator_day_basic --data data/new.xlsx
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from features import BASIC_FEATURES, EXTENDED_FEATURES, operator_features
+from profiling import profile_stage, timed_import
+
+
+MODEL_DIR = "data/.models"
+
+# 模型文件格式变更时递增
+MODEL_VERSION = 1
+
+# 聚类粒度 -> 特征表的键
+LEVELS = {
+    "operator": ["iUSER_ID"],
+    "operator_day": ["iUSER_ID", "finish_date"],
+}
+
+# 默认的候选 k
+K_RANGE = range(2, 11)
+
+# 样本数超过该值时改用 MiniBatchKMeans
+MINIBATCH_THRESHOLD = 20_000
+MINIBATCH_SIZE = 4096
+
+# 计算轮廓系数的抽样点数
+SILHOUETTE_SAMPLE = 10_000
+
+
+def parse_k_range(text: str) -> list:
+    """"
+    "2-10" / "3,5,8" -> 候选 k 的列表
+    """
+    values = []
+    for part in text.split(","):
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            values.extend(range(int(lo), int(hi) + 1))
+        else:
+            values.append(int(part))
+    values = sorted(set(values))
+    if not values or values[0] < 2:
+        raise ValueError(f"候选 k 须不小于 2: {text!r}")
+    return values
+
+def _make_estimator(k: int, n_rows: int, seed: int):
+    cluster = timed_import("sklearn.cluster")
+    if n_rows > MINIBATCH_THRESHOLD:
+        return cluster.MiniBatchKMeans(n_clusters=k, batch_size=MINIBATCH_SIZE, n_init=3, random_state=seed)
+    return cluster.KMeans(n_clusters=k, random_state=seed)
+
+
+# ======================
+# 选 k（进程池）
+# ======================
+# 工作进程中共享的标准化矩阵与抽样下标，只在进程启动时传入一次
+_shared = {}
+
+def _init_worker(X: np.ndarray, sample: np.ndarray):
+    _shared["X"] = X
+    _shared["sample"] = sample
+
+def _evaluate_k(k: int, seed: int) -> dict:
+    X, sample = _shared["X"], _shared["sample"]
+    silhouette_score = timed_import("sklearn.metrics").silhouette_score
+    estimator = _make_estimator(k, len(X), seed)
+    labels = estimator.fit_predict(X)
+    sampled = labels[sample]
+    silhouette = silhouette_score(X[sample], sampled) if len(np.unique(sampled)) > 1 else np.nan
+    return {
+        "k": k,
+        "inertia": float(estimator.inertia_),
+        "silhouette": float(silhouette),
+        "最小簇占比": float(np.bincount(labels, minlength=k).min() / len(labels)),
+    }
+
+@profile_stage("select_k")
+def select_k(X: np.ndarray, k_range=K_RANGE, sample_size: int = SILHOUETTE_SAMPLE,
+             seed: int = 42, jobs: int | None = None) -> pd.DataFrame:
+    """"
+    标准化后的矩阵 -> 每个候选 k 一行：inertia（全量）、silhouette（抽样子集）、最小簇占比
+
+    jobs: 进程数（默认 CPU 核数）；为 1 时在当前进程中依次评估
+    各候选 k 使用相同的随机数种子与抽样子集，结果与进程数无关
+    """
+    k_values = [k for k in k_range if k < len(X)]
+    if not k_values:
+        raise ValueError(f"样本数 {len(X)} 不足以评估候选 k: {list(k_range)}")
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(len(X), size=min(sample_size, len(X)), replace=False))
+
+    jobs = min(jobs or os.cpu_count() or 1, len(k_values))
+    if jobs <= 1:
+        _init_worker(X, sample)
+        try:
+            rows = [_evaluate_k(k, seed) for k in k_values]
+        finally:
+            _shared.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(X, sample)) as pool:
+            rows = list(pool.map(_evaluate_k, k_values, [seed] * len(k_values)))
+    return pd.DataFrame(rows)
+
+def best_k(scores: pd.DataFrame) -> int:
+    """"
+    轮廓系数最大的 k（相同时取较小的 k）
+    """
+    ranked = scores.dropna(subset=["silhouette"]).sort_values(["silhouette", "k"], ascending=[False, True])
+    if ranked.empty:
+        return int(scores["k"].min())
+    return int(ranked["k"].iloc[0])
+
+
+# ======================
+# 模型
+# ======================
+class ClusterModel:
+    """"
+    标准化参数 + 聚类中心（标准化空间）；assign 按最近中心分配新数据，不重新拟合
+    """
+
+    def __init__(self, columns: list, mean: np.ndarray, scale: np.ndarray, centroids: np.ndarray,
+                 level: str = "operator", scores: pd.DataFrame | None = None):
+        self.columns = list(columns)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.level = level
+        self.scores = scores
+        # 拟合时各样本的簇编号（只在 fit 得到的模型上有）
+        self.labels = None
+
+    @property
+    def k(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    @profile_stage("cluster_fit")
+    def fit(cls, features: pd.DataFrame, columns: list, k: int, seed: int = 42,
+            level: str = "operator", scores: pd.DataFrame | None = None) -> "ClusterModel":
+        """"
+        特征表 -> 拟合好的模型；样本数不超过 MINIBATCH_THRESHOLD 时与
+        StandardScaler + KMeans(n_clusters=k, random_state=seed) 的结果一致
+        """
+        scaler = timed_import("sklearn.preprocessing").StandardScaler()
+        X = scaler.fit_transform(features[columns])
+        estimator = _make_estimator(k, len(X), seed)
+        labels = estimator.fit_predict(X)
+        model = cls(columns, scaler.mean_, scaler.scale_, estimator.cluster_centers_, level, scores)
+        model.labels = labels
+        return model
+
+    def transform(self, features: pd.DataFrame) -> np.ndarray:
+        missing = [col for col in self.columns if col not in features.columns]
+        if missing:
+            raise ValueError(f"特征表缺少模型使用的列: {missing}")
+        return (features[self.columns].to_numpy(dtype=np.float64) - self.mean) / self.scale
+
+    def assign(self, features: pd.DataFrame) -> np.ndarray:
+        """"
+        特征表 -> 各行最近的聚类中心编号
+        """
+        X = self.transform(features)
+        # |x - c|² = |x|² - 2 x·c + |c|²，|x|² 对各中心相同，不影响 argmin
+        distance = (self.centroids ** 2).sum(axis=1) - 2 * X @ self.centroids.T
+        return distance.argmin(axis=1)
+
+    def centers(self) -> pd.DataFrame:
+        """"
+        聚类中心（还原为原始单位），每个簇一行
+        """
+        centers = pd.DataFrame(self.centroids * self.scale + self.mean, columns=self.columns)
+        centers.insert(0, "cluster", range(self.k))
+        return centers
+
+    # ---------- 落盘 ----------
+    def save(self, path) -> Path:
+        """"
+        保存为目录 path 下的 model.json（列、粒度、选 k 结果）与 model.npz（数值参数）
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.savez(path / "model.npz", mean=self.mean, scale=self.scale, centroids=self.centroids)
+        meta = {
+            "version": MODEL_VERSION,
+            "level": self.level,
+            "k": self.k,
+            "columns": self.columns,
+            "scores": None if self.scores is None else self.scores.to_dict(orient="records"),
+        }
+        with open(path / "model.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path) -> "ClusterModel":
+        path = Path(path)
+        with open(path / "model.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != MODEL_VERSION:
+            raise ValueError(f"模型格式版本不符（{meta.get('version')} != {MODEL_VERSION}），请重新拟合: {path}")
+        arrays = np.load(path / "model.npz")
+        scores = None if meta["scores"] is None else pd.DataFrame(meta["scores"])
+        return cls(meta["columns"], arrays["mean"], arrays["scale"], arrays["centroids"], meta["level"], scores)
+
+
+def level_features(df_valid: pd.DataFrame, level: str = "operator", extended: bool = False) -> pd.DataFrame:
+    """"
+    有效完成记录 -> 指定粒度的特征表
+    """
+    if level not in LEVELS:
+        raise ValueError(f"未知的聚类粒度: {level!r}（可选 {', '.join(LEVELS)}）")
+    return operator_features(df_valid, extended=extended, keys=LEVELS[level])
+
+def fit_clusters(features: pd.DataFrame, columns: list, k="auto", k_range=K_RANGE,
+                 sample_size: int = SILHOUETTE_SAMPLE, seed: int = 42, jobs: int | None = None,
+                 level: str = "operator") -> ClusterModel:
+    """"
+    特征表 -> 模型；k 为 "auto" 时先在 k_range 上并行评估（select_k），取轮廓系数最大的 k
+    """
+    scores = None
+    if k == "auto":
+        scaler = timed_import("sklearn.preprocessing").StandardScaler()
+        scores = select_k(scaler.fit_transform(features[columns]), k_range, sample_size, seed, jobs)
+        k = best_k(scores)
+    return ClusterModel.fit(features, columns, int(k), seed, level, scores)
+
+
+if __name__ == "__main__":
+    import importlib.util
+    from aggregates import get_aggregate
+    from result_writer import FORMATS, OVERSIZE_MODES, configure_output, write_result
+
+    parser = argparse.ArgumentParser(description="可扩展聚类：MiniBatchKMeans、并行选 k、模型落盘与增量分配")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit_parser = sub.add_parser("fit", help="拟合并保存模型")
+    fit_parser.add_argument("--level", choices=list(LEVELS), default="operator", help="聚类粒度（默认 operator）")
+    fit_parser.add_argument("--features", choices=["basic", "extended"], default="basic", help="特征集（默认 basic）")
+    fit_parser.add_argument("--k", default="auto", help="簇数，或 auto 按轮廓系数选择（默认 auto）")
+    fit_parser.add_argument("--k-range", default="2-10", help="auto 时的候选 k，如 2-10 或 3,5,8（默认 2-10）")
+    fit_parser.add_argument("--sample", type=int, default=SILHOUETTE_SAMPLE,
+                            help=f"计算轮廓系数的抽样点数（默认 {SILHOUETTE_SAMPLE}）")
+    fit_parser.add_argument("--jobs", type=int, default=None, help="选 k 的进程数（默认 CPU 核数）")
+    fit_parser.add_argument("--seed", type=int, default=42, help="随机数种子（默认 42）")
+    fit_parser.add_argument("--model", default=None,
+                            help=f"模型目录（默认 {MODEL_DIR}/<粒度>_<特征集>）")
+    assign_parser = sub.add_parser("assign", help="用已保存的模型分配新数据")
+    assign_parser.add_argument("--model", required=True, help="模型目录")
+    for p in (fit_parser, assign_parser):
+        p.add_argument("--data", default="data/data.xlsx",
+                       help="原始数据文件路径（也可以是目录或通配符，合并多个导出文件）")
+        p.add_argument("--output", default="result/clusters.xlsx", help="结果文件路径")
+        p.add_argument("--output-format", choices=FORMATS, default=None, help="结果格式（默认 xlsx）")
+        p.add_argument("--oversize", choices=OVERSIZE_MODES, default=None,
+                       help="xlsx 工作表超过行数上限时：split 拆分 / error 报错（默认 split）")
+    args = parser.parse_args()
+    configure_output(args.output_format, args.oversize)
+
+    spec = importlib.util.spec_from_file_location(
+        "preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py")
+    )
+    preprocess_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(preprocess_module)
+
+    df = preprocess_module.preprocess_data(args.data)
+    df_valid = get_aggregate(df, "processing_records")
+
+    if args.command == "fit":
+        columns = BASIC_FEATURES if args.features == "basic" else EXTENDED_FEATURES
+        features = level_features(df_valid, args.level, extended=args.features == "extended")
+        k = args.k if args.k == "auto" else int(args.k)
+        model = fit_clusters(features, columns, k, parse_k_range(args.k_range), args.sample,
+                             args.seed, args.jobs, args.level)
+        features["cluster"] = model.labels
+        model_dir = model.save(args.model or Path(MODEL_DIR) / f"{args.level}_{args.features}")
+        print(f"{len(features)} 个样本，k = {model.k}，模型已保存: {model_dir}")
+    else:
+        model = ClusterModel.load(args.model)
+        features = level_features(df_valid, model.level,
+                                  extended=any(col not in BASIC_FEATURES for col in model.columns))
+        features["cluster"] = model.assign(features)
+        print(f"{len(features)} 个样本按 {args.model} 的 {model.k} 个中心分配")
+
+    sheets = {"聚类结果": features, "聚类中心": model.centers().round(6)}
+    if model.scores is not None:
+        sheets["k 选择"] = model.scores.round(6)
+        with pd.option_context("display.width", 200):
+            print(model.scores.to_string(index=False))
+    if "finish_date" in features.columns:
+        features["finish_date"] = features["finish_date"].dt.date
+    print(f"已保存: {write_result(sheets, Path(args.output))}")
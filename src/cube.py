@@ -0,0 +1,447 @@
+# src/cube.py
+"""
+预聚合立方体：全部记录按 完成日期 × 工序 × 人员 × 状态 汇总一次并落盘，
+任务 1.3 ~ 1.5、2.1、2.3、2.4 的案卷数与临时的切片 / 上卷查询都由它回答，不必重新扫描记录。
+
+每个单元格（各维度取值的一个组合，维度缺失也单独成格）保存：
+- records：记录数
+- work_uh：工时合计（微小时整数，上卷时精确相加）
+- 案卷集合：单元格内出现过的案卷编号（按案卷字典编码，格内有序），
+  所有单元格首尾相接存成一个数组 + 偏移量（即稀疏位图的数组容器）。
+  去重案卷数不能直接相加，上卷时先对集合求并再计数，返工案卷即状态 5 的单元格的并集
+
+批次时长（任务 1.4 / 1.5 / 2.2 的耗时）是批次内最早领取到最晚提交的跨度，
+不能按日期 / 人员拆开再相加，仍由 batch_time 计算。
+
+用法：
+    python src/cube.py build --data data/data.xlsx
+    python src/cube.py query --by 工序 --where iNODE_STATUS=2,5
+    python src/cube.py query --by finish_date,工序 --start-date 2020-07-06 --end-date 2020-07-19
+    python src/cube.py query --by iUSER_ID --where 工序=图像处理 --measures archives,rework_archives
+"""
+
+import argparse
+import copy
+import glob
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from cache import has_parquet, source_prefix
+from profiling import profile_stage
+from utils import hours_to_micro
+
+
+DIMENSIONS = ["finish_date", "工序", "iUSER_ID", "iNODE_STATUS"]
+MEASURES = ["records", "work_hours", "archives", "rework_archives"]
+
+# 立方体结构变更时递增
+CUBE_VERSION = 1
+
+CUBE_DIR = "data/.cube"
+
+REWORK_STATUS = 5
+FINISHED_STATUSES = [2, 5]
+
+# SortedSegments.agg 的 where 标志列 -> 状态条件
+_STATUS_FLAGS = {"is_rework": [REWORK_STATUS], "is_finished": FINISHED_STATUSES}
+
+
+def cube_path_for(version: str, cube_dir: str = CUBE_DIR, source: str | None = None) -> Path:
+    """"
+    数据集版本对应的立方体目录：<cube_dir>/cube_<源前缀>_<数据集版本>
+
+    source: 源前缀（cache.source_prefix，即 preprocess_data 写入的 df.attrs["source_prefix"]）；
+            来源不明的数据（如存储库查询结果）为 None，目录为 <cube_dir>/cube_<数据集版本>
+    """
+    name = f"cube_{source}_{version}" if source else f"cube_{version}"
+    return Path(cube_dir) / name
+
+def _remove_stale_cubes(path: Path, source: str):
+    """"
+    删除同一个源的旧版本立方体（cube_<源前缀>_ + 16 位十六进制版本号），只保留 path
+
+    其他源（其他文件、其他导出目录、来源不明的查询结果）的立方体不受影响
+    """
+    for old in path.parent.glob(f"cube_{glob.escape(source)}_{'[0-9a-f]' * 16}"):
+        if old != path and old.is_dir():
+            shutil.rmtree(old, ignore_errors=True)
+
+def _key_codes(column: pd.Series):
+    """维度列 -> (排序后的整数编码, 不同值个数)，缺失编码为不同值个数（排在最后）"""
+    codes, uniques = pd.factorize(column, sort=True)
+    codes = codes.astype(np.int64)
+    codes[codes < 0] = len(uniques)
+    return codes, len(uniques)
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """多个 [start, start + length) 区间首尾相接后的下标"""
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return shift + np.arange(total)
+
+def _count_distinct(groups: np.ndarray, ids: np.ndarray, n_groups: int, n_ids: int) -> np.ndarray:
+    """"
+    每组的不同编号个数：组合值空间不大时用位图去重，否则哈希去重
+    """
+    pairs = groups.astype(np.int64) * max(n_ids, 1) + ids
+    if n_groups * n_ids <= 8 * len(pairs):
+        seen = np.zeros(n_groups * n_ids, dtype=bool)
+        seen[pairs] = True
+        pairs = np.flatnonzero(seen)
+    else:
+        pairs = pd.unique(pairs)
+    return np.bincount(pairs // max(n_ids, 1), minlength=n_groups)
+
+
+class ArchiveCube:
+    """"
+    日期 × 工序 × 人员 × 状态 立方体（见模块说明）
+
+    restrict 得到的子立方体与原立方体共用数据，只记录单元格与案卷的筛选条件；
+    agg 与 SortedSegments.agg 的（案卷去重计数）用法一致，可直接代替完成记录传给各任务
+    """
+
+    def __init__(self, cells: pd.DataFrame, offsets: np.ndarray, archive_ids: np.ndarray,
+                 archives: pd.Index, version: str | None = None):
+        self.cells = cells
+        self.offsets = offsets
+        self.archive_ids = archive_ids
+        self.archives = archives
+        self.version = version
+
+        # 子立方体的筛选：单元格掩码 / 案卷掩码（None 表示不筛选）
+        self._cell_mask = None
+        self._archive_mask = None
+
+    # ---------- 构建 ----------
+    @classmethod
+    @profile_stage("cube_build")
+    def build(cls, df: pd.DataFrame) -> "ArchiveCube":
+        """由完整的预处理结果构建立方体"""
+        codes_list, radices = [], []
+        for dim in DIMENSIONS:
+            codes, n_values = _key_codes(df[dim])
+            codes_list.append(codes)
+            radices.append(n_values + 1)
+
+        combined = np.zeros(len(df), dtype=np.int64)
+        for codes, radix in zip(codes_list, radices):
+            combined = combined * radix + codes
+        _, first, cell_of_row = np.unique(combined, return_index=True, return_inverse=True)
+        cell_of_row = cell_of_row.reshape(-1)
+        n_cells = len(first)
+
+        cells = df[DIMENSIONS].iloc[first].reset_index(drop=True)
+        cells["records"] = np.bincount(cell_of_row, minlength=n_cells).astype(np.int64)
+        hours = df["work_hours"].to_numpy(dtype=np.float64)
+        work_uh = hours_to_micro(np.where(np.isnan(hours), 0.0, hours))
+        cell_uh = np.zeros(n_cells, dtype=np.int64)
+        np.add.at(cell_uh, cell_of_row, work_uh)
+        cells["work_uh"] = cell_uh
+
+        # 案卷集合：(单元格, 案卷) 去重排序后即为各格的有序案卷编号
+        archive_col = df["sARCH_ID"]
+        if isinstance(archive_col.dtype, pd.CategoricalDtype):
+            archive_codes = archive_col.cat.codes.to_numpy().astype(np.int64)
+            archives = pd.Index(archive_col.cat.categories)
+        else:
+            archive_codes, archives = pd.factorize(archive_col, sort=True)
+            archive_codes = archive_codes.astype(np.int64)
+        n_archives = max(len(archives), 1)
+        valid = archive_codes >= 0
+        pairs = np.unique(cell_of_row[valid].astype(np.int64) * n_archives + archive_codes[valid])
+
+        offsets = np.zeros(n_cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // n_archives, minlength=n_cells), out=offsets[1:])
+        archive_ids = (pairs % n_archives).astype(np.uint32)
+
+        from aggregates import dataset_version
+        return cls(cells, offsets, archive_ids, archives, dataset_version(df))
+
+    # ---------- 落盘 ----------
+    def save(self, path) -> Path:
+        """"
+        写入目录 path（先写临时目录再替换）：cells.parquet、archives.parquet、sets.npz、meta.json
+        """
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        self.cells.to_parquet(tmp_path / "cells.parquet", index=False)
+        pd.DataFrame({"sARCH_ID": self.archives}).to_parquet(tmp_path / "archives.parquet", index=False)
+        np.savez(tmp_path / "sets.npz", offsets=self.offsets, archive_ids=self.archive_ids)
+        (tmp_path / "meta.json").write_text(json.dumps({
+            "cube_version": CUBE_VERSION, "dimensions": DIMENSIONS, "dataset_version": self.version,
+        }), encoding="utf-8")
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path) -> "ArchiveCube | None":
+        """读取落盘的立方体；不存在或结构版本不同时返回 None"""
+        path = Path(path)
+        meta_path = path / "meta.json"
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta["cube_version"] != CUBE_VERSION or meta["dimensions"] != DIMENSIONS:
+            return None
+
+        with np.load(path / "sets.npz") as sets:
+            offsets, archive_ids = sets["offsets"], sets["archive_ids"]
+        archives = pd.Index(pd.read_parquet(path / "archives.parquet")["sARCH_ID"])
+        cells = pd.read_parquet(path / "cells.parquet")
+        return cls(cells, offsets, archive_ids, archives, meta["dataset_version"])
+
+    @property
+    def nbytes(self) -> int:
+        """单元格、案卷集合与案卷字典占用的字节数"""
+        return int(self.cells.memory_usage(index=True).sum()
+                   + self.offsets.nbytes + self.archive_ids.nbytes
+                   + self.archives.memory_usage())
+
+    # ---------- 切片 ----------
+    def _match(self, dim: str, condition) -> np.ndarray:
+        """"
+        单元格的维度取值是否满足条件：单个值、取值列表，或 slice(起, 止)（含两端，None 表示不限）
+        """
+        if dim not in DIMENSIONS:
+            raise ValueError(f"未知维度: {dim}（可选: {', '.join(DIMENSIONS)}）")
+        values = self.cells[dim]
+        if isinstance(condition, slice):
+            lower, upper = condition.start, condition.stop
+            if dim == "finish_date":
+                lower = None if lower is None else pd.Timestamp(lower)
+                upper = None if upper is None else pd.Timestamp(upper)
+            keep = values.notna()
+            if lower is not None:
+                keep &= values >= lower
+            if upper is not None:
+                keep &= values <= upper
+            return keep.to_numpy(dtype=bool)
+        if isinstance(condition, (list, tuple, set, pd.Index, np.ndarray, pd.Series)):
+            return values.isin(list(condition)).to_numpy(dtype=bool)
+        return (values == condition).to_numpy(dtype=bool)
+
+    def restrict(self, where: dict | None = None, archives=None) -> "ArchiveCube":
+        """"
+        子立方体：只保留满足 where（{维度: 条件}，条件见 _match）的单元格，
+        archives 给出时案卷集合只保留其中的案卷（只影响案卷数，不影响记录数与工时）
+        """
+        cube = copy.copy(self)
+        if where:
+            mask = np.ones(len(self.cells), dtype=bool) if self._cell_mask is None else self._cell_mask.copy()
+            for dim, condition in where.items():
+                mask &= self._match(dim, condition)
+            cube._cell_mask = mask
+        if archives is not None:
+            mask = np.asarray(self.archives.isin(list(archives)), dtype=bool)
+            if self._archive_mask is not None:
+                mask &= self._archive_mask
+            cube._archive_mask = mask
+        return cube
+
+    def finished(self) -> "ArchiveCube":
+        """只含完成记录（状态 2 / 5）的子立方体，对应 get_aggregate(df, "finished")"""
+        return self.restrict({"iNODE_STATUS": FINISHED_STATUSES})
+
+    def _selected_cells(self, where: dict | None = None) -> np.ndarray:
+        cube = self.restrict(where) if where else self
+        if cube._cell_mask is None:
+            return np.arange(len(cube.cells))
+        return np.flatnonzero(cube._cell_mask)
+
+    def _archive_codes(self, cells: np.ndarray, groups: np.ndarray):
+        """选中单元格的案卷编号及各自所属的组（已按案卷筛选）"""
+        starts = self.offsets[cells]
+        lengths = self.offsets[cells + 1] - starts
+        ids = self.archive_ids[_ranges(starts, lengths)].astype(np.int64)
+        groups = np.repeat(groups, lengths)
+        if self._archive_mask is not None:
+            keep = self._archive_mask[ids]
+            ids, groups = ids[keep], groups[keep]
+        return ids, groups
+
+    def archive_mask(self, where: dict | None = None) -> np.ndarray:
+        """满足条件的单元格中出现过的案卷（案卷字典上的布尔位图）"""
+        cells = self._selected_cells(where)
+        ids, _ = self._archive_codes(cells, np.zeros(len(cells), dtype=np.int64))
+        mask = np.zeros(len(self.archives), dtype=bool)
+        mask[ids] = True
+        return mask
+
+    def archive_set(self, where: dict | None = None) -> pd.Index:
+        """满足条件的单元格中出现过的案卷号（有序）"""
+        return self.archives[self.archive_mask(where)]
+
+    # ---------- 查询 ----------
+    def query(self, by=(), where: dict | None = None, measures=None) -> pd.DataFrame:
+        """"
+        按维度 by 上卷统计，结果按 by 排序；by 中任一维度缺失的单元格不参与（同 groupby）
+
+        measures: MEASURES 的子集（默认全部）
+            records          记录数
+            work_hours       记录工时合计（小时）
+            archives         去重案卷数
+            rework_archives  去重返工案卷数（状态 5）
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        measures = list(MEASURES if measures is None else measures)
+        unknown = [m for m in measures if m not in MEASURES]
+        if unknown:
+            raise ValueError(f"未知度量: {', '.join(unknown)}（可选: {', '.join(MEASURES)}）")
+
+        cells = self._selected_cells(where)
+        frame = self.cells.iloc[cells]
+        if by:
+            present = frame[by].notna().all(axis=1).to_numpy()
+            cells, frame = cells[present], frame[present]
+            groups = frame.groupby(by, observed=True, sort=True).ngroup().to_numpy()
+        else:
+            groups = np.zeros(len(cells), dtype=np.int64)
+
+        n_groups = int(groups.max()) + 1 if len(groups) else (0 if by else 1)
+        _, first = np.unique(groups, return_index=True)
+        result = {key: frame[key].iloc[first].reset_index(drop=True) for key in by}
+
+        for measure in measures:
+            if measure == "records":
+                values = np.zeros(n_groups, dtype=np.int64)
+                np.add.at(values, groups, frame["records"].to_numpy())
+            elif measure == "work_hours":
+                work_uh = np.zeros(n_groups, dtype=np.int64)
+                np.add.at(work_uh, groups, frame["work_uh"].to_numpy())
+                values = work_uh / 1e6
+            else:
+                keep = np.ones(len(cells), dtype=bool)
+                if measure == "rework_archives":
+                    keep = (frame["iNODE_STATUS"] == REWORK_STATUS).to_numpy()
+                ids, id_groups = self._archive_codes(cells[keep], groups[keep])
+                values = _count_distinct(id_groups, ids, n_groups, len(self.archives))
+            result[measure] = values
+        return pd.DataFrame(result)
+
+    def agg(self, by, where=None, **named) -> pd.DataFrame:
+        """"
+        与 SortedSegments.agg 相同的调用方式，只支持案卷去重计数：
+            cube.agg(["工序"], where="is_rework", rework_cases=("sARCH_ID", "nunique"))
+        where: "is_rework" / "is_finished"，或 {维度: 条件}
+        """
+        if isinstance(where, str):
+            if where not in _STATUS_FLAGS:
+                raise ValueError(f"立方体不支持的筛选条件: {where}")
+            where = {"iNODE_STATUS": _STATUS_FLAGS[where]}
+        for out_name, spec in named.items():
+            if tuple(spec) != ("sARCH_ID", "nunique"):
+                raise ValueError(f"立方体只支持案卷去重计数: {out_name}={spec}")
+
+        table = self.query(by, where=where, measures=["archives"])
+        for out_name in named:
+            table[out_name] = table["archives"]
+        return table.drop(columns="archives")
+
+
+def open_cube(df: pd.DataFrame, cube_dir: str = CUBE_DIR) -> ArchiveCube:
+    """"
+    数据集版本对应的立方体：已落盘时直接读取，否则构建并落盘（未安装 pyarrow 时只在内存中）；
+    落盘成功后删除 cube_dir 中同一个源的旧版本立方体
+    """
+    from aggregates import dataset_version
+
+    source = df.attrs.get("source_prefix")
+    path = cube_path_for(dataset_version(df), cube_dir, source)
+    cube = ArchiveCube.load(path)
+    if cube is None:
+        cube = ArchiveCube.build(df)
+        if has_parquet():
+            cube.save(path)
+            if source:
+                _remove_stale_cubes(path, source)
+    return cube
+
+def completed_archives(cube: ArchiveCube) -> pd.Series:
+    """"
+    完成四道工序的案卷：四道工序完成记录的案卷集合求交（同 find_completed_archives）
+    """
+    from utils import FLOW_MAP
+
+    finished = cube.finished()
+    mask = np.logical_and.reduce([
+        finished.archive_mask({"工序": flow}) for flow in FLOW_MAP.values()
+    ])
+    return pd.Series(cube.archives[mask], name="sARCH_ID")
+
+
+def _parse_where(cube: ArchiveCube, items: list) -> dict:
+    """命令行的 维度=值1,值2 -> {维度: [值, ...]}（按该维度的类型转换）"""
+    where = {}
+    for item in items:
+        dim, _, raw = item.partition("=")
+        if dim not in DIMENSIONS or not raw:
+            raise ValueError(f"筛选条件应为 维度=值1,值2（维度: {', '.join(DIMENSIONS)}）: {item}")
+        dtype = cube.cells[dim].dtype
+        values = raw.split(",")
+        if pd.api.types.is_datetime64_dtype(dtype):
+            values = [pd.Timestamp(v) for v in values]
+        elif pd.api.types.is_numeric_dtype(dtype):
+            values = [float(v) if "." in v else int(v) for v in values]
+        where[dim] = values
+    return where
+
+if __name__ == "__main__":
+    import importlib.util
+
+    parser = argparse.ArgumentParser(description="日期 × 工序 × 人员 × 状态 预聚合立方体")
+    parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径")
+    parser.add_argument("--cube-dir", default=CUBE_DIR, help="立方体目录（默认 data/.cube）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("build", help="预处理并构建立方体（已有时直接复用）")
+
+    query_parser = commands.add_parser("query", help="切片 / 上卷查询")
+    query_parser.add_argument("--by", default="", help="上卷到的维度，逗号分隔（默认全部汇总为一行）")
+    query_parser.add_argument("--where", action="append", default=[], metavar="维度=值1,值2",
+                              help="筛选条件，可重复")
+    query_parser.add_argument("--start-date", default=None, help="完成日期下限（含）")
+    query_parser.add_argument("--end-date", default=None, help="完成日期上限（含）")
+    query_parser.add_argument("--measures", default=",".join(MEASURES),
+                              help=f"度量，逗号分隔（默认 {','.join(MEASURES)}）")
+    args = parser.parse_args()
+
+    spec = importlib.util.spec_from_file_location(
+        "preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py")
+    )
+    preprocess_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(preprocess_module)
+
+    # 已构建过时只按源文件哈希找到立方体目录，不读取记录
+    cube = None
+    source = source_prefix(args.data)
+    if not preprocess_module.is_multi_source(args.data):
+        cube = ArchiveCube.load(cube_path_for(preprocess_module.dataset_key(args.data), args.cube_dir, source))
+    if cube is None:
+        cube = open_cube(preprocess_module.preprocess_data(args.data), args.cube_dir)
+
+    if args.command == "build":
+        print(f"立方体: {len(cube.cells)} 个单元格，{len(cube.archives)} 个案卷，"
+              f"{cube.nbytes / 2**20:.2f} MB（{cube_path_for(cube.version, args.cube_dir, source)}）")
+    else:
+        try:
+            where = _parse_where(cube, args.where)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.start_date or args.end_date:
+            where["finish_date"] = slice(args.start_date, args.end_date)
+        by = [dim for dim in args.by.split(",") if dim]
+        measures = [m for m in args.measures.split(",") if m]
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(cube.query(by, where=where, measures=measures).to_string(index=False))
@@ -0,0 +1,331 @@
+# src/incremental.py
+"""
+增量更新：持久化任务 1（表 1 ~ 表 5）与任务 2.1 ~ 2.3 每日序列背后的可合并统计量，
+每晚只处理新增的导出文件，再由合并后的状态重新生成结果表和图。
+
+状态按分区保存在 data/.state/<表名>/ 下（daily_arch 按完成日期，其余按案卷 / 批次号的哈希分桶），
+每次只读写新记录涉及的分区；已并入的记录按哈希计数，重叠导出中重复的记录不会再次累加。
+
+用法：
+    python src/incremental.py data/2020-07-15.xlsx            # 并入新的一天
+    python src/incremental.py --rebuild data/data.xlsx        # 用全部历史重建状态
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from aggregates import batch_time_table
+from cache import has_parquet, file_digest, params_digest, load_frame, save_frame
+
+
+def _load_script(file_name: str):
+    """动态导入 src/ 下以数字开头的脚本模块"""
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+preprocess_module = _load_script("01_preprocess.py")
+task1_module = _load_script("02_task1_statistics.py")
+task2_module = _load_script("03_task2_visualization.py")
+
+
+# 状态 = 任务 1 的部分聚合 + 任务 2.1 / 2.3 需要的 日期 × 工序 × 案卷（是否返工过）
+STATE_SPECS = {
+    **task1_module.TASK1_PARTIAL_SPECS,
+    "daily_arch": ("finished", ["finish_date", "工序", "sARCH_ID"], {"is_rework": "max"}),
+}
+
+MANIFEST_NAME = "manifest.json"
+
+# 状态的存储布局变更时递增
+STATE_LAYOUT_VERSION = 2
+
+# 各状态表分区存储，每次只读写新记录涉及的分区：
+# - daily_arch 按完成日期逐日分区（新的一天只追加新的分区文件）
+# - 其余各表按案卷号（没有案卷号时按批次号）的哈希分桶，同一个键只落在一个桶内
+STATE_BUCKETS = 64
+BUCKET_COLS = ["sARCH_ID", "sBatch_number"]
+
+# 已并入的记录：记录哈希 -> 单个文件内出现的最多次数，按领取日期逐日分区
+SEEN_NAME = "seen"
+
+# 派生列（由源文件的列计算得到），不参与记录哈希
+DERIVED_COLS = ["工序", "work_hours", "finish_date", "is_rework", "is_finished"]
+
+
+def _state_params_digest() -> str:
+    """预处理参数、状态定义与存储布局的哈希；任一变化都需要重建状态"""
+    return params_digest({
+        "preprocess": preprocess_module.preprocess_params(),
+        "specs": STATE_SPECS,
+        "layout": {"version": STATE_LAYOUT_VERSION, "buckets": STATE_BUCKETS},
+    })
+
+def _day_labels(times: pd.Series) -> np.ndarray:
+    """时间 -> 分区名 YYYY-MM-DD（缺失为 none）"""
+    return times.dt.strftime("%Y-%m-%d").fillna("none").to_numpy(dtype=object)
+
+def _partition_labels(name: str, frame: pd.DataFrame) -> np.ndarray:
+    """"
+    状态表各行所在的分区名：daily_arch 为完成日期，其余为 bucket-<编号>
+    """
+    if name == "daily_arch":
+        return _day_labels(frame["finish_date"])
+    keys = STATE_SPECS[name][1]
+    col = next(col for col in BUCKET_COLS if col in keys)
+    # 先统一为字符串，各批新数据的列类型（类别 / object）不同时分桶结果一致
+    values = frame[col].astype(str).to_numpy(dtype=object)
+    buckets = pd.util.hash_array(values) % STATE_BUCKETS
+    return pd.Series(buckets).map("bucket-{:03d}".format).to_numpy(dtype=object)
+
+def _partition_path(state_dir: Path, name: str, label: str) -> Path:
+    return state_dir / name / f"{label}.parquet"
+
+def _record_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    """"
+    记录哈希（uint64）：按源文件的各列计算，与列的顺序和各块推断出的列类型无关
+    （整数列含缺失值时会读成浮点数，时间统一为纳秒整数，其余按字符串）
+    """
+    canonical = {}
+    for col in sorted(c for c in chunk.columns if c not in DERIVED_COLS):
+        values = chunk[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            canonical[col] = values.astype("datetime64[ns]").to_numpy().view(np.int64)
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            canonical[col] = values.to_numpy(dtype=np.float64)
+        else:
+            canonical[col] = values.astype("string").fillna("").to_numpy(dtype=object)
+    return pd.util.hash_pandas_object(pd.DataFrame(canonical), index=False).to_numpy()
+
+def load_state(state_dir: str):
+    """"
+    读取持久化的状态（全部分区），返回 (状态 | None, 清单)
+    """
+    state_dir = Path(state_dir)
+    manifest = _load_manifest(state_dir)
+    if not manifest["sources"]:
+        return None, manifest
+
+    state = {}
+    for name in STATE_SPECS:
+        frames = []
+        for path in sorted((state_dir / name).glob("*.parquet")):
+            frame = load_frame(path)
+            if frame is None:
+                raise ValueError(f"状态文件损坏，请使用 --rebuild 重新生成: {path}")
+            frames.append(frame)
+        if not frames:
+            raise ValueError(f"状态文件缺失，请使用 --rebuild 重新生成: {name}")
+        # 各分区的键互不重叠，直接拼接即为完整的部分聚合
+        state[name] = pd.concat(frames, ignore_index=True)
+    return state, manifest
+
+def _load_manifest(state_dir: Path) -> dict:
+    manifest_path = state_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {"params": _state_params_digest(), "sources": {}}
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("params") != _state_params_digest():
+        raise ValueError(
+            f"预处理参数、状态定义或存储布局已变化，请使用 --rebuild 重新生成状态: {state_dir}"
+        )
+    return manifest
+
+def _commit(staged: dict, manifest: dict, state_dir: Path):
+    """"
+    先把各分区写成临时文件，全部写完后再依次替换，最后写清单（清单写完才算更新成功）
+    """
+    tmp_paths = {}
+    for path, frame in staged.items():
+        tmp_path = path.with_name(path.name + ".new")
+        save_frame(frame, tmp_path)
+        tmp_paths[path] = tmp_path
+    for path, tmp_path in tmp_paths.items():
+        os.replace(tmp_path, path)
+
+    tmp_path = state_dir / (MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_dir / MANIFEST_NAME)
+
+class _SeenRecords:
+    """"
+    已并入记录的计数（按领取日期分区，只读取新记录涉及的日期）
+
+    与 combine_frames 相同的去重口径：某条记录在各文件中分别出现 k1、k2 ... 次时只计 max(k1, k2, ...) 次，
+    即文件内第 j 次（从 0 起）出现的记录在已记录的次数不超过 j 时才是新记录
+    """
+
+    def __init__(self, state_dir: Path):
+        self.state_dir = state_dir
+        self.days = {}        # 分区名 -> Series（记录哈希 -> 次数）
+        self.changed = set()
+
+    def _load(self, day: str) -> pd.Series:
+        if day not in self.days:
+            frame = load_frame(_partition_path(self.state_dir, SEEN_NAME, day))
+            self.days[day] = (
+                pd.Series(dtype=np.int64) if frame is None
+                else frame.set_index("hash")["count"]
+            )
+        return self.days[day]
+
+    def filter(self, hashes: np.ndarray, days: np.ndarray, occurrence: np.ndarray) -> np.ndarray:
+        """各记录是否为新记录（occurrence 为该记录在本文件内是第几次出现）"""
+        seen = np.zeros(len(hashes), dtype=np.int64)
+        for day in pd.unique(days):
+            rows = days == day
+            seen[rows] = self._load(day).reindex(hashes[rows], fill_value=0).to_numpy()
+        return occurrence >= seen
+
+    def record(self, hashes: np.ndarray, days: np.ndarray, counts: np.ndarray):
+        """本文件内各记录出现的次数并入计数（取最大值）"""
+        frame = pd.DataFrame({"hash": hashes, "day": days, "count": counts})
+        for day, part in frame.groupby("day", sort=False):
+            current = self._load(day)
+            update = part.set_index("hash")["count"].astype(np.int64)
+            if len(current):
+                update = pd.concat([current, update]).groupby(level=0).max()
+            self.days[day] = update
+            self.changed.add(day)
+
+    def staged(self) -> dict:
+        return {
+            _partition_path(self.state_dir, SEEN_NAME, day):
+                self.days[day].rename_axis("hash").rename("count").reset_index()
+            for day in self.changed
+        }
+
+def _new_records(path, chunk_size: int, seen: _SeenRecords):
+    """"
+    逐块产出文件中尚未并入过的记录；整个文件读完后把其记录计数并入 seen
+    """
+    file_counts = pd.Series(dtype=np.int64)
+    file_days = []
+    for chunk in preprocess_module.iter_preprocessed_chunks(path, chunk_size):
+        hashes = _record_hashes(chunk)
+        days = _day_labels(chunk["dUPDATE_TIME"])
+        # 本文件内第几次出现：之前各块的次数 + 块内的序号
+        occurrence = (
+            file_counts.reindex(hashes, fill_value=0).to_numpy()
+            + pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+        )
+        keep = seen.filter(hashes, days, occurrence)
+
+        chunk_counts = pd.Series(hashes).value_counts()
+        file_counts = file_counts.add(chunk_counts, fill_value=0).astype(np.int64)
+        file_days.append(pd.Series(days, index=hashes))
+        yield chunk[keep], int((~keep).sum())
+
+    if file_days:
+        # 相同的记录领取时间相同，所在的日期分区也相同
+        days = pd.concat(file_days).groupby(level=0).first()
+        seen.record(file_counts.index.to_numpy(), days.reindex(file_counts.index).to_numpy(),
+                    file_counts.to_numpy())
+
+def update_state(new_paths: list, state_dir: str, chunk_size: int = 100_000) -> dict:
+    """"
+    把新文件并入状态并保存，返回 {"files", "rows", "duplicates", "partitions"}
+
+    只读取、预处理新文件，并只读写新记录涉及的状态分区（案卷 / 批次所在的桶、新的日期），
+    其余分区原样留在磁盘上；跨越新旧数据的案卷 / 批次通过 min / max / 去重合并自然衔接。
+    已并入过的文件（按内容哈希识别）直接跳过；与之前的导出重叠的记录按记录去重，
+    工时不会重复累加。
+    """
+    if not has_parquet():
+        raise RuntimeError("增量模式需要 pyarrow 来保存状态")
+
+    state_dir = Path(state_dir)
+    manifest = _load_manifest(state_dir)
+    applied = manifest["sources"]
+    seen = _SeenRecords(state_dir)
+    stats = {"files": 0, "rows": 0, "duplicates": 0, "partitions": 0}
+
+    pending = []
+    for path in new_paths:
+        digest = file_digest(path)
+        if digest in applied.values():
+            print(f"已并入过，跳过: {path}")
+            continue
+        for chunk, duplicates in _new_records(path, chunk_size, seen):
+            stats["rows"] += len(chunk)
+            stats["duplicates"] += duplicates
+            pending.append(task1_module.task1_partial_state(chunk, specs=STATE_SPECS))
+        applied[str(path)] = digest
+        stats["files"] += 1
+        print(f"并入: {path}")
+
+    if not stats["files"]:
+        return stats
+
+    # 新记录的部分聚合，按分区与已有的分区合并（只涉及新记录的键）
+    delta = task1_module.merge_task1_states(*pending, specs=STATE_SPECS)
+    staged = seen.staged()
+    for name, frame in delta.items():
+        spec = {name: STATE_SPECS[name]}
+        (state_dir / name).mkdir(parents=True, exist_ok=True)
+        labels = _partition_labels(name, frame)
+        for label, part in frame.groupby(labels, sort=False):
+            part_path = _partition_path(state_dir, name, label)
+            old = load_frame(part_path)
+            if old is not None:
+                part = task1_module.merge_task1_states({name: old}, {name: part}, specs=spec)[name]
+            staged[part_path] = part.reset_index(drop=True)
+    (state_dir / SEEN_NAME).mkdir(parents=True, exist_ok=True)
+    _commit(staged, manifest, state_dir)
+    stats["partitions"] = len(staged)
+    return stats
+
+def write_outputs(state: dict, figures: bool = True):
+    """"
+    由状态生成 result1_1 ~ result1_5 以及 task2_1 ~ task2_3 的图
+    """
+    tables, rework_ratio = task1_module.calc_task1_tables_from_state(state)
+    for file_name, table in tables.items():
+        task1_module.save_table(table, file_name)
+    print(f"返工案卷占比: {rework_ratio}%")
+
+    if not figures:
+        return
+
+    # 每个 日期 × 工序 × 案卷 只剩一行，作为“完成记录”交给 2.1 / 2.3
+    daily_arch = state["daily_arch"].copy()
+    daily_arch["is_rework"] = daily_arch["is_rework"].astype(bool)
+    task2_module.plot_task2_1_daily_finished_count(None, df_finished=daily_arch)
+    task2_module.plot_task2_3_daily_rework_ratio(None, df_finished=daily_arch)
+
+    batch_time = batch_time_table(state["batch"], ["工序", "sBatch_number"])
+    task2_module.plot_task2_2_daily_workload(None, batch_time=batch_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="增量更新任务 1 / 任务 2 的统计结果")
+    parser.add_argument("paths", nargs="+", help="新增的导出文件（.xlsx / .csv）")
+    parser.add_argument("--state-dir", default="data/.state", help="状态保存目录")
+    parser.add_argument("--rebuild", action="store_true", help="清空已有状态，用给定文件重建")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="每块读取的行数")
+    parser.add_argument("--no-figures", action="store_true", help="只更新结果表，不作图")
+    args = parser.parse_args()
+
+    if args.rebuild and Path(args.state_dir).exists():
+        shutil.rmtree(args.state_dir)
+
+    stats = update_state(args.paths, args.state_dir, args.chunk_size)
+    print(f"新增 {stats['rows']} 条记录（重复 {stats['duplicates']} 条），更新 {stats['partitions']} 个分区")
+    state, _ = load_state(args.state_dir)
+    if state is None:
+        raise SystemExit(f"状态为空，请先并入数据: {args.state_dir}")
+    write_outputs(state, figures=not args.no_figures)
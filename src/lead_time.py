@@ -0,0 +1,255 @@
+# src/lead_time.py
+"""
+工序间等待（排队）时间分析：扫描结束 → 图像处理开始 → 自检全检开始 → PDF处理开始
+
+每个案卷在相邻两道（已完成的）工序之间的等待时间 = 后一工序最早领取 - 前一工序最晚提交，
+同时给出自然时长与按工作日历计算的有效工作时长（utils.calc_work_hours_array），
+并汇总为：
+- 等待分布：各衔接（前一工序 → 后一工序）的等待时长分位数
+- 等待分档：各衔接的等待时长分档计数
+- 每日瓶颈：每天各工序前的等待情况，等待工时合计最多的工序记为当天的瓶颈
+- 工序瓶颈：各工序前的总体等待情况，以及成为每日瓶颈的天数
+
+用法：
+    python src/lead_time.py
+    python src/lead_time.py --data data/exports/ --details --output-format parquet
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from archive_index import FLOW_BITS
+from profiling import profile_stage
+from utils import NS_PER_DAY, calc_work_hours_array
+
+
+# 工序按流程顺序（扫描 → 图像处理 → 自检全检 → PDF处理）
+FLOW_ORDER = sorted(FLOW_BITS, key=FLOW_BITS.get)
+
+# 等待分位数
+QUANTILES = [0.5, 0.75, 0.9, 0.95]
+
+# 等待时长分档（有效工作时长，单位 h；左闭右开）
+WAIT_BINS = [0, 1, 2, 4, 8, 16, 32, 64, np.inf]
+
+_NS_PER_HOUR = NS_PER_DAY // 24
+
+
+def _flow_dtype() -> pd.CategoricalDtype:
+    """前一 / 后一工序列的类型：按流程顺序排列的类别"""
+    return pd.CategoricalDtype(FLOW_ORDER, ordered=True)
+
+@profile_stage("stage_waits")
+def stage_waits(archive_index: pd.DataFrame) -> pd.DataFrame:
+    """"
+    案卷状态索引（get_aggregate(df, "archive_index")）-> 案卷的工序间等待明细
+
+    各案卷已完成的工序按流程顺序展开为一列（案卷号已排序，展开后即按 案卷 × 工序 排序），
+    整列与错位一行的自身比较：相邻两行属于同一案卷即为一次衔接，不需要分组。
+    跳过的工序不单独成行（如没有图像处理时直接记为 扫描 → 自检全检）
+
+    返回列：
+    - sARCH_ID、from_flow / to_flow（前一 / 后一工序）
+    - from_end / to_start（前一工序最晚提交 / 后一工序最早领取）
+    - wait_hours:      自然时长（h，保留 6 位小数）；为负表示后一工序在前一工序全部提交前已开始
+    - wait_work_hours: 有效工作时长（h），为负时记为 0
+      前一工序的提交时间或后一工序的领取时间缺失时，两列均为 NaN（不按 0 计入统计）
+    - to_date:         后一工序开始的日期
+    """
+    n_archives, n_flows = len(archive_index), len(FLOW_ORDER)
+
+    # (案卷, 工序) 矩阵按行展开，顺序即 案卷 × 流程顺序
+    def stacked(suffix):
+        columns = [archive_index[f"{flow}_{suffix}"].to_numpy(dtype="datetime64[ns]") for flow in FLOW_ORDER]
+        return np.column_stack(columns).ravel() if n_archives else np.zeros(0, dtype="datetime64[ns]")
+
+    start = stacked("start_time")
+    end = stacked("end_time")
+    archive_pos = np.repeat(np.arange(n_archives), n_flows)
+    flow_pos = np.tile(np.arange(n_flows), n_archives)
+
+    # 只保留已完成的工序（案卷状态索引中完成工序的开始 / 结束时间才有值）
+    present = ~(np.isnat(start) & np.isnat(end))
+    start, end = start[present], end[present]
+    archive_pos, flow_pos = archive_pos[present], flow_pos[present]
+
+    # 错位一行：同一案卷的相邻两行构成一次衔接
+    pair = archive_pos[1:] == archive_pos[:-1]
+    prev = np.flatnonzero(pair)
+    nxt = prev + 1
+
+    from_end, to_start = end[prev], start[nxt]
+    wait_ns = to_start.view(np.int64) - from_end.view(np.int64)
+    missing = np.isnat(from_end) | np.isnat(to_start)
+    wait_hours = np.round(wait_ns / _NS_PER_HOUR, 6)
+    wait_hours[missing] = np.nan
+    wait_work_hours = calc_work_hours_array(from_end, to_start)
+    wait_work_hours[missing] = np.nan
+
+    flows = np.array(FLOW_ORDER, dtype=object)
+    return pd.DataFrame({
+        "sARCH_ID": archive_index.index.to_numpy()[archive_pos[prev]],
+        "from_flow": pd.Categorical(flows[flow_pos[prev]], dtype=_flow_dtype()),
+        "to_flow": pd.Categorical(flows[flow_pos[nxt]], dtype=_flow_dtype()),
+        "from_end": from_end,
+        "to_start": to_start,
+        "wait_hours": wait_hours,
+        "wait_work_hours": wait_work_hours,
+        "to_date": pd.DatetimeIndex(to_start).normalize(),
+    })
+
+
+def _transition(waits: pd.DataFrame) -> pd.Series:
+    """衔接名称：前一工序 → 后一工序"""
+    return waits["from_flow"].astype(str) + " → " + waits["to_flow"].astype(str)
+
+def _quantile_columns(grouped, column: str, label: str) -> pd.DataFrame:
+    """分组后某列的均值 / 分位数 / 最大值，列名形如 "有效等待 P90 (h)" """
+    stats = grouped[column].quantile(QUANTILES).unstack()
+    stats.columns = [f"{label} P{round(q * 100)} (h)" for q in QUANTILES]
+    stats.insert(0, f"{label} 均值 (h)", grouped[column].mean())
+    stats[f"{label} 最大 (h)"] = grouped[column].max()
+    return stats.round(3)
+
+@profile_stage("wait_distribution")
+def wait_distribution(waits: pd.DataFrame) -> pd.DataFrame:
+    """"
+    等待分布：各衔接的案卷数、时间缺失（无法计算等待）的案卷数、重叠（后一工序提前开始）案卷数，
+    以及有效工作时长与自然时长的均值 / 分位数 / 最大值（不含时间缺失的案卷）
+    """
+    keyed = waits.assign(
+        衔接=_transition(waits),
+        missing=waits["wait_work_hours"].isna(),
+        overlap=waits["wait_hours"] < 0,
+    )
+    grouped = keyed.groupby(["from_flow", "to_flow", "衔接"], observed=True, sort=True)
+
+    result = pd.DataFrame({
+        "案卷数": grouped.size(),
+        "时间缺失案卷数": grouped["missing"].sum(),
+        "重叠案卷数": grouped["overlap"].sum(),
+    })
+    result = result.join(_quantile_columns(grouped, "wait_work_hours", "有效等待"))
+    result = result.join(_quantile_columns(grouped, "wait_hours", "自然等待"))
+    return result.reset_index(level=["from_flow", "to_flow"], drop=True).reset_index()
+
+@profile_stage("wait_histogram")
+def wait_histogram(waits: pd.DataFrame, bins: list = WAIT_BINS) -> pd.DataFrame:
+    """"
+    等待分档：各衔接的有效等待时长落在各区间（左闭右开，单位 h）的案卷数（不含时间缺失的案卷）
+    """
+    labels = [
+        f"[{lo:g}, {hi:g})" if np.isfinite(hi) else f">= {lo:g}"
+        for lo, hi in zip(bins[:-1], bins[1:])
+    ]
+    binned = pd.cut(waits["wait_work_hours"], bins, right=False, labels=labels)
+    table = pd.crosstab(
+        [waits["from_flow"], waits["to_flow"]], binned, dropna=False
+    ).reindex(columns=labels, fill_value=0)
+
+    # 只保留出现过的衔接
+    table = table[table.sum(axis=1) > 0]
+    table.columns = [f"有效等待 {label} h" for label in labels]
+    table.insert(0, "衔接", [f"{a} → {b}" for a, b in table.index])
+    return table.reset_index(drop=True)
+
+@profile_stage("bottleneck_summary")
+def bottleneck_summary(waits: pd.DataFrame):
+    """"
+    每日 / 各工序的瓶颈汇总，按后一工序（即等待所在的队列）与其开始日期统计
+
+    返回 (每日瓶颈表, 工序瓶颈表)：
+    - 每日：日期 × 工序的等待案卷数、有效等待均值 / P90 / 合计，
+      当天有效等待合计最多的工序（相同时取均值大者）标记为瓶颈
+    - 工序：各工序的总体等待情况与成为每日瓶颈的天数、占全部有效等待的比例
+    时间缺失（wait_work_hours 为 NaN）的衔接不参与统计
+    """
+    waits = waits[waits["wait_work_hours"].notna()]
+    keyed = waits.assign(wait_uh=np.rint(waits["wait_work_hours"].to_numpy() * 1e6).astype(np.int64))
+
+    grouped = keyed.groupby(["to_date", "to_flow"], observed=True, sort=True)
+    daily = pd.DataFrame({
+        "等待案卷数": grouped.size(),
+        "有效等待均值 (h)": grouped["wait_work_hours"].mean().round(3),
+        "有效等待 P90 (h)": grouped["wait_work_hours"].quantile(0.9).round(3),
+        "有效等待合计 (h)": grouped["wait_uh"].sum() / 1e6,
+    }).reset_index()
+
+    # 每天按 合计、均值 降序取第一名；稳定排序，完全相同时取流程靠前的工序
+    ranked = daily.sort_values(
+        ["to_date", "有效等待合计 (h)", "有效等待均值 (h)"],
+        ascending=[True, False, False], kind="stable"
+    )
+    daily["是否瓶颈"] = False
+    daily.loc[ranked.drop_duplicates("to_date").index, "是否瓶颈"] = True
+    daily["有效等待合计 (h)"] = daily["有效等待合计 (h)"].round(3)
+
+    grouped = keyed.groupby("to_flow", observed=True, sort=True)
+    total_uh = keyed["wait_uh"].sum()
+    by_flow = pd.DataFrame({
+        "等待案卷数": grouped.size(),
+        "有效等待均值 (h)": grouped["wait_work_hours"].mean().round(3),
+        "有效等待 P90 (h)": grouped["wait_work_hours"].quantile(0.9).round(3),
+        "有效等待合计 (h)": (grouped["wait_uh"].sum() / 1e6).round(3),
+        "瓶颈天数": daily[daily["是否瓶颈"]].groupby("to_flow", observed=True).size(),
+    })
+    by_flow["瓶颈天数"] = by_flow["瓶颈天数"].fillna(0).astype(np.int64)
+    by_flow["等待占比 (%)"] = (
+        grouped["wait_uh"].sum() / total_uh * 100 if total_uh else 0.0
+    ).round(2)
+
+    daily = daily.rename(columns={"to_date": "日期", "to_flow": "工序"})
+    daily["日期"] = daily["日期"].dt.date
+    by_flow = by_flow.rename_axis("工序").reset_index()
+    return daily, by_flow
+
+def lead_time_tables(df: pd.DataFrame, details: bool = False) -> dict:
+    """"
+    完整的预处理结果 -> {工作表名: 结果表}（工序间等待的分布、分档与瓶颈汇总）
+
+    details 为 True 时附带逐案卷的等待明细（行数与案卷数同量级）
+    """
+    from aggregates import get_aggregate
+
+    waits = get_aggregate(df, "stage_waits")
+    daily, by_flow = bottleneck_summary(waits)
+    tables = {
+        "等待分布": wait_distribution(waits),
+        "等待分档": wait_histogram(waits),
+        "每日瓶颈": daily,
+        "工序瓶颈": by_flow,
+    }
+    if details:
+        tables["等待明细"] = waits
+    return tables
+
+
+if __name__ == "__main__":
+    import importlib.util
+    from pathlib import Path
+    from result_writer import FORMATS, OVERSIZE_MODES, configure_output, write_result
+
+    parser = argparse.ArgumentParser(description="工序间等待（排队）时间分析")
+    parser.add_argument("--data", default="data/data.xlsx",
+                        help="原始数据文件路径（也可以是目录或通配符，合并多个导出文件）")
+    parser.add_argument("--output", default="result/lead_time.xlsx", help="结果文件路径")
+    parser.add_argument("--details", action="store_true", help="附带逐案卷的等待明细")
+    parser.add_argument("--output-format", choices=FORMATS, default=None, help="结果格式（默认 xlsx）")
+    parser.add_argument("--oversize", choices=OVERSIZE_MODES, default=None,
+                        help="xlsx 工作表超过行数上限时：split 拆分 / error 报错（默认 split）")
+    args = parser.parse_args()
+    configure_output(args.output_format, args.oversize)
+
+    spec = importlib.util.spec_from_file_location(
+        "preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py")
+    )
+    preprocess_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(preprocess_module)
+
+    df = preprocess_module.preprocess_data(args.data)
+    tables = lead_time_tables(df, details=args.details)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(tables["工序瓶颈"].to_string(index=False))
+    print(f"已保存: {write_result(tables, Path(args.output))}")
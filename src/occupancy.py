@@ -0,0 +1,222 @@
+# src/occupancy.py
+"""
+人员实际占用工时：同一人员的记录区间（领取 ~ 提交）求并集后的有效工作时长，以及同时在手的记录数。
+
+任务 1.5 与任务 2.2 按“批次最早领取 ~ 最晚提交”计算工作时长，同一人员时间上重叠的批次会被
+重复计算；这里把每条完成记录的区间映射到工作时间轴上（非工作时段长度为 0，即按 utils.py
+的工作日历或 calendars.py 中各人员的排班裁剪），按天切开后每个「人员 × 日期」只排序一次，
+用扫描线求并集：
+- 占用工时：并集长度（h），不会重复计算
+- 记录工时：各记录区间长度之和（重叠部分重复计算）
+- 峰值并发：同时在手的记录数最大值；平均并发 = 记录工时 / 占用工时
+
+用法：
+    python src/occupancy.py
+    python src/occupancy.py --by-flow --output-format parquet
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from calendars import active_calendar
+from profiling import profile_stage
+from utils import NS_PER_DAY, hours_to_micro, work_calendar_table, work_ns_to_hours, work_periods_ns
+
+
+def _work_positions(times: np.ndarray, operators=None) -> np.ndarray:
+    """"
+    时间（int64 纳秒）-> 工作时间轴上的位置（累计的工作纳秒数），非工作时段的长度为 0
+
+    配置了排班日历时按各行人员的排班（operators），否则按 utils.py 的固定日历；
+    位置只在同一次调用内可以相减
+    """
+    calendar = active_calendar()
+    if calendar is not None:
+        return calendar.positions(times.view("datetime64[ns]"), operators)
+
+    day = times // NS_PER_DAY
+    table = work_calendar_table(int(day.min()), int(day.max()))
+    idx = day - table["day"].iloc[0]
+    tod = times - day * NS_PER_DAY
+    intraday = np.zeros(len(times), dtype=np.int64)
+    for p_start, p_end in work_periods_ns():
+        intraday += np.clip(tod - p_start, 0, p_end - p_start)
+    is_work = table["is_work"].to_numpy()[idx].astype(bool)
+    return table["cum_ns"].to_numpy()[idx] + np.where(is_work, intraday, 0)
+
+def _day_pieces(group: np.ndarray, start: np.ndarray, end: np.ndarray):
+    """"
+    区间（int64 纳秒）按自然日切开：返回 (组号, 纪元日, 开始, 结束)
+    """
+    first = start // NS_PER_DAY
+    last = (end - 1) // NS_PER_DAY
+    n_days = last - first + 1
+
+    row = np.repeat(np.arange(len(start)), n_days)
+    day = np.repeat(first, n_days) + (np.arange(len(row)) - np.repeat(np.cumsum(n_days) - n_days, n_days))
+    piece_start = np.maximum(start[row], day * NS_PER_DAY)
+    piece_end = np.minimum(end[row], (day + 1) * NS_PER_DAY)
+    return group[row], day, piece_start, piece_end
+
+def _union_length(segment: np.ndarray, start: np.ndarray, end: np.ndarray, n_segments: int) -> np.ndarray:
+    """"
+    扫描线求并集：区间已按 (段号, 开始) 排序，返回各段的并集长度
+
+    段内结束位置的累计最大值即“当前已覆盖到的位置”；开始位置超过它时另起一块
+    """
+    reach = pd.Series(end).groupby(segment, sort=False).cummax().to_numpy()
+    new_block = np.ones(len(start), dtype=bool)
+    new_block[1:] = (segment[1:] != segment[:-1]) | (start[1:] > reach[:-1])
+
+    block_start = start[new_block]
+    # 块的结束 = 块内最后一个区间处的累计最大值
+    last_in_block = np.append(np.flatnonzero(new_block)[1:] - 1, len(start) - 1)
+    block_end = reach[last_in_block]
+    return np.bincount(segment[new_block], weights=(block_end - block_start), minlength=n_segments)
+
+def _peak_concurrency(segment: np.ndarray, start: np.ndarray, end: np.ndarray, n_segments: int) -> np.ndarray:
+    """"
+    扫描线求峰值并发：开始 +1、结束 -1，按 (段号, 位置) 排序后累加；
+    同一位置先结束后开始（首尾相接的区间不算同时在手）。各段的增减恰好抵消，可以整列累加
+    """
+    n = len(start)
+    seg = np.concatenate([segment, segment])
+    pos = np.concatenate([start, end])
+    delta = np.concatenate([np.ones(n, dtype=np.int64), -np.ones(n, dtype=np.int64)])
+    order = np.lexsort((delta, pos, seg))
+    level = np.cumsum(delta[order])
+
+    peak = np.zeros(n_segments, dtype=np.int64)
+    np.maximum.at(peak, seg[order], level)
+    return peak
+
+@profile_stage("operator_occupancy")
+def operator_occupancy(records: pd.DataFrame, keys: tuple = ("iUSER_ID",)) -> pd.DataFrame:
+    """"
+    完成记录 -> 每个「keys × 日期」一行的占用情况
+
+    records 需要 keys 与 dUPDATE_TIME / dNODE_TIME 列；领取或提交时间缺失、
+    提交不晚于领取、或完全落在非工作时段的记录不参与统计
+    返回列：keys + date / 记录数 / 记录工时 (h) / 占用工时 (h) / 峰值并发 / 平均并发
+    """
+    keys = list(keys)
+    columns = keys + ["date", "记录数", "记录工时 (h)", "占用工时 (h)", "峰值并发", "平均并发"]
+
+    start = np.asarray(records["dUPDATE_TIME"], dtype="datetime64[ns]").view(np.int64)
+    end = np.asarray(records["dNODE_TIME"], dtype="datetime64[ns]").view(np.int64)
+    grouped = records.groupby(keys, observed=True, sort=True)
+    # 键值缺失的记录 ngroup 为 NaN（浮点），记为 -1 后与其他无效记录一起去掉
+    group_ids = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    nat = np.iinfo(np.int64).min
+    valid = (start != nat) & (end != nat) & (start < end) & (group_ids >= 0)
+    if not valid.any():
+        return pd.DataFrame(columns=columns)
+
+    # 组号 i 对应的键值（与 ngroup 的编号一致）
+    group_keys = grouped.size().index.to_frame(index=False)
+    start, end, group_ids = start[valid], end[valid], group_ids[valid]
+
+    # 1. 按自然日切开，每个「组 × 日期」为一段
+    group, day, start, end = _day_pieces(group_ids, start, end)
+
+    # 2. 映射到工作时间轴（按组内人员的排班），完全落在非工作时段的部分长度为 0，去掉
+    operators = None
+    if "iUSER_ID" in keys:
+        operators = np.tile(group_keys["iUSER_ID"].to_numpy()[group], 2)
+    pos = _work_positions(np.concatenate([start, end]), operators)
+    ws, we = pos[:len(start)], pos[len(start):]
+    keep = we > ws
+    group, day, ws, we = group[keep], day[keep], ws[keep], we[keep]
+    if not len(ws):
+        return pd.DataFrame(columns=columns)
+
+    # 3. 按 (段, 开始) 排序一次
+    first_day = int(day.min())
+    n_days = int(day.max()) - first_day + 1
+    segment_of = group.astype(np.int64) * n_days + (day - first_day)
+    order = np.lexsort((ws, segment_of))
+    segment_of, ws, we = segment_of[order], ws[order], we[order]
+
+    segments, segment = np.unique(segment_of, return_inverse=True)
+    n_segments = len(segments)
+
+    # 4. 并集长度、记录长度之和与峰值并发
+    occupied_ns = _union_length(segment, ws, we, n_segments)
+    record_ns = np.bincount(segment, weights=(we - ws), minlength=n_segments)
+    peak = _peak_concurrency(segment, ws, we, n_segments)
+
+    result = group_keys.iloc[segments // n_days].reset_index(drop=True)
+    result["date"] = pd.to_datetime((first_day + segments % n_days) * NS_PER_DAY)
+    result["记录数"] = np.bincount(segment, minlength=n_segments)
+    result["记录工时 (h)"] = work_ns_to_hours(record_ns)
+    result["占用工时 (h)"] = work_ns_to_hours(occupied_ns)
+    result["峰值并发"] = peak
+    result["平均并发"] = np.round(record_ns / occupied_ns, 3)
+    return result[columns]
+
+def occupancy_summary(occupancy: pd.DataFrame, user_batch_time: pd.DataFrame | None = None) -> pd.DataFrame:
+    """"
+    每个人员一行：出勤天数、记录工时、占用工时、峰值并发
+
+    user_batch_time: 可选，「人员 × 工序 × 批次」时间表（get_aggregate(df, "user_batch_time")），
+                     给出按批次区间计算的工时（任务 1.5 的口径）与占用工时的比值
+    """
+    micro = occupancy.assign(
+        record_uh=hours_to_micro(occupancy["记录工时 (h)"]),
+        occupied_uh=hours_to_micro(occupancy["占用工时 (h)"]),
+    )
+    grouped = micro.groupby("iUSER_ID", observed=True, sort=True)
+    summary = pd.DataFrame({
+        "天数": grouped["date"].nunique(),
+        "记录工时 (h)": grouped["record_uh"].sum() / 1e6,
+        "占用工时 (h)": grouped["occupied_uh"].sum() / 1e6,
+        "峰值并发": grouped["峰值并发"].max(),
+    })
+    if user_batch_time is not None:
+        batch_uh = (
+            user_batch_time
+            .assign(batch_uh=hours_to_micro(user_batch_time["batch_hours"]))
+            .groupby("iUSER_ID", observed=True)["batch_uh"].sum()
+        )
+        summary["批次区间工时 (h)"] = batch_uh.reindex(summary.index).fillna(0) / 1e6
+        summary["批次区间 / 占用"] = summary["批次区间工时 (h)"] / summary["占用工时 (h)"]
+    return summary.round(3).reset_index()
+
+
+if __name__ == "__main__":
+    import importlib.util
+    from pathlib import Path
+    from aggregates import get_aggregate
+    from result_writer import FORMATS, OVERSIZE_MODES, configure_output, write_result
+
+    parser = argparse.ArgumentParser(description="人员实际占用工时与并发（区间并集）")
+    parser.add_argument("--data", default="data/data.xlsx",
+                        help="原始数据文件路径（也可以是目录或通配符，合并多个导出文件）")
+    parser.add_argument("--by-flow", action="store_true", help="按 人员 × 工序 分别统计")
+    parser.add_argument("--output", default="result/occupancy.xlsx", help="结果文件路径")
+    parser.add_argument("--output-format", choices=FORMATS, default=None, help="结果格式（默认 xlsx）")
+    parser.add_argument("--oversize", choices=OVERSIZE_MODES, default=None,
+                        help="xlsx 工作表超过行数上限时：split 拆分 / error 报错（默认 split）")
+    args = parser.parse_args()
+    configure_output(args.output_format, args.oversize)
+
+    spec = importlib.util.spec_from_file_location(
+        "preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py")
+    )
+    preprocess_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(preprocess_module)
+
+    df = preprocess_module.preprocess_data(args.data)
+    df_finished = get_aggregate(df, "finished")
+    occupancy = get_aggregate(df, "operator_occupancy").copy()
+    # 人员汇总始终按人员求并集（同一人员不同工序的重叠部分也只算一次）
+    summary = occupancy_summary(occupancy, get_aggregate(df, "user_batch_time"))
+    if args.by_flow:
+        occupancy = operator_occupancy(df_finished, ["iUSER_ID", "工序"])
+
+    with pd.option_context("display.max_rows", 20, "display.width", 200):
+        print(summary.to_string(index=False))
+    occupancy["date"] = occupancy["date"].dt.date
+    print(f"已保存: {write_result({'每日占用': occupancy, '人员汇总': summary}, Path(args.output))}")
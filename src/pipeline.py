@@ -0,0 +1,608 @@
+# src/pipeline.py
+"""
+单进程流水线入口：只预处理一次，把各任务建模为声明了输入的节点（DAG），
+节点之间共享中间结果（完成记录、批次时间表等），并支持只运行部分任务。
+
+用法：
+    python src/pipeline.py                       # 运行全部任务
+    python src/pipeline.py --only task1_4,task2_2
+    python src/pipeline.py --jobs 8              # 任务分发到 8 个工作进程
+    python src/pipeline.py --profile result/profile --cprofile   # 记录各阶段用时与内存
+    python src/pipeline.py --headless            # 只生成结果表（result1_x / result3），不作图
+    python src/pipeline.py --import-times        # 列出各模块的导入用时
+    python src/pipeline.py --engine duckdb       # 表 1 ~ 表 5 改用 SQL 引擎计算（见 sql_backend.py）
+    python src/pipeline.py --engine polars       # 任务 1 / 任务 2 改用 Polars 惰性查询计算（见 polars_engine.py）
+    python src/pipeline.py --engine cube         # 案卷数改由预聚合立方体上卷（见 cube.py）
+    python src/pipeline.py --output-format parquet   # 结果表写成 Parquet（见 result_writer.py）
+    python src/pipeline.py --calendar config/calendar.json   # 按排班日历计算工时（见 calendars.py）
+
+作图库（matplotlib）与聚类库（sklearn）在第一次作图 / 聚类时才导入，
+headless 模式下不会加载 matplotlib。
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import calendars
+import profiling
+import result_writer
+
+
+def _load_script(file_name: str):
+    """动态导入 src/ 下以数字开头的脚本模块（记录导入用时）"""
+    t0 = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    profiling.record_import_time(file_name, time.perf_counter() - t0)
+    return module
+
+
+preprocess_module = _load_script("01_preprocess.py")
+task1_module = _load_script("02_task1_statistics.py")
+task2_module = _load_script("03_task2_visualization.py")
+task3_module = _load_script("04_task3_pattern.py")
+
+from aggregates import get_aggregate
+from cache import has_parquet, write_shared_frame, read_shared_frame
+from sources import is_multi_source
+import sql_backend
+import polars_engine
+import cube as cube_module
+
+
+# ======================
+# 节点注册
+# ======================
+# name -> {"func": 计算函数, "inputs": 依赖的节点/参数名, "task": 是否为最终任务,
+#          "release": 释放结果时调用的函数（如关闭数据库连接），可为 None}
+NODES = {}
+
+# 运行参数（不是节点，由 run_pipeline 放入上下文）
+PARAMS = ["data_path", "use_cache", "headless", "engine", "polars_targets"]
+
+def node(name: str, inputs: list, task: bool = False, release=None):
+    """注册一个节点；函数参数与 inputs 一一对应，release(结果) 在结果从上下文中释放时调用"""
+    def decorator(func):
+        NODES[name] = {"func": func, "inputs": list(inputs), "task": task, "release": release}
+        return func
+    return decorator
+
+def _release(context: dict, name: str):
+    """从上下文中释放节点结果，节点注册了 release 时一并调用"""
+    if name not in context:
+        return
+    value = context.pop(name)
+    hook = NODES[name]["release"] if name in NODES else None
+    if hook is not None:
+        hook(value)
+
+def _release_all(context: dict):
+    """释放上下文中所有注册了 release 的节点结果（执行结束或出错时）"""
+    for name in [name for name in context if name in NODES and NODES[name]["release"]]:
+        _release(context, name)
+
+
+# ---------- 共享中间结果 ----------
+@node("df", ["data_path", "use_cache"])
+def _df(data_path, use_cache):
+    return preprocess_module.preprocess_data(data_path, use_cache=use_cache)
+
+@node("df_finished", ["df"])
+def _df_finished(df):
+    return get_aggregate(df, "finished")
+
+@node("archive_index", ["df"])
+def _archive_index(df):
+    return get_aggregate(df, "archive_index")
+
+@node("completed_archives", ["archive_index"])
+def _completed_archives(archive_index):
+    return task1_module.find_completed_archives(archive_index)
+
+@node("df_completed", ["df", "completed_archives"])
+def _df_completed(df, completed_archives):
+    return task1_module.completed_archive_records(df, completed_archives)
+
+@node("batch_time", ["df"])
+def _batch_time(df):
+    return get_aggregate(df, "batch_time")
+
+@node("user_batch_time", ["df"])
+def _user_batch_time(df):
+    return get_aggregate(df, "user_batch_time")
+
+@node("flow_batch_segments", ["df"])
+def _flow_batch_segments(df):
+    return get_aggregate(df, "flow_batch_segments")
+
+@node("user_flow_batch_segments", ["df"])
+def _user_flow_batch_segments(df):
+    return get_aggregate(df, "user_flow_batch_segments")
+
+@node("daily_flow_archive_segments", ["df"])
+def _daily_flow_archive_segments(df):
+    return get_aggregate(df, "daily_flow_archive_segments")
+
+@node("processing_records", ["df"])
+def _processing_records(df):
+    return get_aggregate(df, "processing_records")
+
+
+# ---------- 任务 1 ----------
+@node("task1_1", ["archive_index", "completed_archives"], task=True)
+def _task1_1(archive_index, completed_archives):
+    table = task1_module.calc_task1_1_archive_flow_table(archive_index, completed_archives)
+    return task1_module.save_table(table, "result1_1.xlsx")
+
+@node("task1_2", ["archive_index", "completed_archives"], task=True)
+def _task1_2(archive_index, completed_archives):
+    table, _ = task1_module.calc_task1_2_rework_table(archive_index, completed_archives)
+    return task1_module.save_table(table, "result1_2.xlsx")
+
+@node("task1_3", ["df_completed"], task=True)
+def _task1_3(df_completed):
+    table = task1_module.calc_task1_3_inspection_rework_table(df_completed)
+    return task1_module.save_table(table, "result1_3.xlsx")
+
+@node("task1_4", ["flow_batch_segments", "batch_time"], task=True)
+def _task1_4(flow_batch_segments, batch_time):
+    table = task1_module.calc_task1_4_process_hours_table(flow_batch_segments, batch_time)
+    return task1_module.save_table(table, "result1_4.xlsx")
+
+@node("task1_5", ["user_flow_batch_segments", "user_batch_time"], task=True)
+def _task1_5(user_flow_batch_segments, user_batch_time):
+    table = task1_module.calc_task1_5_user_process_hours_table(user_flow_batch_segments, user_batch_time)
+    return task1_module.save_table(table, "result1_5.xlsx")
+
+
+# ---------- 任务 1（SQL 引擎） ----------
+# engine 不是 pandas 时，run_pipeline 把 task1_x 换成对应的 task1_x_sql 节点
+# 最后一个 task1_x_sql 节点执行完（或执行结束、出错）后关闭数据库连接
+@node("sql_records", ["df", "engine"], release=lambda db: db.close())
+def _sql_records(df, engine):
+    return sql_backend.RecordsDatabase(df, engine=engine)
+
+@node("task1_1_sql", ["sql_records"])
+def _task1_1_sql(db):
+    return task1_module.save_table(db.task1_1(), "result1_1.xlsx")
+
+@node("task1_2_sql", ["sql_records"])
+def _task1_2_sql(db):
+    table, _ = db.task1_2()
+    return task1_module.save_table(table, "result1_2.xlsx")
+
+@node("task1_3_sql", ["sql_records"])
+def _task1_3_sql(db):
+    return task1_module.save_table(db.task1_3(), "result1_3.xlsx")
+
+@node("task1_4_sql", ["sql_records"])
+def _task1_4_sql(db):
+    return task1_module.save_table(db.task1_4(), "result1_4.xlsx")
+
+@node("task1_5_sql", ["sql_records"])
+def _task1_5_sql(db):
+    return task1_module.save_table(db.task1_5(), "result1_5.xlsx")
+
+SQL_TASKS = {f"task1_{i}": f"task1_{i}_sql" for i in range(1, 6)}
+
+
+# ---------- 任务 1 / 任务 2（Polars 引擎） ----------
+# engine 为 polars 时，run_pipeline 把 task1_x / task2_x 换成对应的 _polars 节点，
+# 所需结果由一组惰性查询一次算出（polars_targets 为要计算的任务）
+@node("polars_results", ["data_path", "polars_targets"])
+def _polars_results(data_path, polars_targets):
+    return polars_engine.compute(data_path, polars_targets)
+
+def _polars_table_node(name: str):
+    file_name = f"result1_{name[-1]}.xlsx"
+
+    @node(f"{name}_polars", ["polars_results"])
+    def _task(results):
+        return task1_module.save_table(results["tables"][file_name], file_name)
+
+for _name in ["task1_1", "task1_2", "task1_3", "task1_4", "task1_5"]:
+    _polars_table_node(_name)
+
+@node("task2_1_polars", ["polars_results"])
+def _task2_1_polars(results):
+    task2_module.plot_task2_1_daily_finished_count(None, df_finished=results["daily_arch"])
+
+@node("task2_2_polars", ["polars_results"])
+def _task2_2_polars(results):
+    task2_module.plot_task2_2_daily_workload(None, batch_time=results["batch_time"])
+
+@node("task2_3_polars", ["polars_results"])
+def _task2_3_polars(results):
+    task2_module.plot_task2_3_daily_rework_ratio(None, df_finished=results["daily_arch"])
+
+@node("task2_4_polars", ["polars_results"])
+def _task2_4_polars(results):
+    task2_module.plot_task2_4_image_user_rework_pie(None, top_n=8, df_finished=results["user_flow_arch"])
+
+POLARS_TASKS = {name: f"{name}_polars" for name in polars_engine.POLARS_TASKS}
+
+
+# ---------- 任务 1 / 任务 2（预聚合立方体） ----------
+# engine 为 cube 时，案卷数由 日期 × 工序 × 人员 × 状态 立方体上卷得到（见 cube.py），
+# 批次耗时仍来自批次时间表
+@node("cube", ["df"])
+def _cube(df):
+    return get_aggregate(df, "cube")
+
+@node("finished_cube", ["cube"])
+def _finished_cube(cube):
+    return cube.finished()
+
+@node("cube_completed_archives", ["cube"])
+def _cube_completed_archives(cube):
+    return cube_module.completed_archives(cube)
+
+@node("task1_3_cube", ["cube", "cube_completed_archives"])
+def _task1_3_cube(cube, completed_archives):
+    table = task1_module.calc_task1_3_inspection_rework_table(cube.restrict(archives=completed_archives))
+    return task1_module.save_table(table, "result1_3.xlsx")
+
+@node("task1_4_cube", ["finished_cube", "batch_time"])
+def _task1_4_cube(finished_cube, batch_time):
+    table = task1_module.calc_task1_4_process_hours_table(finished_cube, batch_time)
+    return task1_module.save_table(table, "result1_4.xlsx")
+
+@node("task1_5_cube", ["finished_cube", "user_batch_time"])
+def _task1_5_cube(finished_cube, user_batch_time):
+    table = task1_module.calc_task1_5_user_process_hours_table(finished_cube, user_batch_time)
+    return task1_module.save_table(table, "result1_5.xlsx")
+
+@node("task2_1_cube", ["df", "finished_cube"])
+def _task2_1_cube(df, finished_cube):
+    task2_module.plot_task2_1_daily_finished_count(df, df_finished=finished_cube)
+
+@node("task2_3_cube", ["df", "finished_cube"])
+def _task2_3_cube(df, finished_cube):
+    task2_module.plot_task2_3_daily_rework_ratio(df, df_finished=finished_cube)
+
+@node("task2_4_cube", ["df", "finished_cube"])
+def _task2_4_cube(df, finished_cube):
+    task2_module.plot_task2_4_image_user_rework_pie(df, top_n=8, df_finished=finished_cube)
+
+CUBE_TASKS = {name: f"{name}_cube" for name in
+              ["task1_3", "task1_4", "task1_5", "task2_1", "task2_3", "task2_4"]}
+
+
+# ---------- 任务 2 ----------
+@node("task2_1", ["df", "daily_flow_archive_segments"], task=True)
+def _task2_1(df, daily_flow_archive_segments):
+    task2_module.plot_task2_1_daily_finished_count(df, df_finished=daily_flow_archive_segments)
+
+@node("task2_2", ["df", "batch_time"], task=True)
+def _task2_2(df, batch_time):
+    task2_module.plot_task2_2_daily_workload(df, batch_time=batch_time)
+
+@node("task2_3", ["df", "daily_flow_archive_segments"], task=True)
+def _task2_3(df, daily_flow_archive_segments):
+    task2_module.plot_task2_3_daily_rework_ratio(df, df_finished=daily_flow_archive_segments)
+
+@node("task2_4", ["df", "user_flow_batch_segments"], task=True)
+def _task2_4(df, user_flow_batch_segments):
+    task2_module.plot_task2_4_image_user_rework_pie(df, top_n=8, df_finished=user_flow_batch_segments)
+
+
+# ---------- 任务 3 ----------
+@node("task3_1", ["df", "processing_records"], task=True)
+def _task3_1(df, processing_records):
+    task3_module.analyze_processing_time_distribution(df, df_valid=processing_records)
+
+@node("task3_2", ["df", "processing_records", "headless"], task=True)
+def _task3_2(df, processing_records, headless):
+    return task3_module.cluster_operator_behavior(
+        df, df_valid=processing_records, plot=not headless
+    )
+
+@node("task3_3", ["df", "df_finished"], task=True)
+def _task3_3(df, df_finished):
+    task3_module.plot_receive_submit_time_heatmap(df, df_finished=df_finished)
+
+
+TASKS = [name for name, spec in NODES.items() if spec["task"]]
+
+# 产出结果表的任务（headless 模式只运行这些，task3_2 不作图）
+TABLE_TASKS = ["task1_1", "task1_2", "task1_3", "task1_4", "task1_5", "task3_2"]
+
+
+# ======================
+# 调度
+# ======================
+def resolve_order(targets: list) -> list:
+    """"
+    按依赖关系（深度优先）得到需要执行的节点顺序，只包含 targets 及其上游
+    """
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in PARAMS or name in order:
+            return
+        if name not in NODES:
+            raise KeyError(f"未知节点: {name}")
+        if name in visiting:
+            raise ValueError(f"节点存在循环依赖: {name}")
+        visiting.add(name)
+        for dep in NODES[name]["inputs"]:
+            visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for target in targets:
+        visit(target)
+    return order
+
+def _execute(order: list, context: dict, targets: list, verbose: bool = True,
+             release: bool = True) -> dict:
+    """"
+    依次执行 order 中尚未计算的节点，结果写入 context
+
+    release: 是否在最后一个下游节点执行完后释放中间结果
+    """
+    # 每个节点还剩多少个下游节点未执行
+    remaining = {name: 0 for name in order}
+    for name in order:
+        for dep in NODES[name]["inputs"]:
+            if dep in remaining:
+                remaining[dep] += 1
+
+    results = {}
+    for name in order:
+        spec = NODES[name]
+        if name not in context:
+            t0 = time.perf_counter()
+            with profiling.profile_stage(f"node:{name}"):
+                context[name] = spec["func"](*(context[dep] for dep in spec["inputs"]))
+            if verbose:
+                print(f"[{name}] {time.perf_counter() - t0:.2f}s")
+
+        if name in targets:
+            results[name] = context[name]
+
+        if not release:
+            continue
+        for dep in spec["inputs"]:
+            if dep in remaining:
+                remaining[dep] -= 1
+                if remaining[dep] == 0:
+                    _release(context, dep)
+
+    return results
+
+def run_pipeline(targets: list | None = None, data_path: str = "data/data.xlsx",
+                 use_cache: bool = True, verbose: bool = True, jobs: int = 1,
+                 headless: bool = False, engine: str = "pandas") -> dict:
+    """"
+    执行指定任务（默认全部），返回 {任务名: 任务返回值}
+
+    jobs > 1 时，预处理完成后把各任务分发到进程池并行执行（见 _run_parallel）；
+    单进程模式下中间结果在最后一个下游节点执行完后即释放，控制内存占用
+
+    headless: 只生成结果表（默认任务为 TABLE_TASKS），不调用任何作图代码
+    engine: 表 1 ~ 表 5 的计算引擎，"pandas"、SQL 引擎（"auto" / "duckdb" / "sqlite"），
+            或 "polars"（任务 1 / 任务 2 由 Polars 惰性查询计算，Polars 自身多线程执行，
+            这些任务不再分发到进程池；任务 3 仍走 pandas 路径），
+            或 "cube"（任务 1.3 ~ 1.5、2.1、2.3、2.4 的案卷数由落盘的预聚合立方体上卷）
+    """
+    if headless:
+        plots = [name for name in targets or [] if name not in TABLE_TASKS]
+        if plots:
+            raise ValueError(f"headless 模式只能运行出表任务: {', '.join(plots)}")
+    targets = list(targets) if targets else list(TABLE_TASKS if headless else TASKS)
+    context = {"data_path": data_path, "use_cache": use_cache,
+               "headless": headless, "engine": engine}
+
+    # Polars 引擎：任务 1 / 任务 2 在主进程由一组惰性查询算出，其余任务走 pandas 路径
+    if engine == "polars":
+        context["polars_targets"] = [name for name in targets if name in POLARS_TASKS]
+        nodes = [POLARS_TASKS[name] for name in context["polars_targets"]]
+        with result_writer.concurrent_writes():
+            results = _execute(resolve_order(nodes), context, nodes, verbose=verbose)
+        results = {name: results[POLARS_TASKS[name]] for name in context["polars_targets"]}
+        rest = [name for name in targets if name not in POLARS_TASKS]
+        if rest:
+            results.update(run_pipeline(rest, data_path, use_cache, verbose, jobs, headless))
+        return results
+
+    # SQL 引擎 / 立方体：任务换成对应的节点，返回值仍以原任务名为键
+    aliases = {}
+    if engine == "cube":
+        aliases = {CUBE_TASKS[name]: name for name in targets if name in CUBE_TASKS}
+        targets = [CUBE_TASKS.get(name, name) for name in targets]
+    elif engine != "pandas":
+        context["engine"] = sql_backend.resolve_engine(engine)
+        aliases = {SQL_TASKS[name]: name for name in targets if name in SQL_TASKS}
+        targets = [SQL_TASKS.get(name, name) for name in targets]
+
+    if jobs > 1 and len(targets) > 1:
+        _execute(resolve_order(["df"]), context, [], verbose=verbose)
+        if aliases and engine == "cube":
+            # 先在主进程建好并落盘立方体，工作进程直接读取
+            get_aggregate(context["df"], "cube")
+        elif aliases:
+            # 先在主进程建好数据库文件，工作进程只读打开
+            sql_backend.RecordsDatabase(context["df"], engine=context["engine"]).close()
+        results = _run_parallel(targets, context["df"], jobs, verbose=verbose,
+                                params={"headless": headless, "engine": context["engine"]})
+    else:
+        # 各结果表提交后由写出进程并行写出，计算继续进行
+        try:
+            with result_writer.concurrent_writes():
+                results = _execute(resolve_order(targets), context, targets, verbose=verbose)
+        finally:
+            _release_all(context)
+    return {aliases.get(name, name): value for name, value in results.items()}
+
+
+# ======================
+# 多进程并行
+# ======================
+# 工作进程内的上下文：同一进程执行多个任务时复用 df 及中间结果
+_worker_context = {}
+
+def _init_worker(frame_path, df, attrs, profile_settings=None, params=None,
+                 output_settings=None, calendar_settings=None):
+    """"
+    工作进程初始化：从内存映射的 Arrow 文件读取预处理结果（每个进程只读一次）
+
+    attrs: 主进程 df.attrs（数据集版本、源前缀），工作进程据此打开与主进程相同的立方体 / 数据库
+
+    profile_settings: 主进程开启了分阶段记录时，以相同设置在工作进程中开启（记录随结果交回）
+    params: 任务用到的运行参数（如 headless）
+    output_settings: 主进程的结果输出设置（格式、超行处理），结果表在各工作进程中直接写出
+    calendar_settings: 主进程的排班日历设置，工作进程读取同一份落盘的日历索引
+    """
+    if calendar_settings is not None and calendar_settings["path"] is not None:
+        calendars.configure_calendar(calendar_settings["path"], calendar_settings["cache_dir"])
+    if output_settings is not None:
+        result_writer.configure_output(fmt=output_settings["format"],
+                                       oversize=output_settings["oversize"])
+    if profile_settings is not None and not profiling.is_enabled():
+        profiling.enable_profiling(
+            None, memory=profile_settings["memory"], cprofile=False
+        )
+    if df is None:
+        df = read_shared_frame(frame_path)
+    df.attrs.update(attrs or {})
+    _worker_context.clear()
+    _worker_context["df"] = df
+    _worker_context.update(params or {})
+
+def _run_task_in_worker(name: str):
+    """"
+    在工作进程中执行单个任务，返回 (任务名, 返回值, 用时, 错误信息, 阶段记录)
+    """
+    t0 = time.perf_counter()
+    try:
+        value = _execute(resolve_order([name]), _worker_context, [name],
+                         verbose=False, release=False)[name]
+        return name, value, time.perf_counter() - t0, None, profiling.take_records()
+    except Exception:
+        return (name, None, time.perf_counter() - t0, traceback.format_exc(),
+                profiling.take_records())
+
+def _run_parallel(targets: list, df, jobs: int, verbose: bool = True,
+                  params: dict | None = None) -> dict:
+    """"
+    把各任务分发到 jobs 个工作进程并行执行，收集返回值与错误
+
+    预处理结果写成一次未压缩的 Arrow IPC 文件，各进程以内存映射方式读取；
+    未安装 pyarrow 时退化为在进程初始化时传输一次 DataFrame
+    """
+    results = {}
+    errors = {}
+    attrs = dict(df.attrs)
+    with tempfile.TemporaryDirectory(prefix="pipeline_") as tmp_dir:
+        profile_settings = profiling.profiling_settings() if profiling.is_enabled() else None
+        if has_parquet():
+            frame_path = write_shared_frame(df, os.path.join(tmp_dir, "df.arrow"))
+            init_args = (str(frame_path), None, attrs, profile_settings, params,
+                         result_writer.output_settings(), calendars.calendar_settings())
+        else:
+            init_args = (None, df, attrs, profile_settings, params,
+                         result_writer.output_settings(), calendars.calendar_settings())
+
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            futures = [pool.submit(_run_task_in_worker, name) for name in targets]
+            for future in as_completed(futures):
+                name, value, elapsed, error, records = future.result()
+                profiling.add_records(records)
+                if error is None:
+                    results[name] = value
+                    if verbose:
+                        print(f"[{name}] {elapsed:.2f}s")
+                else:
+                    errors[name] = error
+                    print(f"[{name}] 失败:\n{error}")
+
+    if errors:
+        raise RuntimeError(f"以下任务执行失败: {', '.join(sorted(errors))}")
+    return results
+
+def _parse_only(value: str) -> list:
+    names = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in names if v not in TASKS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"未知任务: {', '.join(unknown)}（可选: {', '.join(TASKS)}）"
+        )
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="预处理一次并执行全部 / 部分分析任务")
+    parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径（也可以是目录或通配符，见 sources.py）")
+    parser.add_argument("--only", type=_parse_only, default=None,
+                        help="只运行指定任务，逗号分隔，如 task1_4,task2_2")
+    parser.add_argument("--no-cache", action="store_true", help="不使用预处理缓存")
+    parser.add_argument("--headless", action="store_true",
+                        help="只生成结果表（result1_x / result3），不作图、不加载 matplotlib")
+    parser.add_argument("--import-times", action="store_true",
+                        help="结束时列出各模块（含按需导入的作图 / 聚类库）的导入用时")
+    parser.add_argument("--engine", choices=["pandas", "auto", "duckdb", "sqlite", "polars", "cube"],
+                        default="pandas",
+                        help="计算引擎（默认 pandas；auto / duckdb / sqlite 为表 1 ~ 表 5 的 SQL 引擎，"
+                             "见 sql_backend.py；polars 计算任务 1 / 任务 2（只支持单个源文件），见 polars_engine.py；"
+                             "cube 的案卷数由预聚合立方体上卷得到，见 cube.py）")
+    parser.add_argument("--jobs", type=int, default=1, help="并行执行任务的进程数（默认 1）")
+    parser.add_argument("--output-format", choices=result_writer.FORMATS, default="xlsx",
+                        help="结果表格式（默认 xlsx；parquet / csv 供下游系统读取，见 result_writer.py）")
+    parser.add_argument("--oversize", choices=result_writer.OVERSIZE_MODES, default="split",
+                        help="超过 Excel 行数上限的表：拆分到多个工作表（默认）或报错")
+    parser.add_argument("--write-jobs", type=int, default=None,
+                        help="并行写出结果表的进程数（默认 CPU 核数；--jobs 大于 1 时各任务进程自行写出）")
+    parser.add_argument("--calendar", default=None,
+                        help="排班配置文件（JSON：节假日、调休、班次与人员分配，见 calendars.py；"
+                             "默认使用 utils.py 的固定工作日历，只支持 pandas / cube 引擎）")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="记录各阶段的用时、行数与峰值内存，写入 DIR/profile.json / .csv")
+    parser.add_argument("--profile-memory", choices=["tracemalloc", "rss", "none"],
+                        default="tracemalloc", help="峰值内存的统计方式（默认 tracemalloc）")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="同时为每个阶段保存 cProfile 结果（需配合 --profile）")
+    args = parser.parse_args()
+
+    if args.headless and args.only:
+        plots = [name for name in args.only if name not in TABLE_TASKS]
+        if plots:
+            parser.error(f"--headless 只能运行出表任务（{', '.join(TABLE_TASKS)}）: {', '.join(plots)}")
+    if args.engine == "polars" and is_multi_source(args.data):
+        parser.error(f"--engine polars 只支持单个源文件，目录 / 通配符请改用其他引擎: {args.data}")
+
+    result_writer.configure_output(fmt=args.output_format, oversize=args.oversize,
+                                   jobs=args.write_jobs)
+    if args.calendar:
+        try:
+            calendars.configure_calendar(args.calendar)
+            if args.engine not in ("pandas", "cube"):
+                calendars.require_fixed_calendar(args.engine)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.profile:
+        profiling.enable_profiling(
+            args.profile,
+            memory=None if args.profile_memory == "none" else args.profile_memory,
+            cprofile=args.cprofile,
+        )
+
+    t_start = time.perf_counter()
+    run_pipeline(args.only, data_path=args.data, use_cache=not args.no_cache,
+                 jobs=args.jobs, headless=args.headless, engine=args.engine)
+    print(f"全部完成，用时 {time.perf_counter() - t_start:.2f}s")
+    if args.import_times:
+        print("导入用时（本进程）:")
+        print(profiling.format_import_times())
@@ -0,0 +1,549 @@
+# src/polars_engine.py
+"""
+可选的 Polars 惰性执行引擎：预处理（时间转换、工序映射、返工 / 完成标记、有效工时）与
+任务 1 / 任务 2 的聚合写成同一组惰性查询，一次性交给 Polars 执行：
+
+- 查询直接建立在源文件的惰性扫描上（scan_source）：只读取用到的列，is_finished 等过滤条件
+  下推到读取之后、工时计算之前；预处理结果在各查询间共用（LazyFrame.cache），各查询多线程执行
+- 工作日历的范围只扫描领取 / 提交时间两列求最小 / 最大值（day_range），不读入整个文件
+- 有效工时与 calc_work_hours_array 同一算法：查工作日历表（utils.work_calendar_table）
+- 工时合计按 pandas 路径的行顺序取回明细，在 pandas 中分组求和，浮点结果逐位一致
+- 结果转换回 pandas，列类型与行顺序同 pandas 路径：表 1 ~ 表 5 逐行一致，
+  任务 2 的图仍由 03_task2_visualization.py 绘制，只是输入换成计划中算好的精简记录
+
+任务 3 需要逐条记录（聚类特征、时段分布），仍走 pandas 路径。
+只支持单个源文件；目录 / 通配符（多个导出文件合并去重，见 sources.py）请用 pandas 引擎。
+
+用法：
+    python src/polars_engine.py --data data/data.xlsx
+    python src/polars_engine.py --data data/big.csv --tables-only --threads 8
+    python src/polars_engine.py --data data/big.csv --explain     # 打印优化后的查询计划
+    python src/pipeline.py --engine polars
+"""
+
+import argparse
+import importlib.util
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from archive_index import completion_hours
+from utils import FLOW_MAP, NS_PER_DAY, work_calendar_table, work_ns_to_hours, work_periods_ns
+from profiling import profile_stage, timed_import
+from sources import is_multi_source
+
+
+# 与 01_preprocess.py 一致
+TIME_COLS = ["dUPDATE_TIME", "dNODE_TIME", "dPROC_TIME"]
+CATEGORY_COLS = ["sARCH_ID", "sBatch_number", "工序"]
+
+# 表 1 中计入完成时长的工序（同 calc_task1_1_archive_flow_table）
+VALID_FLOWS = ["扫描", "图像处理", "自检全检"]
+
+# 任务 -> 需要的查询（类别取值等列类型信息总是一并计算）
+TASK_PLANS = {
+    "task1_1": ["table1", "table1_hours"],
+    "task1_2": ["table2", "rework_count"],
+    "task1_3": ["table3"],
+    "task1_4": ["table4", "batch_time"],
+    "task1_5": ["table5", "user_batch_time"],
+    "task2_1": ["daily_arch"],
+    "task2_2": ["batch_time"],
+    "task2_3": ["daily_arch"],
+    "task2_4": ["user_flow_arch"],
+}
+POLARS_TASKS = list(TASK_PLANS)
+
+
+def has_polars() -> bool:
+    """是否安装了 Polars"""
+    return importlib.util.find_spec("polars") is not None
+
+def _pl():
+    if not has_polars():
+        raise ImportError("Polars 引擎需要 polars（pip install polars），或改用默认的 pandas 引擎")
+    return timed_import("polars")
+
+
+# ======================
+# 预处理计划
+# ======================
+def scan_source(data_path: str, infer_schema_length: int | None = 100):
+    """"
+    源文件 -> 惰性表
+
+    .csv 惰性扫描，按前 infer_schema_length 行推断列类型（None 表示按全部行，同 pandas.read_csv）；
+    Excel 无法惰性扫描，先由 pandas 读入再转换；目录 / 通配符不支持（ValueError）
+    """
+    if is_multi_source(data_path):
+        raise ValueError(f"Polars 引擎只支持单个源文件，目录 / 通配符请改用 pandas 引擎: {data_path}")
+    pl = _pl()
+    if Path(data_path).suffix.lower() == ".csv":
+        return pl.scan_csv(data_path, infer_schema_length=infer_schema_length)
+    return pl.from_pandas(pd.read_excel(data_path)).lazy()
+
+def _to_datetime(pl, schema, col: str):
+    """同 pd.to_datetime(errors="coerce")：无法解析的值为空"""
+    expr = pl.col(col)
+    if schema[col] == pl.String:
+        expr = expr.str.to_datetime(time_unit="ns", strict=False)
+    return expr.cast(pl.Datetime("ns"))
+
+@profile_stage("polars_day_range")
+def day_range(source) -> tuple:
+    """"
+    领取 / 提交时间覆盖的纪元日范围 (first_day, last_day)，用于确定工作日历的范围
+
+    source 为 scan_source 的惰性表：只扫描这两列求最小 / 最大值，不读入整个文件
+    """
+    pl = _pl()
+    schema = source.collect_schema()
+    times = [_to_datetime(pl, schema, col) for col in ["dUPDATE_TIME", "dNODE_TIME"]]
+    first, last = source.select(
+        pl.min_horizontal([t.min() for t in times]).cast(pl.Int64).alias("first"),
+        pl.max_horizontal([t.max() for t in times]).cast(pl.Int64).alias("last"),
+    ).collect().row(0)
+    if first is None:
+        return 0, 0
+    return first // NS_PER_DAY, last // NS_PER_DAY
+
+def _with_work_ns(pl, lf, st: str, ed: str, days: tuple):
+    """"
+    加上 st ~ ed 的有效工作纳秒数 _work_ns（缺失或 st >= ed 时为 0）
+
+    同 calc_work_hours_array：两端各查一次工作日历，任意时刻的累计工作纳秒数 =
+    当天 cum_ns + （工作日时）当天 00:00 到该时刻落在工作时段内的纳秒数
+    """
+    from calendars import require_fixed_calendar
+
+    require_fixed_calendar("Polars")
+    calendar = pl.from_pandas(work_calendar_table(*days)).lazy()
+
+    def intraday(tod):
+        return pl.sum_horizontal([(tod - a).clip(0, b - a) for a, b in work_periods_ns()])
+
+    def cum(col, prefix):
+        tod = pl.col(col).cast(pl.Int64) - pl.col(f"{prefix}day") * NS_PER_DAY
+        work = pl.when(pl.col(f"{prefix}is_work") == 1).then(intraday(tod)).otherwise(0)
+        return pl.col(f"{prefix}cum_ns") + work
+
+    for col, prefix in [(st, "_st_"), (ed, "_ed_")]:
+        lf = lf.with_columns(
+            (pl.col(col).cast(pl.Int64) // NS_PER_DAY).alias(f"{prefix}day")
+        ).join(
+            calendar.rename({name: f"{prefix}{name}" for name in ["day", "is_work", "cum_ns"]}),
+            on=f"{prefix}day", how="left", maintain_order="left",
+        )
+
+    valid = pl.col(st).is_not_null() & pl.col(ed).is_not_null() & (pl.col(st) < pl.col(ed))
+    return lf.with_columns(
+        pl.when(valid).then(cum(ed, "_ed_") - cum(st, "_st_")).otherwise(0).alias("_work_ns")
+    ).drop([f"{prefix}{name}" for prefix in ["_st_", "_ed_"] for name in ["day", "is_work", "cum_ns"]])
+
+def _hours(pl, work_ns):
+    """"
+    工作纳秒数 -> 小时，保留 6 位小数
+
+    直接调用 utils.work_ns_to_hours（整批 numpy 计算）：Polars 把除以常数改写成乘以倒数，
+    末位可能与 pandas 路径不同
+    """
+    return work_ns.map_batches(
+        lambda s: pl.Series(work_ns_to_hours(s.to_numpy())),
+        return_dtype=pl.Float64, is_elementwise=True,
+    )
+
+def preprocess_plan(source, days: tuple):
+    """"
+    原始惰性表 -> 预处理后的惰性表
+
+    列同 preprocess_data 的结果（类别列此时仍为字符串）
+    """
+    pl = _pl()
+    schema = source.collect_schema()
+    status = pl.col("iNODE_STATUS")
+    lf = source.with_columns(
+        *[_to_datetime(pl, schema, col).alias(col) for col in TIME_COLS],
+        pl.col("iFLOW_NODE_NO").cast(pl.Float64).replace_strict(
+            {float(no): name for no, name in FLOW_MAP.items()}, default=None, return_dtype=pl.String
+        ).alias("工序"),
+        (status == 5).fill_null(False).alias("is_rework"),
+        status.is_in([2, 5]).fill_null(False).alias("is_finished"),
+    )
+    lf = _with_work_ns(pl, lf, "dUPDATE_TIME", "dNODE_TIME", days)
+    return lf.with_columns(
+        _hours(pl, pl.col("_work_ns")).alias("work_hours"),
+        pl.col("dNODE_TIME").dt.truncate("1d").alias("finish_date"),
+    ).drop("_work_ns")
+
+
+# ======================
+# 任务 1 / 任务 2 的查询
+# ======================
+def _batch_plan(pl, finished, keys: list, days: tuple):
+    """完成记录按 keys（以 sBatch_number 结尾）的批次时间区间与有效工时（同 batch_time_table）"""
+    batches = (
+        finished
+        .filter(*[pl.col(key).is_not_null() for key in keys])
+        .group_by(keys)
+        .agg(
+            pl.col("dUPDATE_TIME").min().alias("batch_start"),
+            pl.col("dNODE_TIME").max().alias("batch_end"),
+        )
+    )
+    return (
+        _with_work_ns(pl, batches, "batch_start", "batch_end", days)
+        .with_columns(_hours(pl, pl.col("_work_ns")).alias("batch_hours"))
+        .drop("_work_ns")
+        .sort(keys)
+    )
+
+def _counts_plan(pl, finished, keys: list):
+    """"
+    完成记录按 keys 统计完成案卷数
+
+    工时合计不在 Polars 中求和：由批次查询（行顺序同 batch_time）转回 pandas 后分组求和，
+    浮点结果与 pandas 路径逐位一致（见 _hours_total）
+    """
+    return (
+        finished
+        .filter(*[pl.col(key).is_not_null() for key in keys])
+        .group_by(keys)
+        .agg(pl.col("sARCH_ID").drop_nulls().n_unique().cast(pl.Int64).alias("n_archives"))
+        .sort(keys)
+    )
+
+def _reduced_records(pl, finished, keys: list):
+    """完成记录按 keys 去重，保留是否返工过（任务 2 的完成 / 返工案卷数只依赖这些）"""
+    return (
+        finished
+        .filter(*[pl.col(key).is_not_null() for key in keys])
+        .group_by(keys)
+        .agg(pl.col("is_rework").any())
+        .sort(keys)
+    )
+
+def build_plans(lf, days: tuple, names=None) -> dict:
+    """"
+    预处理后的惰性表 -> {名称: 惰性查询}
+
+    names: 只构建这些查询（默认全部）；列类型信息（类别取值、人员编号范围）总是包含
+    """
+    pl = _pl()
+    finished = lf.filter(pl.col("is_finished"))
+    flows = sorted(FLOW_MAP.values())
+
+    # 案卷 × 工序 的时间、工时与返工情况（同 archive_index，只含能识别的案卷号与工序）
+    archive_flows = (
+        finished
+        .filter(pl.col("sARCH_ID").is_not_null() & pl.col("工序").is_not_null())
+        .group_by(["sARCH_ID", "工序"])
+        .agg(
+            pl.col("dUPDATE_TIME").min().alias("start_time"),
+            pl.col("dNODE_TIME").max().alias("end_time"),
+            pl.col("is_rework").any().alias("reworked"),
+            pl.col("dPROC_TIME").filter(pl.col("is_rework")).min().alias("rework_time"),
+        )
+    )
+    completed = (
+        archive_flows
+        .group_by("sARCH_ID")
+        .agg(pl.len().alias("n_flows"))
+        .filter(pl.col("n_flows") == len(FLOW_MAP))
+        .select("sARCH_ID")
+    )
+    completed_flows = archive_flows.join(completed, on="sARCH_ID", how="semi")
+
+    # 有返工记录的案卷（含工序无法识别的返工记录，同 has_rework）
+    rework_archives = (
+        finished
+        .filter(pl.col("is_rework") & pl.col("sARCH_ID").is_not_null())
+        .select("sARCH_ID")
+        .unique()
+        .with_columns(pl.lit(True).alias("has_rework"))
+    )
+
+    def at_flow(col, flow):
+        return pl.col(col).filter(pl.col("工序") == flow)
+
+    builders = {
+        # 表 1
+        "table1": lambda: completed_flows.group_by("sARCH_ID").agg(
+            *[at_flow("start_time", flow).min().alias(f"{flow}_start_time") for flow in flows],
+            *[at_flow("end_time", flow).max().alias(f"{flow}_end_time") for flow in flows],
+        ).sort("sARCH_ID"),
+        # 表 1 的完成时长：计入的完成记录，保持原记录顺序（见 archive_index.completion_hours）
+        "table1_hours": lambda: (
+            finished
+            .filter(pl.col("sARCH_ID").is_not_null() & pl.col("工序").is_in(VALID_FLOWS))
+            .join(completed, on="sARCH_ID", how="semi", maintain_order="left")
+            .select("sARCH_ID", "工序", "work_hours")
+        ),
+
+        # 表 2：只保留有已知工序返工的案卷
+        "table2": lambda: completed_flows.filter(pl.col("reworked")).group_by("sARCH_ID").agg(
+            *[at_flow("rework_time", flow).min().alias(flow) for flow in flows],
+            *[at_flow("reworked", flow).any().alias(f"_{flow}_reworked") for flow in flows],
+        ).sort("sARCH_ID"),
+        "rework_count": lambda: completed.join(rework_archives, on="sARCH_ID", how="left").select(
+            pl.len().alias("n_completed"),
+            pl.col("has_rework").sum().alias("n_rework"),
+        ),
+
+        # 表 3：完成四道工序的案卷在自检全检工序的全部记录（不限状态）
+        "table3": lambda: (
+            lf.join(completed, on="sARCH_ID", how="semi")
+            .filter((pl.col("工序") == "自检全检") & pl.col("iUSER_ID").is_not_null())
+            .group_by("iUSER_ID")
+            .agg(
+                pl.col("sARCH_ID").drop_nulls().n_unique().cast(pl.Int64).alias("total_archives"),
+                pl.col("sARCH_ID").filter(pl.col("is_rework")).drop_nulls().n_unique()
+                .cast(pl.Int64).alias("rework_archives"),
+            )
+            .sort("iUSER_ID")
+        ),
+
+        # 表 4 / 表 5
+        "table4": lambda: _counts_plan(pl, finished, ["工序"]),
+        "table5": lambda: _counts_plan(pl, finished, ["iUSER_ID", "工序"]),
+        "user_batch_time": lambda: _batch_plan(pl, finished, ["iUSER_ID", "工序", "sBatch_number"], days),
+
+        # 表 4 与任务 2 的输入
+        "batch_time": lambda: _batch_plan(pl, finished, ["工序", "sBatch_number"], days),
+        "daily_arch": lambda: _reduced_records(pl, finished, ["finish_date", "工序", "sARCH_ID"]),
+        "user_flow_arch": lambda: _reduced_records(pl, finished, ["iUSER_ID", "工序", "sARCH_ID"]),
+    }
+
+    plans = {
+        f"{col}_values": lf.select(pl.col(col).drop_nulls().unique().sort())
+        for col in CATEGORY_COLS
+    }
+    plans["user_range"] = lf.select(
+        pl.col("iUSER_ID").min().alias("min"),
+        pl.col("iUSER_ID").max().alias("max"),
+        pl.col("iUSER_ID").null_count().alias("nulls"),
+    )
+    for name in names or builders:
+        plans[name] = builders[name]()
+    return plans
+
+@profile_stage("polars_collect")
+def collect_plans(plans: dict, streaming: bool = False) -> dict:
+    """"
+    一次性执行全部查询（公共子计划只计算一次），返回 {名称: polars.DataFrame}
+
+    streaming: 使用 Polars 的流式引擎（数据大于内存时）
+    """
+    pl = _pl()
+    frames = pl.collect_all(list(plans.values()), engine="streaming" if streaming else "auto")
+    return dict(zip(plans, frames))
+
+
+# ======================
+# 结果转换回 pandas
+# ======================
+def _dtypes(frames: dict) -> dict:
+    """"
+    与 preprocess_data 结果相同的列类型：类别取值为全列去重后排序，
+    人员编号按全列范围取最小整数类型（有缺失值时为 float64，同 pd.to_numeric(downcast="integer")）
+    """
+    dtypes = {
+        col: pd.CategoricalDtype(pd.Index(frames[f"{col}_values"].to_series().to_numpy()))
+        for col in CATEGORY_COLS
+    }
+    user_min, user_max, user_nulls = frames["user_range"].row(0)
+    if user_nulls or user_min is None:
+        dtypes["iUSER_ID"] = np.dtype("float64")
+    else:
+        dtypes["iUSER_ID"] = pd.to_numeric(pd.Series([user_min, user_max]), downcast="integer").dtype
+    return dtypes
+
+def _to_pandas(frame, dtypes: dict) -> pd.DataFrame:
+    table = frame.to_pandas()
+    for col in table.columns:
+        if col in dtypes:
+            table[col] = table[col].astype(dtypes[col])
+    return table
+
+def _hours_total(counts: pd.DataFrame, batches: pd.DataFrame, keys: list) -> pd.Series:
+    """"
+    counts 各行的批次工时合计，保留 3 位小数（无批次时为 NaN）
+
+    batches 的行顺序同 batch_time（按 keys、批次排序），用 pandas 分组求和，与 pandas 路径逐位一致
+    """
+    total = batches.groupby(keys, observed=True)["batch_hours"].sum().round(3)
+    return counts.join(total, on=keys)["batch_hours"]
+
+def task1_tables(frames: dict, dtypes: dict) -> dict:
+    """"
+    查询结果 -> {文件名: 结果表}（只含已计算的表），列与 calc_task1_tables 的结果一致
+    """
+    tables = {}
+    if "table1" in frames:
+        table = _to_pandas(frames["table1"], dtypes)
+        # 没有完成的案卷时，与 pandas 路径一样不输出工序时间列
+        if table.empty:
+            table = table[["sARCH_ID"]]
+        records = _to_pandas(frames["table1_hours"], dtypes)
+        archive_hours = completion_hours(
+            records["sARCH_ID"].cat.codes, records["工序"], records["work_hours"], VALID_FLOWS
+        )
+        codes = table["sARCH_ID"].cat.codes.to_numpy()
+        table["完成时长"] = archive_hours.reindex(codes, fill_value=0.0).round(3).to_numpy()
+        tables["result1_1.xlsx"] = table
+
+    if "table2" in frames:
+        table = _to_pandas(frames["table2"], dtypes)
+        flows = sorted(FLOW_MAP.values())
+        # 列为出现过返工的工序（按名称排序）
+        kept = [flow for flow in flows if table.pop(f"_{flow}_reworked").any()]
+        table = table[["sARCH_ID", *kept]]
+        table.columns = pd.Index(["sARCH_ID", *kept], name="工序")
+        tables["result1_2.xlsx"] = table
+
+    if "table3" in frames:
+        result = _to_pandas(frames["table3"], dtypes)
+        result["rework_archives"] = result["rework_archives"].astype("float64")
+        result["返工案卷占比 (%)"] = (
+            result["rework_archives"] / result["total_archives"] * 100
+        ).round(3)
+        # 与 pandas 路径相同的输入顺序 + 相同的排序调用，并列时顺序也一致
+        result_sorted = result.sort_values("返工案卷占比 (%)", ascending=False)
+        tables["result1_3.xlsx"] = result_sorted[["iUSER_ID", "返工案卷占比 (%)"]]
+
+    if "table4" in frames:
+        result = _to_pandas(frames["table4"], dtypes).rename(columns={"n_archives": "完成案卷的数量"})
+        result["总耗时 (h)"] = _hours_total(result, _to_pandas(frames["batch_time"], dtypes), ["工序"])
+        result["平均耗时 (h/卷)"] = (result["总耗时 (h)"] / result["完成案卷的数量"]).round(3)
+        tables["result1_4.xlsx"] = result
+
+    if "table5" in frames:
+        result = _to_pandas(frames["table5"], dtypes).rename(columns={"n_archives": "完成案卷的数量"})
+        result["工作时长 (h)"] = _hours_total(
+            result, _to_pandas(frames["user_batch_time"], dtypes), ["iUSER_ID", "工序"]
+        )
+        result["每个案卷的平均耗时 (h/卷)"] = (
+            result["工作时长 (h)"] / result["完成案卷的数量"]
+        ).round(3)
+        tables["result1_5.xlsx"] = result
+
+    return tables
+
+def rework_ratio(frames: dict) -> float:
+    """返工案卷占比 %（同 calc_task1_2_rework_table）"""
+    n_completed, n_rework = frames["rework_count"].row(0)
+    return round(n_rework / n_completed * 100, 3)
+
+def _plan_names(tasks) -> list:
+    unknown = [name for name in tasks if name not in TASK_PLANS]
+    if unknown:
+        raise ValueError(f"Polars 引擎不支持的任务: {', '.join(unknown)}")
+    return list(dict.fromkeys(plan for name in tasks for plan in TASK_PLANS[name]))
+
+def task_plans(data_path: str, tasks=None, infer_schema_length: int | None = 100) -> dict:
+    """"
+    源文件 -> 指定任务（默认 POLARS_TASKS）需要的全部惰性查询
+
+    查询直接建立在源文件的惰性扫描上，用到的列与过滤条件由优化器下推到读取
+    """
+    names = _plan_names(list(tasks) if tasks else POLARS_TASKS)
+    source = scan_source(data_path, infer_schema_length)
+    days = day_range(source)
+    # 预处理结果在各查询间共用
+    return build_plans(preprocess_plan(source, days).cache(), days, names)
+
+@profile_stage("polars_engine")
+def compute(data_path: str, tasks=None, streaming: bool = False) -> dict:
+    """"
+    用 Polars 引擎计算指定任务（默认 POLARS_TASKS）需要的全部结果，返回：
+    - "tables":         {文件名: 结果表}（任务 1）
+    - "rework_ratio":   返工案卷占比 %（包含 task1_2 时）
+    - "daily_arch":     完成日期 × 工序 × 案卷 的完成记录（任务 2.1 / 2.3 的 df_finished）
+    - "batch_time":     「工序 + 批次」时间表（任务 2.2）
+    - "user_flow_arch": 人员 × 工序 × 案卷 的完成记录（任务 2.4 的 df_finished）
+    """
+    pl = _pl()
+    # 先按前若干行推断列类型（快得多）；后面的值与推断的类型不符时，改为按全部行推断
+    try:
+        frames = collect_plans(task_plans(data_path, tasks), streaming=streaming)
+    except pl.exceptions.ComputeError:
+        frames = collect_plans(task_plans(data_path, tasks, infer_schema_length=None), streaming=streaming)
+
+    dtypes = _dtypes(frames)
+    results = {"tables": task1_tables(frames, dtypes)}
+    if "rework_count" in frames:
+        results["rework_ratio"] = rework_ratio(frames)
+    for name in ["daily_arch", "batch_time", "user_flow_arch"]:
+        if name in frames:
+            results[name] = _to_pandas(frames[name], dtypes)
+    return results
+
+
+# ======================
+# 保存结果表 / 作图
+# ======================
+def _load_script(file_name: str):
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_tasks(results: dict, tasks=None):
+    """"
+    由 compute 的结果保存表 1 ~ 表 5（result/）并绘制任务 2 的图（result/figures/）
+    """
+    tasks = list(tasks) if tasks else POLARS_TASKS
+    if any(name.startswith("task1_") for name in tasks):
+        task1_module = _load_script("02_task1_statistics.py")
+        for name in tasks:
+            if name.startswith("task1_"):
+                file_name = f"result1_{name[-1]}.xlsx"
+                task1_module.save_table(results["tables"][file_name], file_name)
+
+    if any(name.startswith("task2_") for name in tasks):
+        task2_module = _load_script("03_task2_visualization.py")
+        plots = {
+            "task2_1": lambda: task2_module.plot_task2_1_daily_finished_count(
+                None, df_finished=results["daily_arch"]),
+            "task2_2": lambda: task2_module.plot_task2_2_daily_workload(
+                None, batch_time=results["batch_time"]),
+            "task2_3": lambda: task2_module.plot_task2_3_daily_rework_ratio(
+                None, df_finished=results["daily_arch"]),
+            "task2_4": lambda: task2_module.plot_task2_4_image_user_rework_pie(
+                None, top_n=8, df_finished=results["user_flow_arch"]),
+        }
+        for name in tasks:
+            if name in plots:
+                plots[name]()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="用 Polars 惰性查询计算任务 1 的结果表与任务 2 的图")
+    parser.add_argument("--data", default="data/data.xlsx", help="原始数据文件路径（.csv / .xlsx）")
+    parser.add_argument("--tables-only", action="store_true", help="只生成表 1 ~ 表 5，不作图")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Polars 线程数（默认使用全部 CPU）")
+    parser.add_argument("--streaming", action="store_true", help="使用 Polars 的流式引擎执行")
+    parser.add_argument("--explain", action="store_true", help="只打印优化后的查询计划")
+    args = parser.parse_args()
+    if is_multi_source(args.data):
+        parser.error(f"Polars 引擎只支持单个源文件，目录 / 通配符请改用 pipeline.py 的 pandas 引擎: {args.data}")
+
+    # 线程数须在导入 polars 之前设置
+    if args.threads:
+        os.environ["POLARS_MAX_THREADS"] = str(args.threads)
+
+    tasks = [name for name in POLARS_TASKS if name.startswith("task1_") or not args.tables_only]
+    if args.explain:
+        for name, plan in task_plans(args.data, tasks).items():
+            print(f"== {name} ==\n{plan.explain()}\n")
+    else:
+        t0 = time.perf_counter()
+        results = compute(args.data, tasks, streaming=args.streaming)
+        run_tasks(results, tasks)
+        print(f"返工案卷占比: {results['rework_ratio']}%")
+        print(f"全部完成，用时 {time.perf_counter() - t0:.2f}s")
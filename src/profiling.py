@@ -0,0 +1,299 @@
+# src/profiling.py
+"""
+分阶段性能记录：墙钟时间、CPU 时间、输入 / 输出行数与峰值内存，
+可选为每个阶段保存 cProfile 结果。默认关闭，关闭时装饰器只多一次标志判断。
+
+开启方式（任选其一）：
+    python src/pipeline.py --profile result/profile [--cprofile]
+    ARCHIVE_PROFILE=result/profile python src/02_task1_statistics.py
+    profiling.enable_profiling("result/profile")      # 代码中开启，结束时调用 write_profile
+
+用法：
+    @profile_stage("task1_4")
+    def calc_task1_4_process_hours_table(...): ...
+
+    with profile_stage("task2_1.savefig"):
+        plt.savefig(...)
+"""
+
+import atexit
+import cProfile
+import csv
+import functools
+import importlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+
+_state = {
+    "enabled": False,
+    "output_dir": None,      # 结果目录（None 表示只保存在内存中）
+    "memory": None,          # "tracemalloc" / "rss" / None
+    "cprofile": False,       # 是否为每个阶段保存 cProfile 结果
+}
+
+# 已完成的阶段记录（按结束顺序）
+_records = []
+
+# 正在执行的阶段：[(名称, 已知的峰值内存), ...]，用于嵌套阶段的峰值内存与层级
+_stack = []
+
+# 当前是否有阶段在做 cProfile（同一时间只能有一个分析器）
+_active_profiler = []
+
+# 阶段名 -> 已保存的 cProfile 文件数（同名阶段多次执行时依次编号）
+_prof_counts = {}
+
+_epoch = time.perf_counter()
+
+# 模块名 -> 首次导入用时（秒），见 timed_import
+IMPORT_TIMES = {}
+
+
+def enable_profiling(output_dir: str | None = None, memory: str | None = "tracemalloc",
+                     cprofile: bool = False):
+    """"
+    开启分阶段记录
+
+    output_dir: 结果目录；给定时进程退出前自动写出 profile.json / profile.csv
+    memory: 峰值内存的统计方式：
+            "tracemalloc" 为阶段内 Python 分配（含 numpy / pandas 数组）的峰值，开销较大；
+            "rss" 为进程常驻内存的历史最高值（开销可忽略，但不能区分阶段）；None 不统计
+    cprofile: 是否为每个（最外层）阶段保存 <output_dir>/cprofile/<阶段>.prof
+    """
+    if memory not in ("tracemalloc", "rss", None):
+        raise ValueError(f"不支持的内存统计方式: {memory}")
+    _state.update(enabled=True, output_dir=output_dir, memory=memory, cprofile=cprofile)
+    if memory == "tracemalloc" and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if output_dir is not None:
+        atexit.unregister(_write_at_exit)
+        atexit.register(_write_at_exit)
+
+def disable_profiling():
+    """关闭记录（已有记录保留，可继续写出）"""
+    _state["enabled"] = False
+    if _state["memory"] == "tracemalloc" and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def profiling_settings() -> dict:
+    """当前设置（用于在工作进程中以相同设置开启）"""
+    return dict(_state)
+
+def is_enabled() -> bool:
+    return _state["enabled"]
+
+
+def _count_rows(value):
+    """DataFrame / Series / SortedSegments / 元组（取第一个元素）的行数，无法判断时为 None"""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if hasattr(value, "frame") and hasattr(value, "order"):
+        return len(value.order)
+    if hasattr(value, "shape") and hasattr(value, "__len__"):
+        return len(value)
+    return None
+
+def _rss_bytes():
+    """进程常驻内存的历史最高值（字节）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+
+
+class _Stage:
+    """单个阶段的计时上下文；with 语句中可设置 rows_in / rows_out"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+
+    def __enter__(self):
+        if not _state["enabled"]:
+            self._active = False
+            return self
+        self._active = True
+
+        memory = _state["memory"]
+        if memory == "tracemalloc":
+            # 嵌套阶段会重置峰值，先把外层目前的峰值记下来
+            current, peak = tracemalloc.get_traced_memory()
+            if _stack:
+                _stack[-1][1] = max(_stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._mem_start = current
+        _stack.append([self.name, 0])
+
+        self._profiler = None
+        if _state["cprofile"] and _state["output_dir"] is not None and not _active_profiler:
+            self._profiler = cProfile.Profile()
+            _active_profiler.append(self._profiler)
+            self._profiler.enable()
+
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._active:
+            return False
+
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            _active_profiler.clear()
+            prof_dir = Path(_state["output_dir"]) / "cprofile"
+            prof_dir.mkdir(parents=True, exist_ok=True)
+            count = _prof_counts[self.name] = _prof_counts.get(self.name, 0) + 1
+            suffix = "" if count == 1 else f".{count}"
+            self._profiler.dump_stats(prof_dir / f"{_safe_name(self.name)}{suffix}.prof")
+
+        path = "/".join(name for name, _ in _stack)
+        _, inner_peak = _stack.pop()
+
+        peak_memory = None
+        memory = _state["memory"]
+        if memory == "tracemalloc" and tracemalloc.is_tracing():
+            peak = max(inner_peak, tracemalloc.get_traced_memory()[1])
+            peak_memory = max(peak - self._mem_start, 0)
+            if _stack:
+                _stack[-1][1] = max(_stack[-1][1], peak)
+        elif memory == "rss":
+            peak_memory = _rss_bytes()
+
+        _records.append({
+            "stage": self.name,
+            "path": path,
+            "depth": len(_stack),
+            "start": round(self._wall - _epoch, 6),
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_memory_bytes": peak_memory,
+            "memory_mode": memory,
+            "pid": os.getpid(),
+            "error": None if exc_type is None else exc_type.__name__,
+        })
+        return False
+
+
+def profile_stage(name: str | None = None):
+    """"
+    记录一个阶段：既可作装饰器，也可作上下文管理器
+
+    作装饰器时阶段名默认为函数名，rows_in 取第一个 DataFrame 参数的行数，
+    rows_out 取返回值的行数（返回元组时取第一个元素）
+    """
+    if callable(name):
+        return profile_stage()(name)
+
+    class _Decorator(_Stage):
+        def __call__(self, func):
+            stage_name = self.name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not _state["enabled"]:
+                    return func(*args, **kwargs)
+                with _Stage(stage_name) as stage:
+                    stage.rows_in = next(
+                        (n for n in map(_count_rows, (*args, *kwargs.values())) if n is not None),
+                        None,
+                    )
+                    result = func(*args, **kwargs)
+                    stage.rows_out = _count_rows(result)
+                return result
+            return wrapper
+
+    return _Decorator(name)
+
+
+def timed_import(module_name: str):
+    """"
+    按需导入模块（如 matplotlib.pyplot / sklearn.cluster），并记录首次导入用时
+
+    已导入过的模块直接从 sys.modules 返回；开启记录时首次导入也作为 import:<模块> 阶段
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    t0 = time.perf_counter()
+    with profile_stage(f"import:{module_name}"):
+        module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = time.perf_counter() - t0
+    return module
+
+def record_import_time(name: str, seconds: float):
+    """记录其他方式导入的模块（如动态加载的脚本）的用时"""
+    IMPORT_TIMES[name] = seconds
+
+def format_import_times() -> str:
+    """按用时从长到短列出已记录的导入用时"""
+    items = sorted(IMPORT_TIMES.items(), key=lambda kv: -kv[1])
+    return "\n".join(f"  {name}: {seconds:.3f}s" for name, seconds in items)
+
+
+def get_records() -> list:
+    return list(_records)
+
+def take_records() -> list:
+    """取出并清空已有记录（工作进程把记录交回主进程时使用）"""
+    records = list(_records)
+    _records.clear()
+    return records
+
+def add_records(records: list):
+    """并入其他进程的记录"""
+    _records.extend(records)
+
+def write_profile(path: str) -> Path:
+    """"
+    写出全部阶段记录：.csv 写成表格，其余写成 JSON
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".csv":
+        fields = list(_records[0]) if _records else ["stage"]
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(_records)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: _state[k] for k in ("memory", "cprofile")},
+                       "imports": IMPORT_TIMES,
+                       "stages": _records}, f, ensure_ascii=False, indent=2)
+    return path
+
+def _write_at_exit():
+    output_dir = _state["output_dir"]
+    if output_dir is None or not _records:
+        return
+    write_profile(Path(output_dir) / "profile.json")
+    write_profile(Path(output_dir) / "profile.csv")
+
+
+# 环境变量开启：ARCHIVE_PROFILE=<结果目录>，ARCHIVE_PROFILE_MEMORY=tracemalloc|rss|none，
+# ARCHIVE_PROFILE_CPROFILE=1
+if os.environ.get("ARCHIVE_PROFILE"):
+    _memory = os.environ.get("ARCHIVE_PROFILE_MEMORY", "tracemalloc").lower()
+    enable_profiling(
+        os.environ["ARCHIVE_PROFILE"],
+        memory=None if _memory == "none" else _memory,
+        cprofile=os.environ.get("ARCHIVE_PROFILE_CPROFILE") == "1",
+    )
@@ -0,0 +1,219 @@
+# src/result_writer.py
+"""
+结果表的写出：result1_1.xlsx ~ result1_5.xlsx、result3.xlsx 与 01_preprocess.py 的
+preprocessed_data_analysis.xlsx 都经由这里写出。
+
+- xlsx 使用 openpyxl 的只写（write_only）模式逐行写入，内存占用与行数无关；
+  pandas 的 to_excel 会先在内存中建好全部单元格，几百万行时要数分钟、数 GB
+- 超过 Excel 单个工作表行数上限（1,048,576 行，含表头）的表按 oversize 处理：
+  "split" 依次拆分到 <工作表名>_2、<工作表名>_3 ... 工作表，"error" 直接报错
+- 也可以输出 Parquet / CSV 供下游系统读取（文件名后缀随之改变；
+  多工作表的结果写成去掉后缀的同名目录，每个工作表一个文件）
+- 在 concurrent_writes() 中提交的结果由进程池并行写出，离开时等待全部写完
+
+用法：
+    python src/pipeline.py --output-format parquet
+    python src/02_task1_statistics.py --output-format csv
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from profiling import profile_stage
+
+
+FORMATS = ["xlsx", "parquet", "csv"]
+OVERSIZE_MODES = ["split", "error"]
+
+# Excel 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1_048_576
+
+# 工作表名的最大长度
+SHEET_NAME_MAX = 31
+
+# 逐行写入时每次转换的行数
+ROW_BLOCK = 10_000
+
+# 本次运行的输出设置（见 configure_output）
+_settings = {"format": "xlsx", "oversize": "split", "jobs": None}
+
+# concurrent_writes() 中的进程池：(所属进程号, 进程池, [(路径, future), ...])
+_active = None
+
+
+def configure_output(fmt: str | None = None, oversize: str | None = None,
+                     jobs: int | None = None):
+    """"
+    设置本次运行的输出格式、超行处理方式与并行写出的进程数（None 表示不变）
+    """
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise ValueError(f"未知输出格式: {fmt}（可选: {', '.join(FORMATS)}）")
+        _settings["format"] = fmt
+    if oversize is not None:
+        if oversize not in OVERSIZE_MODES:
+            raise ValueError(f"未知超行处理方式: {oversize}（可选: {', '.join(OVERSIZE_MODES)}）")
+        _settings["oversize"] = oversize
+    if jobs is not None:
+        _settings["jobs"] = jobs
+
+def output_settings() -> dict:
+    """当前输出设置（传给工作进程，使其以相同设置写出）"""
+    return dict(_settings)
+
+def output_path(path, fmt: str | None = None, sheets=None) -> Path:
+    """"
+    结果按输出格式实际写出的路径：替换后缀；多工作表的 parquet / csv 结果为去掉后缀的目录
+    """
+    fmt = fmt or _settings["format"]
+    if fmt != "xlsx" and sheets is not None and not isinstance(sheets, pd.DataFrame):
+        return Path(path).with_suffix("")
+    return Path(path).with_suffix(f".{fmt}")
+
+
+# ======================
+# xlsx（逐行写入）
+# ======================
+def _iter_rows(table: pd.DataFrame):
+    """"
+    按块把 DataFrame 转为 Python 值的行（缺失值为 None，写出为空单元格）
+    """
+    for start in range(0, len(table), ROW_BLOCK):
+        block = table.iloc[start:start + ROW_BLOCK]
+        columns = [
+            block[col].astype(object).where(block[col].notna(), None).tolist()
+            for col in block.columns
+        ]
+        yield from zip(*columns)
+
+def _sheet_parts(table: pd.DataFrame, sheet_name: str, oversize: str):
+    """"
+    工作表 -> [(工作表名, 行切片)]；超过行数上限时拆分或报错
+    """
+    max_rows = EXCEL_MAX_ROWS - 1
+    if len(table) <= max_rows:
+        return [(sheet_name, table)]
+    if oversize == "error":
+        raise ValueError(
+            f"工作表 {sheet_name} 共 {len(table)} 行，超过 Excel 单个工作表的上限 {max_rows} 行"
+            f"（可改用 parquet / csv 输出，或按 split 拆分到多个工作表）"
+        )
+
+    parts = []
+    for i, start in enumerate(range(0, len(table), max_rows), start=1):
+        name = sheet_name if i == 1 else f"{sheet_name[:SHEET_NAME_MAX - len(str(i)) - 1]}_{i}"
+        parts.append((name, table.iloc[start:start + max_rows]))
+    return parts
+
+def _as_sheets(sheets) -> dict:
+    return {"Sheet1": sheets} if isinstance(sheets, pd.DataFrame) else sheets
+
+def _write_xlsx(sheets: dict, path: Path, oversize: str):
+    from openpyxl import Workbook
+
+    # 先检查全部工作表，超限报错时不留下半个文件
+    parts = [part for name, table in sheets.items() for part in _sheet_parts(table, name, oversize)]
+
+    workbook = Workbook(write_only=True)
+    for name, table in parts:
+        sheet = workbook.create_sheet(name)
+        sheet.append([str(col) for col in table.columns])
+        for row in _iter_rows(table):
+            sheet.append(row)
+    workbook.save(path)
+
+
+# ======================
+# 写出
+# ======================
+def _write_file(table: pd.DataFrame, path: Path, fmt: str):
+    if fmt == "parquet":
+        table.to_parquet(path, index=False)
+    else:
+        # 带 BOM，Excel 直接打开时中文不乱码
+        table.to_csv(path, index=False, encoding="utf-8-sig")
+
+@profile_stage("write_result")
+def write_result(sheets, path, fmt: str | None = None, oversize: str | None = None) -> Path:
+    """"
+    写出一个结果，返回实际写出的路径（后缀为输出格式）
+
+    sheets: DataFrame，或 {工作表名: DataFrame}（多工作表；parquet / csv 时写成
+            去掉后缀的同名目录，每个工作表一个文件）
+    """
+    fmt = fmt or _settings["format"]
+    oversize = oversize or _settings["oversize"]
+
+    path = output_path(path, fmt, sheets)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    single = isinstance(sheets, pd.DataFrame)
+    sheets = _as_sheets(sheets)
+
+    # 先写临时文件再原子替换，写出失败时不留下不完整的结果
+    if fmt == "xlsx":
+        tmp_path = path.with_name(path.name + ".tmp")
+        _write_xlsx(sheets, tmp_path, oversize)
+        os.replace(tmp_path, path)
+    elif single:
+        tmp_path = path.with_name(path.name + ".tmp")
+        _write_file(sheets["Sheet1"], tmp_path, fmt)
+        os.replace(tmp_path, path)
+    else:
+        path.mkdir(exist_ok=True)
+        for name, table in sheets.items():
+            sheet_path = path / f"{name}.{fmt}"
+            tmp_path = sheet_path.with_name(sheet_path.name + ".tmp")
+            _write_file(table, tmp_path, fmt)
+            os.replace(tmp_path, sheet_path)
+    return path
+
+def submit_result(sheets, path) -> Path:
+    """"
+    写出一个结果：在 concurrent_writes() 中提交到进程池（返回时可能尚未写完），
+    否则直接写出；返回结果路径
+    """
+    if _active is None or _active[0] != os.getpid():
+        return write_result(sheets, path)
+
+    # 超行报错在提交时即抛出，不必等到全部写完
+    if _settings["format"] == "xlsx":
+        for name, table in _as_sheets(sheets).items():
+            _sheet_parts(table, name, _settings["oversize"])
+
+    _, pool, pending = _active
+    target = output_path(path, sheets=sheets)
+    pending.append((target, pool.submit(write_result, sheets, path, _settings["format"],
+                                        _settings["oversize"])))
+    return target
+
+@contextmanager
+def concurrent_writes(jobs: int | None = None):
+    """"
+    其中 submit_result 提交的结果由 jobs 个进程并行写出（默认 CPU 核数），
+    离开时等待全部写完；有写出失败时抛出异常。只有一个核时直接写出
+    """
+    global _active
+    jobs = jobs or _settings["jobs"] or os.cpu_count() or 1
+    if jobs <= 1 or (_active is not None and _active[0] == os.getpid()):
+        yield
+        return
+
+    pending = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        _active = (os.getpid(), pool, pending)
+        try:
+            yield
+        finally:
+            _active = None
+            errors = []
+            for target, future in pending:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(f"{target}: {e}")
+    if errors:
+        raise RuntimeError("以下结果写出失败:\n" + "\n".join(errors))
@@ -0,0 +1,244 @@
+# src/segments.py
+
+import numpy as np
+import pandas as pd
+from cube import ArchiveCube
+
+
+_NAT = np.iinfo(np.int64).min
+_MAX = np.iinfo(np.int64).max
+
+
+def _key_codes(column: pd.Series):
+    """"
+    分组键 -> (稠密整数编码, 不同值个数)；编码的大小顺序与 groupby 的排序一致，缺失为 -1
+
+    类别型直接用类别编码（类别已按字典序排列），其余先排序编码
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), len(column.cat.categories)
+    codes, uniques = pd.factorize(column, sort=True)
+    return codes, len(uniques)
+
+def _compact(codes: np.ndarray, n_values: int) -> np.ndarray:
+    """编码降为能容纳 0 ~ n_values 的最小整数类型"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values < np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes.astype(np.int64, copy=False)
+
+def _value_codes(column: pd.Series) -> np.ndarray:
+    """值列 -> 紧凑的非负整数编码（缺失为 -1），用于段内去重计数"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype(np.int64)
+    codes, _ = pd.factorize(column)
+    return codes.astype(np.int64)
+
+def _segment_ids(starts: np.ndarray, n_rows: int) -> np.ndarray:
+    """段起点 -> 每条（排序后）记录所属的段号"""
+    lengths = np.diff(np.append(starts, n_rows))
+    return np.repeat(np.arange(len(starts)), lengths)
+
+
+class SortedSegments:
+    """"
+    分段归约引擎：记录按给定键顺序只排序一次，之后按任意“键前缀”分组统计
+
+    排序后每个分组是一段连续区间：
+    - min / max / count 用 ufunc.reduceat 直接在段边界上归约
+    - nunique 数段内的不同值（值列恰好是下一个排序键时只需数子段）
+    - sum 沿用 pandas 的补偿求和，与 groupby(...).sum() 逐位一致
+
+    与 groupby 的默认行为一致：分组键缺失的记录不参与统计，结果按键排序，
+    类别型键只保留出现过的类别（即 observed=True）
+    """
+
+    def __init__(self, frame: pd.DataFrame, keys: list):
+        self.frame = frame
+        self.keys = list(keys)
+
+        # 各键的稠密编码；缺失记为 n_values，排在最后，查询时再按前缀剔除（同 groupby 的 dropna=True）
+        codes_list, radices, has_missing = [], [], []
+        for key in self.keys:
+            codes, n_values = _key_codes(frame[key])
+            missing = codes < 0
+            has_missing.append(bool(missing.any()))
+            codes = np.where(missing, n_values, codes) if has_missing[-1] else codes
+            codes_list.append(_compact(codes, n_values))
+            radices.append(n_values + 1)
+
+        # 各键编码拼成一个 int64 组合键，一次稳定排序（组内保持原记录顺序）；
+        # 组合键可能溢出时退回 np.lexsort（以最后一个数组为主键）
+        if not self.keys:
+            order = np.arange(len(frame))
+        elif np.prod(np.array(radices, dtype=float)) < 2**62:
+            combined = np.zeros(len(frame), dtype=np.int64)
+            for codes, radix in zip(codes_list, radices):
+                combined = combined * radix + codes
+            order = np.argsort(combined, kind="stable")
+        else:
+            order = np.lexsort(codes_list[::-1])
+        self.order = order.astype(np.int32) if len(frame) < 2**31 else order
+
+        # 排序后的各键编码，以及（可能有缺失时）缺失编码
+        self._sorted_codes = [codes[self.order] for codes in codes_list]
+        self._missing_code = [
+            radix - 1 if missing else None
+            for radix, missing in zip(radices, has_missing)
+        ]
+
+        # 前缀长度 -> (参与统计的记录, 段起点)，只缓存不带 where 的情况
+        self._segments = {}
+
+    @property
+    def nbytes(self) -> int:
+        """排序结果、键编码与缓存的段边界占用的字节数（不含原始记录）"""
+        arrays = [self.order, *self._sorted_codes]
+        for rows, starts in self._segments.values():
+            arrays += [starts] if rows is None else [rows, starts]
+        return sum(a.nbytes for a in arrays)
+
+    def _present(self, n_keys: int, rows=None):
+        """"
+        排序后 rows 处（None 为全部）的记录前 n_keys 个键是否都不缺失；都不缺失时返回 None
+        """
+        present = None
+        for codes, missing_code in zip(self._sorted_codes[:n_keys], self._missing_code):
+            if missing_code is not None:
+                keep = (codes if rows is None else codes[rows]) != missing_code
+                present = keep if present is None else present & keep
+        return present
+
+    def _segment_starts(self, n_keys: int, where=None):
+        """"
+        按前 n_keys 个键切分排序后的记录，返回 (参与统计的记录, 段起点)
+
+        记录用排序后的下标表示，None 表示全部记录；缺失键与 where 为 False 的记录不参与
+        """
+        if where is None and n_keys in self._segments:
+            return self._segments[n_keys]
+
+        keep = self._present(n_keys)
+        if where is not None:
+            mask = self.frame[where] if isinstance(where, str) else where
+            mask = np.asarray(mask, dtype=bool)[self.order]
+            keep = mask if keep is None else keep & mask
+        rows = None if keep is None else np.flatnonzero(keep)
+
+        n_rows = len(self.order) if rows is None else len(rows)
+        change = np.zeros(n_rows, dtype=bool)
+        change[:1] = True
+        for codes in self._sorted_codes[:n_keys]:
+            if rows is not None:
+                codes = codes[rows]
+            change[1:] |= codes[1:] != codes[:-1]
+        starts = np.flatnonzero(change)
+
+        if where is None:
+            self._segments[n_keys] = (rows, starts)
+        return rows, starts
+
+    def agg(self, by, where=None, **named) -> pd.DataFrame:
+        """"
+        按键前缀 by 分组统计，结果同 frame[where].groupby(by).agg(**named).reset_index()
+
+        named: 结果列名=(列名, "min" | "max" | "sum" | "count" | "nunique")
+        where: 可选，布尔列名或布尔数组，只统计其为 True 的记录
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        n_keys = len(by)
+        if by != self.keys[:n_keys]:
+            raise ValueError(f"分组键必须是排序键 {self.keys} 的前缀: {by}")
+
+        rows, starts = self._segment_starts(n_keys, where)
+        positions = self.order if rows is None else self.order[rows]
+
+        first = positions[starts]
+        result = {key: self.frame[key].iloc[first].reset_index(drop=True) for key in by}
+        for out_name, (column, func) in named.items():
+            if func == "nunique":
+                values = self._nunique(column, positions, starts, n_keys, rows)
+            else:
+                values = self._reduce(column, func, positions, starts)
+            result[out_name] = values
+        return pd.DataFrame(result)
+
+    def _reduce(self, column: str, func: str, positions: np.ndarray, starts: np.ndarray):
+        series = self.frame[column]
+
+        if func == "count":
+            valid = series.notna().to_numpy()[positions].astype(np.int64)
+            return np.add.reduceat(valid, starts) if len(starts) else valid[:0]
+
+        if func == "sum":
+            values = series.to_numpy()[positions]
+            seg_ids = _segment_ids(starts, len(positions))
+            return pd.Series(values).groupby(seg_ids, sort=False).sum().to_numpy()
+
+        if func not in ("min", "max"):
+            raise ValueError(f"不支持的聚合方式: {func}")
+
+        if pd.api.types.is_datetime64_dtype(series.dtype):
+            values = series.to_numpy(dtype="datetime64[ns]").view(np.int64)[positions]
+            if not len(starts):
+                return values[:0].view("datetime64[ns]").astype(series.dtype)
+            # NaT 是 int64 最小值：求最大时自然被忽略，求最小时先换成最大值
+            if func == "min":
+                out = np.minimum.reduceat(np.where(values == _NAT, _MAX, values), starts)
+                out[out == _MAX] = _NAT
+            else:
+                out = np.maximum.reduceat(values, starts)
+            return out.view("datetime64[ns]").astype(series.dtype)
+
+        values = series.to_numpy()[positions]
+        if not len(starts):
+            return values[:0]
+        # fmin / fmax 跳过 NaN，与 groupby 的 min / max 一致
+        ufunc = np.fmin if func == "min" else np.fmax
+        return ufunc.reduceat(values, starts)
+
+    def _nunique(self, column: str, positions: np.ndarray, starts: np.ndarray,
+                 n_keys: int, rows=None) -> np.ndarray:
+        n_segments = len(starts)
+        seg_ids = _segment_ids(starts, len(positions))
+
+        # 值列恰好是下一个排序键：段内已按它排好序，数子段即可
+        if n_keys < len(self.keys) and self.keys[n_keys] == column:
+            codes = self._sorted_codes[n_keys]
+            if rows is not None:
+                codes = codes[rows]
+            missing_code = self._missing_code[n_keys]
+            if missing_code is not None:
+                present = codes != missing_code
+                codes, seg_ids = codes[present], seg_ids[present]
+            change = np.ones(len(codes), dtype=bool)
+            change[1:] = (codes[1:] != codes[:-1]) | (seg_ids[1:] != seg_ids[:-1])
+            return np.bincount(seg_ids[change], minlength=n_segments)
+
+        # 否则对 (段号, 值编码) 去重后按段计数
+        codes = _value_codes(self.frame[column])[positions]
+        keep = codes >= 0
+        base = int(codes.max()) + 1 if len(codes) and codes.max() >= 0 else 1
+        pairs = seg_ids[keep].astype(np.int64) * base + codes[keep]
+        if n_segments * base <= 8 * len(pairs):
+            # 组合值空间不大时用位图去重，省去哈希
+            seen = np.zeros(n_segments * base, dtype=bool)
+            seen[pairs] = True
+            pairs = np.flatnonzero(seen)
+        else:
+            pairs = pd.unique(pairs)
+        return np.bincount(pairs // base, minlength=n_segments)
+
+
+def as_segments(records, keys: list) -> SortedSegments:
+    """"
+    records 为 SortedSegments 且排序键以 keys 开头时直接复用，否则按 keys 排序一次；
+    预聚合立方体（cube.ArchiveCube）可按任意维度上卷，原样返回
+    """
+    if isinstance(records, ArchiveCube):
+        return records
+    if isinstance(records, SortedSegments):
+        if records.keys[:len(keys)] == list(keys):
+            return records
+        records = records.frame
+    return SortedSegments(records, keys)
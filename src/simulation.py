@@ -0,0 +1,379 @@
+# src/simulation.py
+"""
+四道工序流水线（扫描 → 图像处理 → 自检全检 → PDF处理）的离散事件仿真，用于人员配置规划。
+
+- 标定：由预处理结果得到各工序、各人员的单卷服务时长（批次有效工作时长 / 批次案卷数，
+  与任务 1.4、1.5 的“平均耗时 (h/卷)”同一口径）的经验分布、返工概率（完成记录中
+  iNODE_STATUS == 5 的比例）与案卷到达速率
+- 仿真时钟为“累计有效工作时长”（h）：服务时长与到达间隔都按当前的工作日历计算
+  （utils.py 的固定日历，或 --calendar 指定的排班日历），非工作时段不推进，
+  一个仿真工作日 = 一天的有效工作时长（calendars.workday_hours，排班日历取 default 班次）
+- 每道工序为先到先服务的多服务台队列：案卷按到达顺序交给最早空闲的人员，
+  返工的案卷在完成时重新进入该工序排队
+- 每次仿真给出吞吐量、在制品（WIP）、各工序利用率与瓶颈；多次独立重复由进程池并行
+
+用法：
+    python src/simulation.py --days 20 --replications 1000
+    python src/simulation.py --staff 图像处理=6 --operators 扫描=101,102 --jobs 4
+"""
+
+import argparse
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from archive_index import FLOW_BITS
+from profiling import profile_stage
+from calendars import workday_hours
+from utils import calc_work_hours_array
+
+
+# 工序按流程顺序
+STAGES = sorted(FLOW_BITS, key=FLOW_BITS.get)
+
+# 默认的预热天数：从空线开始，前几天的结果不计入统计
+WARMUP_DAYS = 5
+
+# 汇总表中的分位数
+SUMMARY_QUANTILES = [0.05, 0.5, 0.95]
+
+
+class LineModel:
+    """"
+    标定得到的流水线模型（可序列化，交给工作进程）
+
+    - service:          {工序: 单卷服务时长的经验分布（升序数组，h）}，各人员合并
+    - operator_service: {(工序, iUSER_ID): 该人员的单卷服务时长经验分布}
+    - rework:           {工序: 返工概率}
+    - operator_rework:  {(工序, iUSER_ID): 该人员的返工概率}
+    - operators:        {工序: 观测到的人员列表}（默认的人员配置）
+    - arrival_rate:     案卷到达速率（卷 / 有效工作小时）
+    """
+
+    def __init__(self, service: dict, operator_service: dict, rework: dict,
+                 operator_rework: dict, operators: dict, arrival_rate: float):
+        self.service = service
+        self.operator_service = operator_service
+        self.rework = rework
+        self.operator_rework = operator_rework
+        self.operators = operators
+        self.arrival_rate = arrival_rate
+
+    @classmethod
+    @profile_stage("calibrate_line")
+    def calibrate(cls, df: pd.DataFrame) -> "LineModel":
+        """"
+        由完整的预处理结果标定模型
+
+        服务时长：每个「人员 × 工序 × 批次」的有效工作时长平均到批次内的案卷上，
+        按案卷数加权构成经验分布；返工概率为完成记录中返工记录的比例；
+        到达速率为开始首道工序的案卷数 / 观测期内的有效工作时长
+        """
+        from aggregates import get_aggregate
+
+        keys = ["iUSER_ID", "工序", "sBatch_number"]
+        batches = get_aggregate(df, "user_batch_time").merge(
+            get_aggregate(df, "user_flow_batch_segments").agg(keys, n_archives=("sARCH_ID", "nunique")),
+            on=keys
+        )
+        batches = batches[(batches["batch_hours"] > 0) & (batches["n_archives"] > 0)]
+        per_archive = (batches["batch_hours"] / batches["n_archives"]).to_numpy()
+        weights = batches["n_archives"].to_numpy()
+
+        service, operator_service, operators = {}, {}, {}
+        for stage in STAGES:
+            in_stage = (batches["工序"] == stage).to_numpy()
+            service[stage] = np.sort(np.repeat(per_archive[in_stage], weights[in_stage]))
+            users = batches.loc[in_stage, "iUSER_ID"].to_numpy()
+            operators[stage] = sorted(int(u) for u in np.unique(users))
+            for user in operators[stage]:
+                mine = in_stage & (batches["iUSER_ID"] == user).to_numpy()
+                operator_service[(stage, user)] = np.sort(np.repeat(per_archive[mine], weights[mine]))
+
+        finished = get_aggregate(df, "finished")
+        rework_share = finished.groupby("工序", observed=True)["is_rework"].mean()
+        rework = {stage: float(rework_share.get(stage, 0.0)) for stage in STAGES}
+        user_share = finished.groupby(["工序", "iUSER_ID"], observed=True)["is_rework"].mean()
+        operator_rework = {(stage, int(user)): float(p) for (stage, user), p in user_share.items()}
+
+        # 到达：每个案卷最早开始的工序时间
+        archive_index = get_aggregate(df, "archive_index")
+        first_start = archive_index[[f"{stage}_start_time" for stage in STAGES]].min(axis=1)
+        first_start = first_start.dropna()
+        span_hours = 0.0
+        if len(first_start):
+            span_hours = float(calc_work_hours_array([first_start.min()], [first_start.max()])[0])
+        arrival_rate = len(first_start) / span_hours if span_hours > 0 else 0.0
+
+        return cls(service, operator_service, rework, operator_rework, operators, arrival_rate)
+
+    def servers(self, staff: dict | None = None, operators: dict | None = None) -> dict:
+        """"
+        人员配置 -> {工序: [(服务时长分布, 返工概率), ...]}，每个元素是一个人员（服务台）
+
+        staff:     {工序: 人数}，这些工序的人员使用该工序合并的服务时长分布与返工概率
+        operators: {工序: [iUSER_ID, ...]}，这些工序由指定人员处理（使用各自标定的分布）
+        其余工序沿用观测到的人员
+        """
+        staff = staff or {}
+        operators = operators or {}
+        result = {}
+        for stage in STAGES:
+            if stage in staff:
+                if staff[stage] < 1:
+                    raise ValueError(f"{stage} 至少需要 1 人")
+                if not len(self.service[stage]):
+                    raise ValueError(f"{stage} 没有可用于标定的完成记录")
+                result[stage] = [(self.service[stage], self.rework[stage])] * int(staff[stage])
+                continue
+            users = operators.get(stage, self.operators[stage])
+            unknown = [u for u in users if (stage, u) not in self.operator_service]
+            if unknown:
+                raise ValueError(f"{stage} 没有以下人员的完成记录: {', '.join(map(str, unknown))}")
+            if not users:
+                raise ValueError(f"{stage} 没有可用的人员")
+            result[stage] = [
+                (self.operator_service[(stage, u)], self.operator_rework.get((stage, u), 0.0))
+                for u in users
+            ]
+        return result
+
+    def describe(self) -> pd.DataFrame:
+        """各工序、各人员的标定结果（样本数、平均服务时长、返工概率）"""
+        rows = []
+        for stage in STAGES:
+            rows.append((stage, "合计", len(self.service[stage]),
+                         self.service[stage].mean() if len(self.service[stage]) else np.nan,
+                         self.rework[stage]))
+            for user in self.operators[stage]:
+                samples = self.operator_service[(stage, user)]
+                rows.append((stage, user, len(samples), samples.mean(),
+                             self.operator_rework.get((stage, user), 0.0)))
+        table = pd.DataFrame(rows, columns=["工序", "iUSER_ID", "样本案卷数", "平均服务时长 (h/卷)", "返工概率"])
+        return table.round({"平均服务时长 (h/卷)": 3, "返工概率": 4})
+
+
+# ======================
+# 单次仿真
+# ======================
+def _run_stage(arrivals: np.ndarray, servers: list, rng):
+    """"
+    一道工序：先到先服务的多服务台队列（返工的案卷在完成时重新排队）
+
+    返回 (离开时间, 各次处理的 (开始, 结束), 各次处理的排队时长合计)
+    """
+    n = len(arrivals)
+    pending = list(zip(arrivals.tolist(), range(n)))
+    heapq.heapify(pending)
+    free = [(0.0, k) for k in range(len(servers))]
+
+    # 随机数按块预先生成，返工导致处理次数超出时再补
+    size = max(16, int(n * 1.5))
+    draws, rework_draws, used = rng.random(size), rng.random(size), 0
+
+    depart = np.empty(n)
+    starts, ends = [], []
+    wait = 0.0
+    while pending:
+        t, job = heapq.heappop(pending)
+        f, k = heapq.heappop(free)
+        start = t if t > f else f
+        if used == size:
+            draws, rework_draws, used = rng.random(size), rng.random(size), 0
+        samples, p_rework = servers[k]
+        end = start + samples[int(draws[used] * len(samples))]
+        reworked = rework_draws[used] < p_rework
+        used += 1
+
+        heapq.heappush(free, (end, k))
+        starts.append(start)
+        ends.append(end)
+        wait += start - t
+        if reworked:
+            heapq.heappush(pending, (end, job))
+        else:
+            depart[job] = end
+    return depart, np.array(starts), np.array(ends), wait
+
+def _overlap(start: np.ndarray, end: np.ndarray, lo: float, hi: float) -> float:
+    """区间 [start, end) 落在统计窗口 [lo, hi) 内的总长度"""
+    return float(np.clip(np.minimum(end, hi) - np.maximum(start, lo), 0, None).sum())
+
+def simulate_once(servers: dict, arrival_rate: float, days: int, warmup_days: int = WARMUP_DAYS,
+                  seed=None, day_hours: float | None = None) -> dict:
+    """"
+    一次仿真：到达为泊松过程（有效工作时长上），统计窗口为预热后的 days 个工作日
+
+    day_hours: 一个工作日的有效工作时长（h），默认为当前日历的 workday_hours()
+    返回 {指标: 值}：吞吐量（卷 / 工作日）、平均在制品、平均流转时长（有效工作小时），
+    以及各工序的利用率、平均排队时长与平均在制品；瓶颈为利用率最高的工序
+    """
+    rng = np.random.default_rng(seed)
+    day_hours = workday_hours() if day_hours is None else day_hours
+    lo, hi = warmup_days * day_hours, (warmup_days + days) * day_hours
+
+    # 泊松到达：到达数服从泊松分布，到达时刻在时间段内均匀分布
+    n_arrivals = rng.poisson(arrival_rate * hi) if arrival_rate > 0 else 0
+    entry = np.sort(rng.uniform(0, hi, n_arrivals))
+
+    result = {}
+    arrive = entry
+    utilization = {}
+    for stage in STAGES:
+        depart, starts, ends, wait = _run_stage(arrive, servers[stage], rng)
+        passes = len(starts)
+        utilization[stage] = _overlap(starts, ends, lo, hi) / (len(servers[stage]) * (hi - lo))
+        result[f"{stage}_利用率"] = utilization[stage]
+        result[f"{stage}_排队时长"] = wait / passes if passes else 0.0
+        result[f"{stage}_在制品"] = _overlap(arrive, depart, lo, hi) / (hi - lo)
+        arrive = depart
+
+    done = (arrive >= lo) & (arrive < hi)
+    result["吞吐量"] = done.sum() / days
+    result["在制品"] = _overlap(entry, arrive, lo, hi) / (hi - lo)
+    result["流转时长"] = float((arrive - entry)[done].mean()) if done.any() else np.nan
+    result["瓶颈"] = max(STAGES, key=utilization.get)
+    return result
+
+def _simulate_chunk(servers, arrival_rate, days, warmup_days, day_hours, seeds) -> list:
+    return [simulate_once(servers, arrival_rate, days, warmup_days, seed, day_hours) for seed in seeds]
+
+
+# ======================
+# 多次重复
+# ======================
+@profile_stage("simulate")
+def simulate(model: LineModel, staff: dict | None = None, operators: dict | None = None,
+             days: int = 20, replications: int = 1000, warmup_days: int = WARMUP_DAYS,
+             arrival_rate: float | None = None, seed: int = 0, jobs: int | None = None) -> pd.DataFrame:
+    """"
+    按人员配置独立重复仿真 replications 次，每次一行
+
+    arrival_rate: 案卷到达速率（卷 / 有效工作小时），默认使用标定值
+    jobs: 进程数（默认 CPU 核数）；为 1 时在当前进程中依次运行
+    各次重复的随机数种子由 seed 派生，结果与进程数无关
+    """
+    servers = model.servers(staff, operators)
+    rate = model.arrival_rate if arrival_rate is None else arrival_rate
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    # 工作进程中没有主进程配置的排班日历，工作日时长在主进程取好
+    day_hours = workday_hours()
+
+    jobs = min(jobs or os.cpu_count() or 1, max(replications, 1))
+    if jobs <= 1:
+        runs = _simulate_chunk(servers, rate, days, warmup_days, day_hours, seeds)
+    else:
+        # 每个进程分几块，块间负载更均衡
+        chunks = [seeds[i::jobs * 4] for i in range(jobs * 4)]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parts = list(pool.map(
+                _simulate_chunk,
+                *zip(*[(servers, rate, days, warmup_days, day_hours, chunk) for chunk in chunks])
+            ))
+        # 还原为种子顺序
+        runs = [None] * replications
+        for i, part in enumerate(parts):
+            runs[i::jobs * 4] = part
+    return pd.DataFrame(runs)
+
+def summarize(runs: pd.DataFrame, servers: dict) -> dict:
+    """"
+    各次重复的结果 -> {工作表名: 汇总表}：整体指标的均值与分位数，各工序的利用率、排队与瓶颈占比
+    """
+    overall = pd.DataFrame({
+        "指标": ["吞吐量 (卷/工作日)", "在制品 (卷)", "流转时长 (有效工作 h)"],
+        "列": ["吞吐量", "在制品", "流转时长"],
+    })
+    values = runs[overall["列"]]
+    overall["均值"] = values.mean().to_numpy()
+    for q in SUMMARY_QUANTILES:
+        overall[f"P{round(q * 100)}"] = values.quantile(q).to_numpy()
+    overall = overall.drop(columns="列").round(3)
+
+    bottleneck = runs["瓶颈"].value_counts(normalize=True)
+    stages = pd.DataFrame({
+        "工序": STAGES,
+        "人数": [len(servers[stage]) for stage in STAGES],
+        "利用率 (%)": [runs[f"{stage}_利用率"].mean() * 100 for stage in STAGES],
+        "平均排队时长 (h)": [runs[f"{stage}_排队时长"].mean() for stage in STAGES],
+        "平均在制品 (卷)": [runs[f"{stage}_在制品"].mean() for stage in STAGES],
+        "成为瓶颈的比例 (%)": [bottleneck.get(stage, 0.0) * 100 for stage in STAGES],
+    }).round(3)
+    return {"仿真汇总": overall, "工序": stages}
+
+
+def _parse_plan(items: list, as_list: bool) -> dict:
+    """命令行的 工序=值 -> {工序: 人数} 或 {工序: [iUSER_ID, ...]}"""
+    plan = {}
+    for item in items:
+        stage, _, raw = item.partition("=")
+        if stage not in STAGES or not raw:
+            raise ValueError(f"人员配置应为 工序=值（工序: {', '.join(STAGES)}）: {item}")
+        plan[stage] = [int(v) for v in raw.split(",")] if as_list else int(raw)
+    return plan
+
+if __name__ == "__main__":
+    import importlib.util
+    from pathlib import Path
+    from result_writer import FORMATS, configure_output, write_result
+
+    parser = argparse.ArgumentParser(description="四道工序流水线的离散事件仿真（人员配置规划）")
+    parser.add_argument("--data", default="data/data.xlsx",
+                        help="原始数据文件路径（也可以是目录或通配符，合并多个导出文件）")
+    parser.add_argument("--staff", action="append", default=[], metavar="工序=人数",
+                        help="该工序安排的人数（使用该工序合并的服务时长分布），可重复")
+    parser.add_argument("--operators", action="append", default=[], metavar="工序=人员1,人员2",
+                        help="该工序由指定人员处理（使用各自的服务时长分布），可重复；未指定的工序沿用观测到的人员")
+    parser.add_argument("--days", type=int, default=20, help="统计的工作日数（默认 20）")
+    parser.add_argument("--warmup-days", type=int, default=WARMUP_DAYS, help=f"预热工作日数（默认 {WARMUP_DAYS}）")
+    parser.add_argument("--arrivals-per-day", type=float, default=None,
+                        help="每个工作日到达的案卷数（默认按数据标定）")
+    parser.add_argument("--replications", type=int, default=1000, help="独立重复次数（默认 1000）")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--output", default="result/simulation.xlsx", help="结果文件路径")
+    parser.add_argument("--output-format", choices=FORMATS, default=None, help="结果格式（默认 xlsx）")
+    parser.add_argument("--calendar", default=None,
+                        help="排班配置文件（JSON，见 calendars.py；默认使用 utils.py 的固定工作日历）")
+    args = parser.parse_args()
+    configure_output(args.output_format)
+    if args.calendar:
+        from calendars import configure_calendar
+        try:
+            configure_calendar(args.calendar)
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        staff = _parse_plan(args.staff, as_list=False)
+        operators = _parse_plan(args.operators, as_list=True)
+    except ValueError as e:
+        parser.error(str(e))
+
+    spec = importlib.util.spec_from_file_location(
+        "preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py")
+    )
+    preprocess_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(preprocess_module)
+
+    model = LineModel.calibrate(preprocess_module.preprocess_data(args.data))
+    try:
+        servers = model.servers(staff, operators)
+    except ValueError as e:
+        parser.error(str(e))
+
+    day_hours = workday_hours()
+    rate = None if args.arrivals_per_day is None else args.arrivals_per_day / day_hours
+    runs = simulate(model, staff, operators, days=args.days, replications=args.replications,
+                    warmup_days=args.warmup_days, arrival_rate=rate, seed=args.seed, jobs=args.jobs)
+    tables = summarize(runs, servers)
+    tables["标定"] = model.describe()
+
+    print(f"到达速率: {(model.arrival_rate if rate is None else rate) * day_hours:.1f} 卷/工作日，"
+          f"{args.replications} 次重复")
+    with pd.option_context("display.width", 200):
+        print(tables["仿真汇总"].to_string(index=False))
+        print(tables["工序"].to_string(index=False))
+    print(f"已保存: {write_result(tables, Path(args.output))}")
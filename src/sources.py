@@ -0,0 +1,85 @@
+# src/sources.py
+"""
+多文件输入：源系统每天 / 每批导出一个工作簿，data_path 除单个文件外还可以是
+
+    data/exports                 目录（其中全部 .xlsx / .xls / .csv，不含子目录）
+    "data/exports/2020-07-*.xlsx"  通配符（命令行中需加引号）
+
+各文件在进程池中分别读取并预处理（Excel 解析受 CPU 限制，按核数扩展），
+每个文件各自命中 / 写入预处理缓存；合并与去重见 01_preprocess.py 的 combine_frames。
+"""
+
+import glob
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+SOURCE_SUFFIXES = (".xlsx", ".xls", ".csv")
+
+# 工作进程中加载的预处理模块
+_preprocess_module = None
+
+
+def is_multi_source(data_path) -> bool:
+    """data_path 是否为目录或通配符"""
+    return Path(data_path).is_dir() or glob.has_magic(str(data_path))
+
+def resolve_sources(data_path) -> list:
+    """"
+    data_path -> 源文件列表（按路径排序，决定合并与去重时的先后顺序）
+    """
+    data_path = str(data_path)
+    if Path(data_path).is_dir():
+        paths = [p for p in Path(data_path).iterdir() if p.is_file()]
+    elif glob.has_magic(data_path):
+        paths = [Path(p) for p in glob.glob(data_path) if Path(p).is_file()]
+    else:
+        return [Path(data_path)]
+
+    # 跳过 Excel 打开工作簿时留下的 ~$ 临时文件
+    paths = [p for p in paths
+             if p.suffix.lower() in SOURCE_SUFFIXES and not p.name.startswith("~$")]
+    if not paths:
+        raise FileNotFoundError(f"没有找到源文件（{', '.join(SOURCE_SUFFIXES)}）: {data_path}")
+    return sorted(paths)
+
+def _preprocess_source(path: str, use_cache: bool, cache_dir: str | None,
+                       calendar: dict | None = None):
+    """"
+    工作进程：预处理单个源文件，返回 (数据集版本, DataFrame)
+
+    calendar: 主进程的排班日历设置（calendars.calendar_settings()），工作进程以相同配置计算工时
+    """
+    global _preprocess_module
+    if calendar is not None and calendar["path"] is not None:
+        from calendars import active_calendar, configure_calendar
+        if active_calendar() is None:
+            configure_calendar(calendar["path"], calendar["cache_dir"])
+    if _preprocess_module is None:
+        spec = importlib.util.spec_from_file_location(
+            "preprocess", os.path.join(os.path.dirname(__file__), "01_preprocess.py")
+        )
+        _preprocess_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_preprocess_module)
+
+    df = _preprocess_module.preprocess_data(path, use_cache=use_cache, cache_dir=cache_dir)
+    return df.attrs["dataset_version"], df
+
+def preprocess_sources(paths: list, use_cache: bool = True, cache_dir: str | None = None,
+                       jobs: int | None = None) -> list:
+    """"
+    预处理多个源文件，按 paths 的顺序返回 [(数据集版本, DataFrame), ...]
+
+    jobs: 进程数（默认 CPU 核数）；为 1 或只有一个文件时在当前进程中依次处理
+    """
+    from calendars import calendar_settings
+
+    jobs = min(jobs or os.cpu_count() or 1, len(paths))
+    args = [(str(path), use_cache, cache_dir, calendar_settings()) for path in paths]
+    if jobs <= 1:
+        return [_preprocess_source(*a) for a in args]
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_preprocess_source, *zip(*args)))
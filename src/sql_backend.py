@@ -0,0 +1,566 @@
+# src/sql_backend.py
+"""
+任务 1 的 SQL 执行后端：把预处理结果写入嵌入式数据库文件（优先 DuckDB，未安装时用 SQLite），
+表 1 ~ 表 5 全部用 SQL 计算，结果与 pandas 路径逐行一致。
+
+- 类别列（案卷 / 批次 / 工序）以类别编码入库，排序与 pandas 的分组顺序一致，取回时还原为原类别
+- 时间以纪元纳秒整数入库，另存记录序号 rec_no（原记录顺序）
+- 工时合计与 pandas 路径的浮点求和逐位一致：SQL 按 pandas 的求和顺序取回明细（记录工时、
+  批次工作纳秒数），最后一步分组求和在 pandas 中完成
+- 有效工作时长查预先计算的工作日历表 work_calendar（见 utils.work_calendar_table）
+- DuckDB 多线程执行，超出内存限制时溢写到磁盘；数据库文件按数据集版本复用
+
+用法：
+    python src/02_task1_statistics.py --engine duckdb
+    python src/pipeline.py --engine sqlite --only task1_4,task1_5
+"""
+
+import glob
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from archive_index import completion_hours
+from utils import FLOW_MAP, NS_PER_DAY, work_calendar_table, work_ns_to_hours, work_periods_ns
+from profiling import profile_stage
+
+
+# 表结构或计算逻辑变更时递增，使已有数据库文件重建
+SQL_SCHEMA_VERSION = 2
+
+ENGINES = ["duckdb", "sqlite"]
+
+# 各引擎的文件扩展名与整数除法运算符
+_DIALECTS = {
+    "duckdb": {"suffix": ".duckdb", "idiv": "//"},
+    "sqlite": {"suffix": ".sqlite", "idiv": "/"},
+}
+
+_NAT = np.iinfo(np.int64).min
+
+# 以类别编码入库的列
+_CODE_COLS = {"sARCH_ID": "arch", "sBatch_number": "batch", "工序": "flow"}
+
+# 表 1 中计入完成时长的工序
+VALID_FLOWS = ["扫描", "图像处理", "自检全检"]
+
+# SQLite 逐批写入的行数
+_SQLITE_BATCH_ROWS = 50_000
+
+
+def has_duckdb() -> bool:
+    """是否安装了 DuckDB"""
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def resolve_engine(engine: str = "auto") -> str:
+    """"
+    "auto" -> 已安装 DuckDB 时为 "duckdb"，否则为 "sqlite"
+    """
+    if engine == "auto":
+        return "duckdb" if has_duckdb() else "sqlite"
+    if engine not in ENGINES:
+        raise ValueError(f"不支持的 SQL 引擎: {engine}（可选: auto, {', '.join(ENGINES)}）")
+    if engine == "duckdb" and not has_duckdb():
+        raise ImportError("未安装 duckdb，请 pip install duckdb 或改用 --engine sqlite")
+    return engine
+
+def database_path_for(version: str, engine: str, db_dir: str = "data/.sql",
+                      source: str | None = None) -> Path:
+    """"
+    数据集版本对应的数据库文件：<db_dir>/records_<源前缀>_<数据集版本><.duckdb | .sqlite>
+
+    source: 源前缀（preprocess_data 写入的 df.attrs["source_prefix"]）；来源不明时为 None，
+            文件名为 records_<数据集版本><.duckdb | .sqlite>
+    """
+    name = f"records_{source}_{version}" if source else f"records_{version}"
+    return Path(db_dir) / f"{name}{_DIALECTS[engine]['suffix']}"
+
+
+def _connect(path: Path, engine: str, read_only: bool = False, threads: int | None = None,
+             memory_limit: str | None = None):
+    if engine == "duckdb":
+        import duckdb
+
+        con = duckdb.connect(str(path), read_only=read_only)
+        if threads is not None:
+            con.execute(f"SET threads = {int(threads)}")
+        if memory_limit is not None:
+            con.execute(f"SET memory_limit = '{memory_limit}'")
+        return con
+
+    import sqlite3
+
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    return sqlite3.connect(str(path))
+
+def _nullable_codes(codes: np.ndarray) -> pd.arrays.IntegerArray:
+    """类别编码（缺失为 -1）-> 可空整数数组"""
+    codes = np.asarray(codes, dtype=np.int64)
+    return pd.arrays.IntegerArray(codes, codes < 0)
+
+def _nullable_ns(series: pd.Series) -> pd.arrays.IntegerArray:
+    """时间列 -> 纪元纳秒的可空整数数组"""
+    ns = np.asarray(series, dtype="datetime64[ns]").view(np.int64)
+    return pd.arrays.IntegerArray(ns.copy(), ns == _NAT)
+
+def _records_frame(df: pd.DataFrame, categories: dict) -> pd.DataFrame:
+    """"
+    预处理结果 -> 入库的整数列
+    """
+    frame = {}
+    for col, name in _CODE_COLS.items():
+        codes = pd.Categorical(df[col], categories=categories[col]).codes
+        frame[name] = _nullable_codes(codes)
+
+    user = df["iUSER_ID"]
+    frame["user_id"] = pd.arrays.IntegerArray(
+        user.fillna(0).to_numpy(dtype=np.int64), user.isna().to_numpy()
+    )
+    frame["update_ns"] = _nullable_ns(df["dUPDATE_TIME"])
+    frame["node_ns"] = _nullable_ns(df["dNODE_TIME"])
+    frame["proc_ns"] = _nullable_ns(df["dPROC_TIME"])
+    frame["work_hours"] = df["work_hours"].to_numpy(dtype=np.float64)
+    frame["is_rework"] = df["is_rework"].to_numpy(dtype=np.int8)
+    frame["is_finished"] = df["is_finished"].to_numpy(dtype=np.int8)
+    frame["rec_no"] = np.arange(len(df), dtype=np.int64)
+    return pd.DataFrame(frame)
+
+_RECORDS_DDL = """
+CREATE TABLE records (
+    arch INTEGER, batch INTEGER, flow INTEGER, user_id BIGINT,
+    update_ns BIGINT, node_ns BIGINT, proc_ns BIGINT, work_hours DOUBLE,
+    is_rework SMALLINT, is_finished SMALLINT, rec_no BIGINT
+)
+"""
+
+def _insert_frame(con, engine: str, table: str, frame: pd.DataFrame):
+    """"
+    DataFrame 写入已建好的表：DuckDB 直接扫描 DataFrame，SQLite 分批 executemany
+    """
+    if engine == "duckdb":
+        con.register("_frame", frame)
+        con.execute(f"INSERT INTO {table} SELECT * FROM _frame")
+        con.unregister("_frame")
+        return
+
+    placeholders = ", ".join("?" * frame.shape[1])
+    sql = f"INSERT INTO {table} VALUES ({placeholders})"
+    for start in range(0, len(frame), _SQLITE_BATCH_ROWS):
+        part = frame.iloc[start:start + _SQLITE_BATCH_ROWS].astype(object)
+        part = part.where(part.notna(), None)
+        con.executemany(sql, part.itertuples(index=False, name=None))
+
+
+class RecordsDatabase:
+    """"
+    一个数据集版本的记录库：首次打开时建库（写临时文件后原子替换），之后直接复用
+
+    入库内容：
+    - records：全部预处理记录（整数列，见 _records_frame）
+    - work_calendar：覆盖全部记录时间的工作日历（见 utils.work_calendar_table）
+    - archive_flows：完成记录按 案卷 × 工序 汇总的时间与返工情况（同 archive_index）
+    - completed_archives：完成四道工序的案卷
+    - rework_archives：有返工记录的案卷（含工序无法识别的返工记录）
+    """
+
+    def __init__(self, df: pd.DataFrame, engine: str = "auto", path: str | None = None,
+                 db_dir: str = "data/.sql", threads: int | None = None,
+                 memory_limit: str | None = None):
+        from aggregates import dataset_version
+        from calendars import require_fixed_calendar
+
+        # 工时在 SQL 中查 utils.work_calendar_table 计算
+        require_fixed_calendar("SQL")
+        self.engine = resolve_engine(engine)
+        self.dialect = _DIALECTS[self.engine]
+        self.version = dataset_version(df)
+        self.source = df.attrs.get("source_prefix")
+        self.path = (Path(path) if path
+                     else database_path_for(self.version, self.engine, db_dir, self.source))
+        # 只有按源命名的默认路径才清理同一个源的旧版本（见 _build）
+        self.stale_pattern = None
+        if not path and self.source:
+            self.stale_pattern = (f"records_{glob.escape(self.source)}_{'[0-9a-f]' * 16}"
+                                  f"{self.dialect['suffix']}")
+
+        # 取回结果时还原类别与人员编号的类型（与 pandas 路径的结果表一致）
+        self.categories = {
+            col: (df[col].cat.categories if isinstance(df[col].dtype, pd.CategoricalDtype)
+                  else pd.Index(sorted(df[col].dropna().unique())))
+            for col in _CODE_COLS
+        }
+        self.dtypes = {col: df[col].dtype for col in ["sARCH_ID", "工序", "iUSER_ID"]}
+
+        if self._stored_version() != self._meta_version():
+            self._build(df)
+        self.con = _connect(self.path, self.engine, read_only=True,
+                            threads=threads, memory_limit=memory_limit)
+
+    # ---------- 建库 ----------
+    def _meta_version(self) -> str:
+        return f"{self.version}:{SQL_SCHEMA_VERSION}"
+
+    def _stored_version(self):
+        """已有数据库文件记录的版本；不存在或无法读取时为 None"""
+        if not self.path.exists():
+            return None
+        try:
+            con = _connect(self.path, self.engine, read_only=True)
+            try:
+                row = con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            finally:
+                con.close()
+        except Exception:
+            return None
+        return row[0] if row else None
+
+    @profile_stage("sql_build_database")
+    def _build(self, df: pd.DataFrame):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+
+        con = _connect(tmp_path, self.engine)
+        try:
+            con.execute(_RECORDS_DDL)
+            _insert_frame(con, self.engine, "records", _records_frame(df, self.categories))
+
+            # 日历覆盖全部记录的领取 / 提交时间（批次区间的端点都在其中）
+            times = pd.concat([df["dUPDATE_TIME"], df["dNODE_TIME"]]).dropna()
+            first_day, last_day = 0, 0
+            if len(times):
+                days = np.asarray(times, dtype="datetime64[ns]").view(np.int64) // NS_PER_DAY
+                first_day, last_day = int(days.min()), int(days.max())
+            con.execute("CREATE TABLE work_calendar (day BIGINT, is_work SMALLINT, cum_ns BIGINT)")
+            _insert_frame(con, self.engine, "work_calendar", work_calendar_table(first_day, last_day))
+
+            for statement in self._derived_tables_sql():
+                con.execute(statement)
+
+            con.execute("CREATE TABLE meta (key TEXT, value TEXT)")
+            con.execute(f"INSERT INTO meta VALUES ('version', '{self._meta_version()}')")
+            if self.engine == "sqlite":
+                con.commit()
+        finally:
+            con.close()
+
+        os.replace(tmp_path, self.path)
+        # 同一个源、同一引擎的旧版本数据库不再使用；其他源的数据库保留
+        if self.stale_pattern is not None:
+            for old in self.path.parent.glob(self.stale_pattern):
+                if old != self.path:
+                    old.unlink(missing_ok=True)
+
+    def _derived_tables_sql(self) -> list:
+        flows = self._flow_list(FLOW_MAP.values())
+        statements = [f"""
+            CREATE TABLE archive_flows AS
+            SELECT arch, flow,
+                   MIN(update_ns) AS start_ns,
+                   MAX(node_ns) AS end_ns,
+                   SUM(is_rework) AS rework_rows,
+                   MIN(CASE WHEN is_rework = 1 THEN proc_ns END) AS rework_ns
+            FROM records
+            WHERE is_finished = 1 AND arch IS NOT NULL AND flow IN ({flows})
+            GROUP BY arch, flow
+        """, f"""
+            CREATE TABLE completed_archives AS
+            SELECT arch FROM archive_flows GROUP BY arch HAVING COUNT(*) = {len(FLOW_MAP)}
+        """, """
+            CREATE TABLE rework_archives AS
+            SELECT DISTINCT arch FROM records
+            WHERE is_finished = 1 AND is_rework = 1 AND arch IS NOT NULL
+        """]
+        if self.engine == "sqlite":
+            statements += [
+                "CREATE INDEX records_arch ON records (arch)",
+                "CREATE INDEX archive_flows_arch ON archive_flows (arch)",
+                "CREATE UNIQUE INDEX completed_archives_arch ON completed_archives (arch)",
+                "CREATE UNIQUE INDEX rework_archives_arch ON rework_archives (arch)",
+                "CREATE UNIQUE INDEX work_calendar_day ON work_calendar (day)",
+            ]
+        return statements
+
+    def close(self):
+        self.con.close()
+
+    # ---------- SQL 片段 ----------
+    def _flow_code(self, name: str) -> str:
+        """工序名 -> 编码字面量；数据中没有该工序时为 NULL（任何比较都不成立）"""
+        categories = self.categories["工序"]
+        return str(categories.get_loc(name)) if name in categories else "NULL"
+
+    def _flow_list(self, names) -> str:
+        return ", ".join(self._flow_code(name) for name in names)
+
+    def _work_ns_sql(self, st: str, ed: str, st_tod: str, ed_tod: str) -> str:
+        """"
+        区间 st ~ ed（纪元纳秒）的有效工作纳秒数，日历别名为 cs / ce
+
+        同 calc_work_hours_array：累计工作纳秒数之差；缺失或 st >= ed 时为 0
+        """
+        def intraday(tod):
+            return " + ".join(
+                f"CASE WHEN {tod} <= {a} THEN 0 WHEN {tod} >= {b} THEN {b - a} ELSE {tod} - {a} END"
+                for a, b in work_periods_ns()
+            )
+
+        def cum(alias, tod):
+            return f"({alias}.cum_ns + CASE WHEN {alias}.is_work = 1 THEN {intraday(tod)} ELSE 0 END)"
+
+        return (
+            f"CASE WHEN {st} IS NULL OR {ed} IS NULL OR {st} >= {ed} THEN 0 "
+            f"ELSE {cum('ce', ed_tod)} - {cum('cs', st_tod)} END"
+        )
+
+    def _counts_sql(self, keys: list) -> str:
+        """完成记录按 keys 统计完成案卷数，按 keys 排序"""
+        key_cols = ", ".join(keys)
+        present = " AND ".join(f"{key} IS NOT NULL" for key in keys)
+        return f"""
+            SELECT {key_cols}, COUNT(DISTINCT arch) AS n_archives
+            FROM records
+            WHERE is_finished = 1 AND {present}
+            GROUP BY {key_cols}
+            ORDER BY {key_cols}
+        """
+
+    def _batch_work_sql(self, keys: list) -> str:
+        """"
+        完成记录按 keys × 批次 的批次有效工作纳秒数，按 keys、批次排序（同 batch_time 的行顺序）
+        """
+        idiv = self.dialect["idiv"]
+        key_cols = ", ".join(keys)
+        present = " AND ".join(f"{key} IS NOT NULL" for key in keys)
+        tod = lambda t: f"((({t} % {NS_PER_DAY}) + {NS_PER_DAY}) % {NS_PER_DAY})"
+        return f"""
+            WITH batches AS (
+                SELECT {key_cols}, batch, MIN(update_ns) AS st, MAX(node_ns) AS ed
+                FROM records
+                WHERE is_finished = 1 AND {present} AND batch IS NOT NULL
+                GROUP BY {key_cols}, batch
+            ), bounds AS (
+                SELECT {key_cols}, batch, st, ed, {tod('st')} AS st_tod, {tod('ed')} AS ed_tod
+                FROM batches
+            )
+            SELECT {", ".join(f"b.{key}" for key in keys)},
+                   {self._work_ns_sql("b.st", "b.ed", "b.st_tod", "b.ed_tod")} AS work_ns
+            FROM bounds b
+            LEFT JOIN work_calendar cs ON cs.day = (b.st - b.st_tod) {idiv} {NS_PER_DAY}
+            LEFT JOIN work_calendar ce ON ce.day = (b.ed - b.ed_tod) {idiv} {NS_PER_DAY}
+            ORDER BY {", ".join(f"b.{key}" for key in keys)}, b.batch
+        """
+
+    def _hours_table(self, keys: list) -> tuple:
+        """"
+        按 keys 的完成案卷数与批次有效工时合计（无批次时为 NaN），返回 (各键列, 案卷数, 工时)
+
+        批次工时同 calc_work_hours_array（utils.work_ns_to_hours），合计按 batch_time 的行顺序
+        用 pandas 分组求和，与 pandas 路径的浮点结果逐位一致
+        """
+        *key_values, n_archives = self._fetch(self._counts_sql(keys))
+        *batch_keys, work_ns = self._fetch(self._batch_work_sql(keys))
+        as_frame = lambda columns: pd.DataFrame(
+            {key: np.asarray(values, dtype=np.int64) for key, values in zip(keys, columns)}
+        )
+        batches = as_frame(batch_keys).assign(hours=work_ns_to_hours(np.ma.filled(work_ns.astype(np.int64), 0)))
+        total = as_frame(key_values).join(batches.groupby(keys)["hours"].sum(), on=keys)["hours"]
+        return key_values, np.asarray(n_archives, dtype=np.int64), total.to_numpy(dtype=np.float64)
+
+    # ---------- 取回结果 ----------
+    def _fetch(self, sql: str) -> list:
+        """"
+        执行查询，返回按列的掩码数组（整数列为 int64、工时为 float64，NULL 处为掩码；
+        查询的各列须有不同的别名）
+
+        DuckDB 直接取列式结果；SQLite 逐行取回后再按列组装
+        """
+        cursor = self.con.execute(sql)
+        if self.engine == "duckdb":
+            return [np.ma.asarray(col) for col in cursor.fetchnumpy().values()]
+
+        rows = cursor.fetchall()
+        columns = []
+        for i in range(len(cursor.description)):
+            values = [row[i] for row in rows]
+            mask = np.array([v is None for v in values], dtype=bool)
+            dtype = np.float64 if any(isinstance(v, float) for v in values) else np.int64
+            data = np.array([0 if v is None else v for v in values], dtype=dtype)
+            columns.append(np.ma.masked_array(data, mask))
+        return columns
+
+    def _category(self, col: str, codes) -> pd.Series:
+        categorical = pd.Categorical.from_codes(
+            np.asarray(codes, dtype=np.int64), categories=self.categories[col]
+        )
+        return pd.Series(categorical).astype(self.dtypes[col])
+
+    def _users(self, values) -> pd.Series:
+        return pd.Series(np.asarray(values, dtype=np.int64)).astype(self.dtypes["iUSER_ID"])
+
+    @staticmethod
+    def _times(values) -> np.ndarray:
+        return np.ma.filled(values.astype(np.int64), _NAT).view("datetime64[ns]")
+
+    # ---------- 表 1 ~ 表 5 ----------
+    @profile_stage("task1_1_sql")
+    def task1_1(self) -> pd.DataFrame:
+        """表 1：完成四道工序的案卷 × 工序开始 / 结束时间 + 案卷完成时长"""
+        flows = sorted(FLOW_MAP.values())
+        starts = ", ".join(
+            f"MIN(CASE WHEN f.flow = {self._flow_code(flow)} THEN f.start_ns END) AS start_{i}"
+            for i, flow in enumerate(flows)
+        )
+        ends = ", ".join(
+            f"MAX(CASE WHEN f.flow = {self._flow_code(flow)} THEN f.end_ns END) AS end_{i}"
+            for i, flow in enumerate(flows)
+        )
+        columns = self._fetch(f"""
+            SELECT f.arch, {starts}, {ends}
+            FROM archive_flows f
+            JOIN completed_archives c ON c.arch = f.arch
+            GROUP BY f.arch
+            ORDER BY f.arch
+        """)
+
+        # 没有完成的案卷时，与 pandas 路径一样不输出工序时间列
+        if not len(columns[0]):
+            flows = []
+        table = {"sARCH_ID": self._category("sARCH_ID", columns[0])}
+        names = [f"{flow}_start_time" for flow in flows] + [f"{flow}_end_time" for flow in flows]
+        for name, values in zip(names, columns[1:]):
+            table[name] = self._times(values)
+        table = pd.DataFrame(table)
+
+        # 完成时长：按原记录顺序取回工时明细，求和顺序同 pandas 路径（见 archive_index.completion_hours）
+        arch, flow, hours = self._fetch(f"""
+            SELECT r.arch, r.flow, r.work_hours
+            FROM records r
+            JOIN completed_archives c ON c.arch = r.arch
+            WHERE r.is_finished = 1 AND r.flow IN ({self._flow_list(VALID_FLOWS)})
+            ORDER BY r.rec_no
+        """)
+        flow_names = self.categories["工序"][np.asarray(flow, dtype=np.int64)]
+        archive_hours = completion_hours(np.asarray(arch, dtype=np.int64), flow_names,
+                                         np.asarray(hours, dtype=np.float64), VALID_FLOWS)
+        archive_hours = archive_hours.reindex(np.asarray(columns[0], dtype=np.int64), fill_value=0.0)
+        table["完成时长"] = archive_hours.round(3).to_numpy()
+        return table
+
+    @profile_stage("task1_2_sql")
+    def task1_2(self):
+        """表 2：返工案卷 × 工序的返工时间，返回 (表 2, 返工案卷占比 %)"""
+        n_completed, n_rework = self.con.execute("""
+            SELECT (SELECT COUNT(*) FROM completed_archives),
+                   (SELECT COUNT(*) FROM completed_archives c JOIN rework_archives r ON r.arch = c.arch)
+        """).fetchone()
+        rework_ratio = round(n_rework / n_completed * 100, 3)
+
+        flows = sorted(FLOW_MAP.values())
+        cells = ", ".join(
+            f"MIN(CASE WHEN f.flow = {self._flow_code(flow)} THEN f.rework_ns END) AS rework_{i}, "
+            f"MAX(CASE WHEN f.flow = {self._flow_code(flow)} THEN 1 ELSE 0 END) AS present_{i}"
+            for i, flow in enumerate(flows)
+        )
+        columns = self._fetch(f"""
+            SELECT f.arch, {cells}
+            FROM archive_flows f
+            JOIN completed_archives c ON c.arch = f.arch
+            WHERE f.rework_rows > 0
+            GROUP BY f.arch
+            ORDER BY f.arch
+        """)
+
+        # 列为出现过返工的工序（按名称排序）
+        table = {"sARCH_ID": self._category("sARCH_ID", columns[0])}
+        kept = []
+        for i, flow in enumerate(flows):
+            times, present = columns[1 + 2 * i], columns[2 + 2 * i]
+            if present.any():
+                table[flow] = self._times(times)
+                kept.append(flow)
+        table = pd.DataFrame(table)
+        table.columns = pd.Index(["sARCH_ID", *kept], name="工序")
+        return table, rework_ratio
+
+    @profile_stage("task1_3_sql")
+    def task1_3(self) -> pd.DataFrame:
+        """表 3：自检全检工序各操作人员的返工案卷占比"""
+        user_id, total, rework = self._fetch(f"""
+            SELECT r.user_id,
+                   COUNT(DISTINCT r.arch) AS total_archives,
+                   COUNT(DISTINCT CASE WHEN r.is_rework = 1 THEN r.arch END) AS rework_archives
+            FROM records r
+            JOIN completed_archives c ON c.arch = r.arch
+            WHERE r.flow = {self._flow_code("自检全检")} AND r.user_id IS NOT NULL
+            GROUP BY r.user_id
+            ORDER BY r.user_id
+        """)
+        result = pd.DataFrame({
+            "iUSER_ID": self._users(user_id),
+            "total_archives": np.asarray(total, dtype=np.int64),
+            "rework_archives": np.asarray(rework, dtype=np.float64),
+        })
+        result["返工案卷占比 (%)"] = (
+            result["rework_archives"] / result["total_archives"] * 100
+        ).round(3)
+
+        # 与 pandas 路径相同的输入顺序 + 相同的排序调用，并列时顺序也一致
+        result_sorted = result.sort_values("返工案卷占比 (%)", ascending=False)
+        return result_sorted[["iUSER_ID", "返工案卷占比 (%)"]]
+
+    @profile_stage("task1_4_sql")
+    def task1_4(self) -> pd.DataFrame:
+        """表 4：各工序完成案卷数量、总耗时与平均耗时"""
+        (flow,), n_archives, hours = self._hours_table(["flow"])
+        result = pd.DataFrame({
+            "工序": self._category("工序", flow),
+            "完成案卷的数量": n_archives,
+            "总耗时 (h)": hours.round(3),
+        })
+        result["平均耗时 (h/卷)"] = (
+            result["总耗时 (h)"] / result["完成案卷的数量"]
+        ).round(3)
+        return result
+
+    @profile_stage("task1_5_sql")
+    def task1_5(self) -> pd.DataFrame:
+        """表 5：人员 × 工序的完成案卷数量、工作时长与平均耗时"""
+        (user_id, flow), n_archives, hours = self._hours_table(["user_id", "flow"])
+        result = pd.DataFrame({
+            "iUSER_ID": self._users(user_id),
+            "工序": self._category("工序", flow),
+            "完成案卷的数量": n_archives,
+            "工作时长 (h)": hours.round(3),
+        })
+        result["每个案卷的平均耗时 (h/卷)"] = (
+            result["工作时长 (h)"] / result["完成案卷的数量"]
+        ).round(3)
+        return result
+
+
+@profile_stage("task1_sql")
+def calc_task1_tables_sql(df: pd.DataFrame, engine: str = "auto", path: str | None = None,
+                          threads: int | None = None, memory_limit: str | None = None):
+    """"
+    用 SQL 引擎计算表 1 ~ 表 5，返回值同 calc_task1_tables：({文件名: 结果表}, 返工案卷占比 %)
+    """
+    db = RecordsDatabase(df, engine=engine, path=path, threads=threads, memory_limit=memory_limit)
+    try:
+        table2, rework_ratio = db.task1_2()
+        tables = {
+            "result1_1.xlsx": db.task1_1(),
+            "result1_2.xlsx": table2,
+            "result1_3.xlsx": db.task1_3(),
+            "result1_4.xlsx": db.task1_4(),
+            "result1_5.xlsx": db.task1_5(),
+        }
+    finally:
+        db.close()
+    return tables, rework_ratio
@@ -0,0 +1,154 @@
+# src/synthetic.py
+"""
+合成流转日志：与原始导出数据同一结构，用于基准测试与大数据量验证。
+
+用法：
+    python src/synthetic.py 1000000 data/synthetic_1m.csv
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from utils import FLOW_MAP
+
+
+# 生成逻辑变更时递增（基准测试按此区分已生成的数据文件）
+GENERATOR_VERSION = 1
+
+# Excel 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1_048_576
+
+COLUMNS = [
+    "sARCH_ID", "iFLOW_NODE_NO", "iNODE_STATUS", "iUSER_ID", "sBatch_number",
+    "dUPDATE_TIME", "dNODE_TIME", "dPROC_TIME",
+]
+
+
+def _archive_layout(n_archives: int, rng, complete_rate: float, rework_rate: float):
+    """"
+    每个案卷的工序记录：返回 (案卷序号, 工序编号, 是否为返工前的那次提交)
+    """
+    n_flows = len(FLOW_MAP)
+
+    # 大部分案卷走完四道工序，其余停在前 1 ~ 3 道
+    flows_per_archive = np.where(
+        rng.random(n_archives) < complete_rate,
+        n_flows,
+        rng.integers(1, n_flows, n_archives),
+    )
+    archive = np.repeat(np.arange(n_archives), flows_per_archive)
+    first_row = np.repeat(np.cumsum(flows_per_archive) - flows_per_archive, flows_per_archive)
+    flow = np.arange(len(archive)) - first_row + 1
+
+    # 返工：该工序先提交一次（状态 5），再重新处理一次
+    passes = np.where(rng.random(len(archive)) < rework_rate, 2, 1)
+    archive, flow = np.repeat(archive, passes), np.repeat(flow, passes)
+    pass_start = np.repeat(np.cumsum(passes) - passes, passes)
+    reworked = (np.arange(len(archive)) == pass_start) & (np.repeat(passes, passes) == 2)
+    return archive, flow, reworked
+
+def generate_workflow_log(n_rows: int, seed: int = 0, rework_rate: float = 0.15,
+                          complete_rate: float = 0.8, batch_size: int = 10,
+                          n_users: int = 40, start: str = "2020-07-06 08:00",
+                          days: int = 60) -> pd.DataFrame:
+    """"
+    生成 n_rows 条流转记录（列与原始导出数据一致）
+
+    - iFLOW_NODE_NO 1 ~ 4 依次流转，complete_rate 的案卷走完四道工序
+    - 每道工序以 rework_rate 的概率返工：先有一条状态 5 的记录，再有一条重新处理的记录
+    - 其余记录的状态为 2（完成）或 1（处理中），约 1% 的提交时间缺失
+    - 批次大小在 batch_size 的 0.5 ~ 1.5 倍之间，案卷的首道工序在 days 天内随机开始
+    """
+    rng = np.random.default_rng(seed)
+
+    # 按平均每卷记录数估算案卷数，不够时放大重来
+    rows_per_archive = (complete_rate * 4 + (1 - complete_rate) * 2) * (1 + rework_rate)
+    n_archives = int(n_rows / rows_per_archive * 1.05) + 16
+    while True:
+        archive, flow, reworked = _archive_layout(n_archives, rng, complete_rate, rework_rate)
+        if len(archive) >= n_rows:
+            break
+        n_archives *= 2
+    n_archives = int(archive[n_rows - 1]) + 1
+    archive, flow, reworked = archive[:n_rows], flow[:n_rows], reworked[:n_rows]
+
+    # ---------- 时间：每个案卷的记录依次衔接（间隔 0 ~ 10 小时，处理 5 分钟 ~ 15 小时） ----------
+    gap = rng.integers(0, 600 * 60, n_rows)
+    duration = rng.integers(5 * 60, 900 * 60, n_rows)
+    elapsed = np.cumsum(gap + duration)
+    archive_first = np.flatnonzero(np.r_[True, archive[1:] != archive[:-1]])
+    before = np.r_[0, elapsed[archive_first[1:] - 1]]
+    counts = np.diff(np.r_[archive_first, n_rows])
+    elapsed = elapsed - np.repeat(before, counts)
+
+    archive_start = (
+        pd.Timestamp(start).value // 10**9
+        + rng.integers(0, days * 86400, n_archives)
+    )
+    update_s = archive_start[archive] + elapsed - duration
+    node_s = update_s + duration
+
+    to_time = lambda seconds: pd.to_datetime(seconds, unit="s")
+    node_time = to_time(node_s).to_numpy()
+    node_time[rng.random(n_rows) < 0.01] = np.datetime64("NaT")
+
+    # ---------- 状态 / 人员 / 批次 ----------
+    status = np.where(reworked, 5, np.where(rng.random(n_rows) < 0.75, 2, 1))
+    users = 101 + rng.integers(0, n_users, n_rows)
+
+    sizes = rng.integers(max(1, batch_size // 2), batch_size * 3 // 2 + 1, n_archives)
+    batch_of_archive = np.repeat(np.arange(n_archives), sizes)[:n_archives]
+    n_batches = int(batch_of_archive[-1]) + 1
+
+    return pd.DataFrame({
+        "sARCH_ID": pd.Categorical.from_codes(archive, [f"A{i:08d}" for i in range(n_archives)]),
+        "iFLOW_NODE_NO": flow.astype(np.int64),
+        "iNODE_STATUS": status.astype(np.int64),
+        "iUSER_ID": users.astype(np.int64),
+        "sBatch_number": pd.Categorical.from_codes(
+            batch_of_archive[archive], [f"B{i:06d}" for i in range(n_batches)]
+        ),
+        "dUPDATE_TIME": to_time(update_s),
+        "dNODE_TIME": node_time,
+        "dPROC_TIME": to_time(node_s + 5 * 60),
+    }, columns=COLUMNS)
+
+def write_workflow_log(df: pd.DataFrame, path: str) -> Path:
+    """"
+    写出合成日志（.csv 或 .xlsx）；超过 Excel 行数上限时报错，请改用 .csv
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    if path.suffix.lower() == ".csv":
+        df.to_csv(tmp_path, index=False)
+    else:
+        if len(df) + 1 > EXCEL_MAX_ROWS:
+            raise ValueError(
+                f"{len(df)} 行超过 Excel 工作表上限 {EXCEL_MAX_ROWS - 1} 行，请输出为 .csv"
+            )
+        with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+
+    tmp_path.replace(path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成流转日志")
+    parser.add_argument("rows", type=int, help="记录条数")
+    parser.add_argument("output", help="输出文件（.csv / .xlsx）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--rework-rate", type=float, default=0.15, help="每道工序的返工概率")
+    parser.add_argument("--batch-size", type=int, default=10, help="平均每批案卷数")
+    parser.add_argument("--users", type=int, default=40, help="操作人员数")
+    args = parser.parse_args()
+
+    df = generate_workflow_log(
+        args.rows, seed=args.seed, rework_rate=args.rework_rate,
+        batch_size=args.batch_size, n_users=args.users,
+    )
+    print(f"已生成 {len(df)} 行: {write_workflow_log(df, args.output)}")
@@ -0,0 +1,42 @@
+import sys
+import os
+import tempfile
+import importlib.util
+
+import pandas as pd
+
+# 添加父目录到路径，这样可以导入 aggregates
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from aggregates import clear_aggregates, configure_aggregates, get_aggregate
+
+spec = importlib.util.spec_from_file_location(
+    "preprocess",
+    os.path.join(os.path.dirname(__file__), '..', '01_preprocess.py')
+)
+preprocess_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(preprocess_module)
+
+df = preprocess_module._preprocess_frame(generate_workflow_log(5_000, seed=7))
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # 只保留 1 个条目：取第二个聚合时第一个被淘汰并落盘，再次取时从磁盘读回
+    configure_aggregates(max_entries=1, spill_dir=tmp_dir)
+    try:
+        expected = {name: get_aggregate(df, name).copy() for name in ["archive_index", "batch_time"]}
+        clear_aggregates()
+        ok = True
+        for name, frame in expected.items():
+            get_aggregate(df, "finished")
+            try:
+                pd.testing.assert_frame_equal(get_aggregate(df, name), frame)
+            except AssertionError as e:
+                ok = False
+                print(name, e)
+    finally:
+        configure_aggregates(max_entries=32)
+        clear_aggregates()
+    if ok and expected["archive_index"].index.name == "sARCH_ID":
+        print("落盘后读回（含索引）", "✔")
+    else:
+        print("落盘后读回（含索引）", "❌")
@@ -0,0 +1,64 @@
+import sys
+import os
+import tempfile
+import importlib.util
+
+# 添加父目录到路径，这样可以导入 archive_store
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from archive_store import ingest, load_records
+
+def load_script(file_name):
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), '..', file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+preprocess_module = load_script("01_preprocess.py")
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    data_path = os.path.join(tmp_dir, "data.csv")
+    store_dir = os.path.join(tmp_dir, "store")
+    generate_workflow_log(20_000, seed=1).to_csv(data_path, index=False)
+    df = preprocess_module.preprocess_data(data_path, use_cache=False)
+
+    # 重复导入同一源文件不会产生重复记录
+    ingest(data_path, store_dir, use_cache=False)
+    ingest(data_path, store_dir, use_cache=False)
+    loaded = load_records(store_dir)
+    if len(loaded) == len(df):
+        print("全部记录", "✔")
+    else:
+        print("全部记录", "❌")
+
+    # 日期范围只读到范围内的记录（不含未提交的记录）
+    days = df["finish_date"].dropna().sort_values().unique()
+    start_date, end_date = days[len(days) // 3], days[len(days) // 2]
+    window = load_records(store_dir, start_date, end_date, columns=["sARCH_ID", "finish_date"])
+    expected = df["finish_date"].between(start_date, end_date).sum()
+    if len(window) == expected and list(window.columns) == ["sARCH_ID", "finish_date"]:
+        print("日期范围", "✔")
+    else:
+        print("日期范围", "❌")
+
+    # 文件名前缀相同的另一个源文件（data_2020.csv）与另一目录下的同名导出互不删除对方的记录
+    other_path = os.path.join(tmp_dir, "data_2020.csv")
+    generate_workflow_log(5_000, seed=2).to_csv(other_path, index=False)
+    os.makedirs(os.path.join(tmp_dir, "copy"))
+    copy_path = os.path.join(tmp_dir, "copy", "data.csv")
+    generate_workflow_log(3_000, seed=3).to_csv(copy_path, index=False)
+    ingest(other_path, store_dir, use_cache=False)
+    ingest(copy_path, store_dir, use_cache=False)
+    generate_workflow_log(4_000, seed=4).to_csv(data_path, index=False)
+    stats = ingest(data_path, store_dir, use_cache=False)
+    expected = sum(
+        len(preprocess_module.preprocess_data(path, use_cache=False))
+        for path in (data_path, other_path, copy_path)
+    )
+    if len(load_records(store_dir)) == expected and stats["removed"] > 0:
+        print("多个源文件", "✔")
+    else:
+        print("多个源文件", "❌")
@@ -35,3 +35,29 @@ if res == 0:
 else:
     print("❌")
 # 应为 0
+
+# 情况 4：向量化版本与逐条计算一致
+from utils import calc_work_hours_array
+
+starts = [
+    datetime(2020, 7, 14, 10, 0),
+    datetime(2020, 7, 14, 17, 0),
+    datetime(2020, 7, 12, 10, 0),
+    datetime(2020, 7, 10, 11, 15),   # 周五 ~ 下周二，跨周日
+    datetime(2020, 7, 14, 15, 0),    # 开始晚于结束
+    None,                            # 缺失值
+]
+ends = [
+    datetime(2020, 7, 14, 15, 0),
+    datetime(2020, 7, 15, 9, 0),
+    datetime(2020, 7, 12, 16, 0),
+    datetime(2020, 7, 14, 12, 30),
+    datetime(2020, 7, 14, 10, 0),
+    datetime(2020, 7, 14, 10, 0),
+]
+res = calc_work_hours_array(starts, ends)
+expected = [calc_work_hours(s, e) for s, e in zip(starts, ends)]
+if list(res) == expected:
+    print(list(res), "✔")
+else:
+    print("❌")
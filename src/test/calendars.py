@@ -0,0 +1,78 @@
+import sys
+import os
+import json
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加父目录到路径，这样可以导入 calendars
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from calendars import ShiftCalendar, configure_calendar, normalize_config
+from utils import calc_work_hours_array
+
+rng = np.random.default_rng(0)
+base = pd.Timestamp("2020-07-01").value
+st = pd.to_datetime(base + rng.integers(0, 200 * 86400, 20_000) * 10**9)
+ed = st + pd.to_timedelta(rng.integers(0, 10 * 86400, 20_000), unit="s")
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # 没有任何配置时与 utils.py 的固定日历逐位一致
+    calendar = ShiftCalendar(normalize_config({}), tmp_dir)
+    if np.array_equal(calendar.work_hours(st, ed), calc_work_hours_array(st, ed)):
+        print("默认日历", "✔")
+    else:
+        print("默认日历", "❌")
+
+    config = {
+        "shifts": {
+            "standard": {"periods": [["08:30", "12:00"], ["13:00", "18:00"]]},
+            "overtime": {"periods": [["08:30", "12:00"], ["13:00", "18:00"], ["19:00", "21:30"]]},
+        },
+        "holidays": ["2020-10-01~2020-10-03"],
+        "workdays": ["2020-10-11"],  # 周日调休上班
+        "operators": {
+            "101": "overtime",
+            "102": [{"shift": "overtime", "start": "2020-10-05"}, {"off": ["2020-10-06"]}],
+        },
+    }
+    calendar = ShiftCalendar(normalize_config(config), tmp_dir)
+    week_st = pd.to_datetime(["2020-09-28"] * 3 + ["2020-10-05"] * 3)
+    week_ed = pd.to_datetime(["2020-10-12"] * 3 + ["2020-10-08"] * 3)
+    hours = calendar.work_hours(week_st, week_ed, [None, 101, 102.0, None, 101, 102])
+    # 9/28 ~ 10/11：12 个周一 ~ 周六，去掉 3 天节假日、加 1 天调休，共 10 天；
+    # 102 自 10/5 起加班（10/6 休息）：3 天标准班次 + 6 天加班班次
+    expected = [10 * 8.5, 10 * 11.0, 3 * 8.5 + 6 * 11.0, 3 * 8.5, 3 * 11.0, 2 * 11.0]
+    if np.allclose(hours, expected):
+        print("节假日 / 调休 / 人员班次", "✔")
+    else:
+        print("节假日 / 调休 / 人员班次", "❌", hours.tolist())
+
+    # 同一配置的第二个实例直接内存映射读取落盘的索引
+    again = ShiftCalendar(normalize_config(config), tmp_dir)
+    again_hours = again.work_hours(week_st, week_ed, [None, 101, 102, None, 101, 102])
+    if isinstance(again.cum_ns, np.memmap) and np.array_equal(again_hours, hours):
+        print("落盘索引", "✔")
+    else:
+        print("落盘索引", "❌")
+
+    # 配置生效后 calc_work_hours_array 按人员的排班计算
+    config_path = os.path.join(tmp_dir, "calendar.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    configure_calendar(config_path, tmp_dir)
+    try:
+        active_hours = calc_work_hours_array(week_st, week_ed, operators=[None, 101, 102, None, 101, 102])
+    finally:
+        configure_calendar(None)
+    if np.array_equal(active_hours, hours) and np.array_equal(calc_work_hours_array(st, ed),
+                                                              ShiftCalendar(normalize_config({}), None).work_hours(st, ed)):
+        print("configure_calendar", "✔")
+    else:
+        print("configure_calendar", "❌")
+
+    try:
+        normalize_config({"shifts": {"night": {"periods": [["22:00", "06:00"]]}}})
+        print("配置校验", "❌")
+    except ValueError:
+        print("配置校验", "✔")
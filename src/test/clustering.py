@@ -0,0 +1,45 @@
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加父目录到路径，这样可以导入 clustering
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from clustering import MINIBATCH_THRESHOLD, ClusterModel, best_k, select_k
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+rng = np.random.default_rng(0)
+columns = ["a", "b", "c"]
+
+# 样本较少时与任务 3.2 原来的 StandardScaler + KMeans 一致
+small = pd.DataFrame(rng.normal(size=(200, 3)), columns=columns)
+expected = KMeans(n_clusters=3, random_state=42).fit_predict(StandardScaler().fit_transform(small))
+if np.array_equal(ClusterModel.fit(small, columns, 3).labels, expected):
+    print("KMeans 模式", "✔")
+else:
+    print("KMeans 模式", "❌")
+
+# 三个分离的簇，样本数超过阈值时走 MiniBatchKMeans；选 k 的结果与进程数无关
+centers = np.array([[0, 0, 0], [8, 0, 0], [0, 8, 8]])
+n = MINIBATCH_THRESHOLD * 2
+large = pd.DataFrame(centers[rng.integers(0, 3, n)] + rng.normal(size=(n, 3)), columns=columns)
+X = StandardScaler().fit_transform(large)
+serial = select_k(X, range(2, 6), sample_size=2_000, jobs=1)
+parallel = select_k(X, range(2, 6), sample_size=2_000, jobs=2)
+if serial.equals(parallel) and best_k(serial) == 3:
+    print("并行选 k", "✔")
+else:
+    print("并行选 k", "❌", serial.to_dict(orient="list"))
+
+# 落盘后按最近中心分配，与拟合时的结果一致
+model = ClusterModel.fit(large, columns, 3)
+with tempfile.TemporaryDirectory() as tmp_dir:
+    loaded = ClusterModel.load(model.save(tmp_dir))
+    if np.array_equal(loaded.assign(large), model.labels) and np.allclose(
+            loaded.centers()[columns].sort_values("a").to_numpy()[:, 0], [0, 0, 8], atol=0.2):
+        print("模型落盘与分配", "✔")
+    else:
+        print("模型落盘与分配", "❌")
@@ -0,0 +1,60 @@
+import sys
+import os
+import tempfile
+import importlib.util
+
+# 添加父目录到路径，这样可以导入 cube
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from cube import ArchiveCube
+
+def load_script(file_name):
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), '..', file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+preprocess_module = load_script("01_preprocess.py")
+
+df = preprocess_module._preprocess_frame(generate_workflow_log(20_000, seed=1))
+df_finished = df[df["is_finished"]]
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    cube = ArchiveCube.load(ArchiveCube.build(df).save(os.path.join(tmp_dir, "cube")))
+
+# 各种上卷的去重案卷数与 groupby(...).nunique() 一致
+for by in [["finish_date", "工序"], ["iUSER_ID", "工序"], ["iUSER_ID"], ["工序"]]:
+    for where in [None, "is_rework"]:
+        records = df_finished if where is None else df_finished[df_finished[where]]
+        expected = records.groupby(by, observed=True)["sARCH_ID"].nunique().reset_index(name="n")
+        result = cube.finished().agg(by, where=where, n=("sARCH_ID", "nunique"))
+        if result.equals(expected):
+            print(by, where, "✔")
+        else:
+            print(by, where, "❌")
+
+# 新版本的立方体落盘后，同一个源的旧版本立方体目录被删除，其他源与来源不明的立方体保留
+from pathlib import Path
+from cube import cube_path_for, open_cube
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    Path(tmp_dir, "cube_notes").mkdir()
+    old, new, other, unknown = df.copy(), df.copy(), df.copy(), df.copy()
+    old.attrs.update(dataset_version="0123456789abcdef", source_prefix="a_11111111")
+    new.attrs.update(dataset_version="fedcba9876543210", source_prefix="a_11111111")
+    other.attrs.update(dataset_version="00000000000000ff", source_prefix="b_22222222")
+    unknown.attrs.update(dataset_version="1111111111111111")
+    open_cube(other, tmp_dir)
+    open_cube(unknown, tmp_dir)
+    open_cube(old, tmp_dir)
+    open_cube(new, tmp_dir)
+    kept = sorted(p.name for p in Path(tmp_dir).iterdir())
+    expected = ["cube_1111111111111111", "cube_a_11111111_fedcba9876543210",
+                "cube_b_22222222_00000000000000ff", "cube_notes"]
+    if kept == expected and open_cube(new, tmp_dir).version == new.attrs["dataset_version"]:
+        print("清理旧版本立方体", "✔")
+    else:
+        print("清理旧版本立方体", "❌", kept)
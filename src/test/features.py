@@ -0,0 +1,71 @@
+import sys
+import os
+import importlib.util
+
+import numpy as np
+
+# 添加父目录到路径，这样可以导入 features
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from aggregates import processing_records
+from features import FLOW_FEATURES, HOUR_FEATURES, feature_matrix, operator_features
+
+spec = importlib.util.spec_from_file_location(
+    "preprocess",
+    os.path.join(os.path.dirname(__file__), '..', '01_preprocess.py')
+)
+preprocess_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(preprocess_module)
+
+df = preprocess_module._preprocess_frame(generate_workflow_log(50_000, seed=11, n_users=300))
+df_valid = processing_records(df[df["is_finished"]])
+
+# 与逐人员 groupby + lambda 的写法逐位一致
+def long_task_ratio(x):
+    return (x > x.quantile(0.9)).mean()
+
+expected = (
+    df_valid
+    .groupby("iUSER_ID")["processing_hours"]
+    .agg(
+        avg_time="mean",
+        median_time="median",
+        p90_time=lambda x: x.quantile(0.9),
+        long_ratio=long_task_ratio,
+        case_count="count"
+    )
+    .reset_index()
+)
+features = operator_features(df_valid)
+if features.equals(expected):
+    print("基础特征", "✔")
+else:
+    print("基础特征", "❌")
+
+# 扩展特征：工序构成与时段分布各自合计为 1，返工率与逐人员计算一致
+extended = operator_features(df_valid, extended=True)
+rework_rate = df_valid.groupby("iUSER_ID")["is_rework"].mean().to_numpy()
+if np.allclose(extended[FLOW_FEATURES].sum(axis=1), 1) \
+        and np.allclose(extended[HOUR_FEATURES].sum(axis=1), 1) \
+        and np.allclose(extended["rework_rate"], rework_rate):
+    print("扩展特征", "✔")
+else:
+    print("扩展特征", "❌")
+
+X = feature_matrix(extended, sparse=True)
+if X.shape == (len(extended), 6 + len(FLOW_FEATURES) + len(HOUR_FEATURES)) \
+        and np.array_equal(X.toarray(), feature_matrix(extended)):
+    print("特征矩阵", "✔")
+else:
+    print("特征矩阵", "❌")
+
+# 人员编号缺失的记录不参与（同 groupby），按人员或「人员 × 工序」结果与去掉这些记录后一致
+with_nan = df_valid.astype({"iUSER_ID": "float64"})
+with_nan.loc[with_nan.index[::10], "iUSER_ID"] = np.nan
+known = with_nan.dropna(subset=["iUSER_ID"])
+if operator_features(with_nan, extended=True).equals(operator_features(known, extended=True)) \
+        and operator_features(with_nan, keys=["iUSER_ID", "工序"]).equals(
+            operator_features(known, keys=["iUSER_ID", "工序"])):
+    print("人员编号缺失", "✔")
+else:
+    print("人员编号缺失", "❌")
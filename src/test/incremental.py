@@ -0,0 +1,65 @@
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加父目录到路径，这样可以导入 incremental
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from incremental import load_state, preprocess_module, task1_module, update_state
+
+log = generate_workflow_log(20_000, seed=11)
+day = pd.to_datetime(log["dUPDATE_TIME"]).dt.normalize()
+cut1, cut2 = day.quantile(0.5), day.quantile(0.6)
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    state_dir = os.path.join(tmp_dir, "state")
+    paths = []
+    # 第二个导出与第一个重叠（重复 cut1 ~ cut2 之间的记录），第三个只有最后一天
+    last = day.max()
+    parts = [log[day < cut2], log[(day >= cut1) & (day < last)], log[day >= last]]
+    for i, part in enumerate(parts):
+        paths.append(os.path.join(tmp_dir, f"export_{i}.csv"))
+        part.to_csv(paths[-1], index=False)
+
+    update_state(paths[:1], state_dir, chunk_size=3_000)
+    stats = update_state(paths[1:2], state_dir, chunk_size=3_000)
+    state, _ = load_state(state_dir)
+    incremental_tables, incremental_ratio = task1_module.calc_task1_tables_from_state(state)
+
+    # 与一次性预处理这些记录的结果一致（重叠的记录只计一次）
+    df = preprocess_module._preprocess_frame(log[day < last].copy())
+    expected_tables, expected_ratio = task1_module.calc_task1_tables(df)
+    ok = stats["duplicates"] == ((day >= cut1) & (day < cut2)).sum() and incremental_ratio == expected_ratio
+    for name, table in expected_tables.items():
+        try:
+            pd.testing.assert_frame_equal(
+                incremental_tables[name].reset_index(drop=True), table.reset_index(drop=True),
+                check_dtype=False, check_categorical=False,
+            )
+        except AssertionError as e:
+            ok = False
+            print(name, e)
+    if ok:
+        print("重叠导出按记录去重", "✔")
+    else:
+        print("重叠导出按记录去重", "❌", stats)
+
+    # 只有一天的新导出只改写涉及的分区，其余分区文件不动
+    folder = os.path.join(state_dir, "arch_flow")
+    mtimes = {f: os.stat(os.path.join(folder, f)).st_mtime_ns for f in os.listdir(folder)}
+    stats = update_state(paths[2:], state_dir, chunk_size=3_000)
+    touched = [f for f in mtimes if os.stat(os.path.join(folder, f)).st_mtime_ns != mtimes[f]]
+    n_archives = log.loc[day >= last, "sARCH_ID"].nunique()
+    state, _ = load_state(state_dir)
+    full_state = task1_module.task1_partial_state(
+        preprocess_module._preprocess_frame(log.copy(), compact=False),
+        specs={"arch_flow": task1_module.TASK1_PARTIAL_SPECS["arch_flow"]},
+    )
+    if (stats["rows"] == (day >= last).sum() and 0 < len(touched) <= n_archives < len(mtimes)
+            and len(state["arch_flow"]) == len(full_state["arch_flow"])):
+        print("只更新涉及的分区", "✔")
+    else:
+        print("只更新涉及的分区", "❌", stats, len(touched), n_archives, len(mtimes))
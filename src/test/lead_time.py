@@ -0,0 +1,67 @@
+import sys
+import os
+import importlib.util
+
+# 添加父目录到路径，这样可以导入 lead_time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from archive_index import build_archive_index
+from lead_time import FLOW_ORDER, stage_waits, wait_distribution, bottleneck_summary
+from utils import calc_work_hours
+
+spec = importlib.util.spec_from_file_location(
+    "preprocess",
+    os.path.join(os.path.dirname(__file__), '..', '01_preprocess.py')
+)
+preprocess_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(preprocess_module)
+
+df = preprocess_module._preprocess_frame(generate_workflow_log(5_000, seed=3))
+df_finished = df[df["is_finished"]]
+waits = stage_waits(build_archive_index(df_finished))
+
+# 逐案卷按流程顺序两两比较，结果应与错位一行的向量化版本一致
+expected = []
+for arch, group in df_finished.groupby("sARCH_ID", observed=True):
+    spans = group.groupby("工序", observed=True).agg(start=("dUPDATE_TIME", "min"), end=("dNODE_TIME", "max"))
+    flows = [flow for flow in FLOW_ORDER if flow in spans.index]
+    for a, b in zip(flows[:-1], flows[1:]):
+        expected.append((arch, a, b, spans.at[a, "end"], spans.at[b, "start"]))
+
+if len(waits) == len(expected):
+    print("衔接数量", "✔")
+else:
+    print("衔接数量", "❌", len(waits), len(expected))
+
+mismatch = 0
+for row, (arch, a, b, end, start) in zip(waits.itertuples(index=False), expected):
+    raw = round((start - end).total_seconds() / 3600, 6)
+    work = calc_work_hours(end, start)
+    if (row.sARCH_ID, row.from_flow, row.to_flow) != (arch, a, b) \
+            or abs(row.wait_hours - raw) > 1e-6 or abs(row.wait_work_hours - work) > 1e-6:
+        mismatch += 1
+print("等待时长", "✔" if mismatch == 0 else f"❌ {mismatch} 处不一致")
+
+# 分布表的案卷数合计等于衔接总数；每天恰有一个瓶颈工序
+distribution = wait_distribution(waits)
+daily, by_flow = bottleneck_summary(waits)
+if distribution["案卷数"].sum() == len(waits):
+    print("等待分布", "✔")
+else:
+    print("等待分布", "❌")
+if (daily.groupby("日期")["是否瓶颈"].sum() == 1).all() \
+        and by_flow["瓶颈天数"].sum() == daily["日期"].nunique():
+    print("瓶颈汇总", "✔")
+else:
+    print("瓶颈汇总", "❌")
+
+# 提交 / 领取时间缺失的衔接：等待时长为 NaN，不作为 0 计入瓶颈汇总
+missing = waits["from_end"].isna() | waits["to_start"].isna()
+daily_total = daily["有效等待合计 (h)"].sum()
+if missing.any() and waits.loc[missing, ["wait_hours", "wait_work_hours"]].isna().all().all() \
+        and daily["等待案卷数"].sum() == (~missing).sum() \
+        and abs(daily_total - waits["wait_work_hours"].sum()) < 1e-3 * len(daily) \
+        and distribution["时间缺失案卷数"].sum() == missing.sum():
+    print("时间缺失", "✔")
+else:
+    print("时间缺失", "❌", missing.sum())
@@ -0,0 +1,69 @@
+import sys
+import os
+import importlib.util
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# 添加父目录到路径，这样可以导入 occupancy
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from occupancy import operator_occupancy
+from utils import calc_work_hours
+
+spec = importlib.util.spec_from_file_location(
+    "preprocess",
+    os.path.join(os.path.dirname(__file__), '..', '01_preprocess.py')
+)
+preprocess_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(preprocess_module)
+
+df = preprocess_module._preprocess_frame(generate_workflow_log(3_000, seed=7, n_users=6))
+df_finished = df[df["is_finished"]]
+occupancy = operator_occupancy(df_finished)
+
+# 逐人员在自然时间上合并区间，再按天计算有效工作时长，结果应与工作时间轴上的扫描线一致
+expected = {}
+valid = df_finished.dropna(subset=["dUPDATE_TIME", "dNODE_TIME"])
+valid = valid[valid["dUPDATE_TIME"] < valid["dNODE_TIME"]]
+for user, group in valid.groupby("iUSER_ID"):
+    merged = []
+    for st, ed in sorted(zip(group["dUPDATE_TIME"], group["dNODE_TIME"])):
+        if merged and st <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], ed)
+        else:
+            merged.append([st, ed])
+    for st, ed in merged:
+        day = st.normalize()
+        while day < ed:
+            hours = calc_work_hours(max(st, day), min(ed, day + timedelta(days=1)))
+            if hours > 0:
+                key = (user, day)
+                expected[key] = expected.get(key, 0.0) + hours
+            day += timedelta(days=1)
+
+result = dict(zip(zip(occupancy["iUSER_ID"], occupancy["date"]), occupancy["占用工时 (h)"]))
+mismatch = [key for key in expected if abs(result.get(key, 0.0) - expected[key]) > 1e-5]
+if len(result) == len(expected) and not mismatch:
+    print("占用工时", "✔")
+else:
+    print("占用工时", "❌", len(result), len(expected), mismatch[:3])
+
+# 占用工时不超过记录工时，平均并发不超过峰值并发
+if (occupancy["占用工时 (h)"] <= occupancy["记录工时 (h)"] + 1e-6).all() \
+        and (occupancy["平均并发"] <= occupancy["峰值并发"] + 1e-6).all():
+    print("并发", "✔")
+else:
+    print("并发", "❌")
+
+# 人员编号缺失的记录不参与统计（同 groupby），其余人员的结果不变
+with_nan = df_finished.astype({"iUSER_ID": "float64"})
+with_nan.loc[with_nan.index[::10], "iUSER_ID"] = np.nan
+expected_nan = operator_occupancy(with_nan.dropna(subset=["iUSER_ID"]))
+if operator_occupancy(with_nan).equals(expected_nan) \
+        and operator_occupancy(with_nan, keys=("iUSER_ID", "工序")).equals(
+            operator_occupancy(with_nan.dropna(subset=["iUSER_ID"]), keys=("iUSER_ID", "工序"))):
+    print("人员编号缺失", "✔")
+else:
+    print("人员编号缺失", "❌")
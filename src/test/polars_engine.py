@@ -0,0 +1,57 @@
+import sys
+import os
+import tempfile
+import importlib.util
+
+# 添加父目录到路径，这样可以导入 polars_engine
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from aggregates import get_aggregate
+from polars_engine import has_polars, compute
+
+def load_script(file_name):
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), '..', file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+preprocess_module = load_script("01_preprocess.py")
+task1_module = load_script("02_task1_statistics.py")
+
+if not has_polars():
+    print("polars 未安装，跳过")
+    sys.exit(0)
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # 合成数据（含返工、缺失提交时间）写成 .csv，两条路径各自从源文件读取
+    data_path = os.path.join(tmp_dir, "data.csv")
+    generate_workflow_log(20_000, seed=1).to_csv(data_path, index=False)
+
+    df = preprocess_module.preprocess_data(data_path, use_cache=False)
+    expected, expected_ratio = task1_module.calc_task1_tables(df)
+    results = compute(data_path)
+
+# 表 1 ~ 表 5 与 pandas 逐行一致（含列类型、返工案卷占比）
+for file_name, table in results["tables"].items():
+    if table.equals(expected[file_name]) and results["rework_ratio"] == expected_ratio:
+        print(file_name, "✔")
+    else:
+        print(file_name, "❌")
+
+# 任务 2.2 的批次时间表与 pandas 一致
+if results["batch_time"].equals(get_aggregate(df, "batch_time")):
+    print("batch_time ✔")
+else:
+    print("batch_time ❌")
+
+# 目录 / 通配符（多个源文件）不支持，直接报错而不是读取失败
+with tempfile.TemporaryDirectory() as tmp_dir:
+    for source in [tmp_dir, os.path.join(tmp_dir, "*.csv")]:
+        try:
+            compute(source)
+            print("拒绝多个源文件", source, "❌")
+        except ValueError:
+            print("拒绝多个源文件", "✔")
@@ -0,0 +1,51 @@
+import sys
+import os
+import tempfile
+import importlib.util
+from pathlib import Path
+
+# 添加父目录到路径，这样可以导入 synthetic
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from cache import has_parquet
+
+def load_script(file_name):
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), '..', file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+preprocess_module = load_script("01_preprocess.py")
+
+if not has_parquet():
+    print("pyarrow 未安装，跳过")
+    sys.exit(0)
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # 文件名前缀相同的源文件、不同目录下的同名源文件、同名不同扩展名的源文件，共用一个缓存目录
+    raw = generate_workflow_log(2_000, seed=1)
+    cache_dir = os.path.join(tmp_dir, "cache")
+    paths = [os.path.join(tmp_dir, "a", "data.csv"),
+             os.path.join(tmp_dir, "a", "data_2020.csv"),
+             os.path.join(tmp_dir, "b", "data.csv"),
+             os.path.join(tmp_dir, "a", "data.xlsx")]
+    for i, path in enumerate(paths):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith(".xlsx"):
+            raw.iloc[i * 500:].to_excel(path, index=False)
+        else:
+            raw.iloc[i * 500:].to_csv(path, index=False)
+        preprocess_module.preprocess_data(path, cache_dir=cache_dir)
+
+    # 其中一个源文件更新后，只替换它自己的旧缓存
+    raw.iloc[:1_500].to_csv(paths[0], index=False)
+    preprocess_module.preprocess_data(paths[0], cache_dir=cache_dir)
+
+    expected = {preprocess_module.cache_path_for(path, cache_dir) for path in paths}
+    if set(Path(cache_dir).glob("*.parquet")) == expected:
+        print("缓存互不覆盖", "✔")
+    else:
+        print("缓存互不覆盖", "❌", sorted(p.name for p in Path(cache_dir).glob("*.parquet")))
@@ -0,0 +1,46 @@
+import sys
+import os
+import tempfile
+
+# 添加父目录到路径，这样可以导入 result_writer
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import pandas as pd
+import result_writer
+from result_writer import write_result
+from synthetic import generate_workflow_log
+
+table = generate_workflow_log(2_000, seed=1).astype({"sARCH_ID": object, "sBatch_number": object})
+for col in ["dUPDATE_TIME", "dNODE_TIME", "dPROC_TIME"]:
+    table[col] = pd.to_datetime(table[col])
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # 各格式写出后读回与原表一致
+    for fmt in result_writer.FORMATS:
+        path = write_result(table, os.path.join(tmp_dir, "result.xlsx"), fmt=fmt)
+        if fmt == "xlsx":
+            back = pd.read_excel(path)
+        elif fmt == "parquet":
+            back = pd.read_parquet(path)
+        else:
+            back = pd.read_csv(path, parse_dates=["dUPDATE_TIME", "dNODE_TIME", "dPROC_TIME"])
+        try:
+            pd.testing.assert_frame_equal(back, table, check_dtype=False)
+            print(fmt, "✔")
+        except AssertionError:
+            print(fmt, "❌")
+
+    # 超过行数上限时拆分到多个工作表（这里把上限临时调小）
+    result_writer.EXCEL_MAX_ROWS = 801
+    path = write_result({"records": table}, os.path.join(tmp_dir, "split.xlsx"))
+    sheets = pd.read_excel(path, sheet_name=None)
+    back = pd.concat(sheets.values(), ignore_index=True)
+    if list(sheets) == ["records", "records_2", "records_3"] and len(back) == len(table):
+        print("split", "✔")
+    else:
+        print("split", "❌")
+
+    try:
+        write_result(table, os.path.join(tmp_dir, "error.xlsx"), oversize="error")
+        print("error", "❌")
+    except ValueError:
+        print("error", "✔")
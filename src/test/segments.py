@@ -0,0 +1,47 @@
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加父目录到路径，这样可以导入 segments
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from segments import SortedSegments
+
+rng = np.random.default_rng(0)
+n = 5000
+df = pd.DataFrame({
+    "工序": pd.Categorical(rng.choice(["扫描", "图像处理", None], n)),
+    "iUSER_ID": rng.integers(100, 110, n),
+    "sARCH_ID": rng.choice(["A1", "A2", "A3", None], n).astype(object),
+    "dNODE_TIME": pd.to_datetime(rng.integers(0, 10**6, n), unit="s"),
+    "work_hours": rng.random(n),
+    "is_rework": rng.random(n) < 0.2,
+})
+df.loc[rng.random(n) < 0.1, "dNODE_TIME"] = pd.NaT
+
+segments = SortedSegments(df, ["工序", "iUSER_ID", "sARCH_ID"])
+aggs = dict(
+    first_time=("dNODE_TIME", "min"),
+    last_time=("dNODE_TIME", "max"),
+    hours=("work_hours", "sum"),
+    records=("dNODE_TIME", "count"),
+    archives=("sARCH_ID", "nunique"),
+)
+
+# 情况 1 ~ 3：各键前缀的分组结果与 groupby 一致（含缺失键、NaT）
+for by in (["工序"], ["工序", "iUSER_ID"], ["工序", "iUSER_ID", "sARCH_ID"]):
+    expected = df.groupby(by, observed=True).agg(**aggs).reset_index()
+    res = segments.agg(by, **aggs)
+    if res.equals(expected):
+        print(by, "✔")
+    else:
+        print(by, "❌")
+
+# 情况 4：where 只统计返工记录，等同于先筛选再分组
+expected = df[df["is_rework"]].groupby("工序", observed=True).agg(**aggs).reset_index()
+res = segments.agg("工序", where="is_rework", **aggs)
+if res.equals(expected):
+    print("where", "✔")
+else:
+    print("where", "❌")
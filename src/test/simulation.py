@@ -0,0 +1,67 @@
+import sys
+import os
+import json
+import tempfile
+import importlib.util
+
+import numpy as np
+
+# 添加父目录到路径，这样可以导入 simulation
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from calendars import configure_calendar, workday_hours
+from simulation import STAGES, LineModel, simulate, simulate_once
+
+spec = importlib.util.spec_from_file_location(
+    "preprocess",
+    os.path.join(os.path.dirname(__file__), '..', '01_preprocess.py')
+)
+preprocess_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(preprocess_module)
+
+# 固定服务时长、无返工的单人工序：利用率 ≈ 到达速率 × 服务时长，吞吐量 ≈ 到达数
+servers = {stage: [(np.array([0.5]), 0.0)] for stage in STAGES}
+runs = [simulate_once(servers, arrival_rate=1.0, days=50, seed=seed) for seed in range(20)]
+utilization = np.mean([run["扫描_利用率"] for run in runs])
+throughput = np.mean([run["吞吐量"] for run in runs])
+if abs(utilization - 0.5) < 0.02 and abs(throughput - workday_hours()) < 0.3:
+    print("单人工序", "✔")
+else:
+    print("单人工序", "❌", utilization, throughput)
+
+# 返工概率 p 时每卷平均处理 1 / (1 - p) 次
+servers = {stage: [(np.array([0.2]), 0.5)] for stage in STAGES}
+runs = [simulate_once(servers, arrival_rate=1.0, days=50, seed=seed) for seed in range(20)]
+utilization = np.mean([run["扫描_利用率"] for run in runs])
+if abs(utilization - 0.4) < 0.03:
+    print("返工", "✔")
+else:
+    print("返工", "❌", utilization)
+
+# 标定 + 并行重复：结果与进程数无关
+df = preprocess_module._preprocess_frame(generate_workflow_log(5_000, seed=5))
+model = LineModel.calibrate(df)
+serial = simulate(model, staff={"扫描": 8}, days=5, replications=8, warmup_days=1, jobs=1)
+parallel = simulate(model, staff={"扫描": 8}, days=5, replications=8, warmup_days=1, jobs=2)
+if serial.equals(parallel) and len(serial) == 8:
+    print("并行重复", "✔")
+else:
+    print("并行重复", "❌")
+
+# 配置排班日历后，一个仿真工作日为 default 班次的有效工作时长
+with tempfile.TemporaryDirectory() as tmp_dir:
+    config_path = os.path.join(tmp_dir, "calendar.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump({"shifts": {"default": {"periods": [["08:00", "12:00"]]}}}, f)
+    configure_calendar(config_path, tmp_dir)
+    try:
+        servers = {stage: [(np.array([0.5]), 0.0)] for stage in STAGES}
+        runs = [simulate_once(servers, arrival_rate=1.0, days=50, seed=seed) for seed in range(20)]
+        throughput = np.mean([run["吞吐量"] for run in runs])
+        day_hours = workday_hours()
+    finally:
+        configure_calendar(None)
+if day_hours == 4.0 and abs(throughput - 4.0) < 0.3:
+    print("排班日历的工作日时长", "✔")
+else:
+    print("排班日历的工作日时长", "❌", day_hours, throughput)
@@ -0,0 +1,38 @@
+import sys
+import os
+import tempfile
+import importlib.util
+
+# 添加父目录到路径，这样可以导入 synthetic
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+
+def load_script(file_name):
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), '..', file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+preprocess_module = load_script("01_preprocess.py")
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    # 同一份数据拆成相邻两段有重叠的导出文件
+    raw = generate_workflow_log(20_000, seed=1)
+    raw.iloc[:12_000].to_csv(os.path.join(tmp_dir, "2020-07-a.csv"), index=False)
+    raw.iloc[10_000:].to_csv(os.path.join(tmp_dir, "2020-07-b.csv"), index=False)
+    raw.to_csv(os.path.join(tmp_dir, "all.csv"), index=False)
+
+    expected = preprocess_module.preprocess_data(os.path.join(tmp_dir, "all.csv"), use_cache=False)
+    columns = list(expected.columns)
+    expected = expected.sort_values(columns, ignore_index=True)
+
+    for data_path in [os.path.join(tmp_dir, "2020-07-*.csv"), tmp_dir]:
+        # 目录中还有 all.csv，去重后结果不变
+        df = preprocess_module.preprocess_data(data_path, use_cache=False, jobs=2)
+        if df.sort_values(columns, ignore_index=True).equals(expected):
+            print(os.path.basename(data_path), "✔")
+        else:
+            print(os.path.basename(data_path), "❌")
@@ -0,0 +1,87 @@
+import sys
+import os
+import tempfile
+import importlib.util
+
+# 添加父目录到路径，这样可以导入 sql_backend
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import generate_workflow_log
+from sql_backend import ENGINES, has_duckdb, calc_task1_tables_sql
+
+def load_script(file_name):
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(file_name)[0],
+        os.path.join(os.path.dirname(__file__), '..', file_name)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+preprocess_module = load_script("01_preprocess.py")
+task1_module = load_script("02_task1_statistics.py")
+
+# 合成数据（含返工、缺失提交时间）经同样的预处理
+df = preprocess_module._preprocess_frame(generate_workflow_log(20_000, seed=1))
+expected, expected_ratio = task1_module.calc_task1_tables(df)
+
+# 各 SQL 引擎的表 1 ~ 表 5 与 pandas 逐行一致（含列类型、返工案卷占比）
+with tempfile.TemporaryDirectory() as tmp_dir:
+    for engine in ENGINES:
+        if engine == "duckdb" and not has_duckdb():
+            print(engine, "未安装，跳过")
+            continue
+        tables, ratio = calc_task1_tables_sql(df, engine=engine, path=os.path.join(tmp_dir, engine))
+        for file_name, table in tables.items():
+            if table.equals(expected[file_name]) and ratio == expected_ratio:
+                print(engine, file_name, "✔")
+            else:
+                print(engine, file_name, "❌")
+
+# 流水线中最后一个 task1_x_sql 节点执行完后，数据库连接随 sql_records 节点释放而关闭
+import sqlite3
+import pipeline
+
+opened = []
+build = pipeline.NODES["sql_records"]["func"]
+pipeline.NODES["sql_records"]["func"] = lambda *args: opened.append(build(*args)) or opened[-1]
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp_dir:
+    os.chdir(tmp_dir)
+    try:
+        context = {"df": df, "engine": "sqlite"}
+        pipeline._execute(pipeline.resolve_order(["task1_4_sql", "task1_5_sql"]), context,
+                          ["task1_4_sql", "task1_5_sql"], verbose=False)
+    finally:
+        os.chdir(cwd)
+        pipeline.NODES["sql_records"]["func"] = build
+    try:
+        opened[0].con.execute("SELECT 1")
+        print("流水线关闭数据库连接", "❌")
+    except sqlite3.ProgrammingError:
+        print("流水线关闭数据库连接", "✔")
+
+# 新版本数据库建好后，同一个源的旧版本被删除，其他源与来源不明的数据库保留
+from pathlib import Path
+from sql_backend import RecordsDatabase
+
+small = preprocess_module._preprocess_frame(generate_workflow_log(2_000, seed=2))
+with tempfile.TemporaryDirectory() as tmp_dir:
+    Path(tmp_dir, "notes.sqlite").touch()
+    frames = {}
+    for name, version, source in [("other", "00000000000000ff", "b_22222222"),
+                                  ("unknown", "1111111111111111", None),
+                                  ("old", "0123456789abcdef", "a_11111111"),
+                                  ("new", "fedcba9876543210", "a_11111111")]:
+        frames[name] = small.copy()
+        frames[name].attrs["dataset_version"] = version
+        if source:
+            frames[name].attrs["source_prefix"] = source
+        RecordsDatabase(frames[name], engine="sqlite", db_dir=tmp_dir).close()
+    kept = sorted(p.name for p in Path(tmp_dir).iterdir())
+    expected_files = ["notes.sqlite", "records_1111111111111111.sqlite",
+                      "records_a_11111111_fedcba9876543210.sqlite",
+                      "records_b_22222222_00000000000000ff.sqlite"]
+    if kept == expected_files:
+        print("清理旧版本数据库", "✔")
+    else:
+        print("清理旧版本数据库", "❌", kept)
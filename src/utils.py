@@ -1,18 +1,53 @@
 # src/utils.py
+import inspect
+import numpy as np
 import pandas as pd
 from datetime import datetime, time, timedelta
 
 
+# 工序编号 -> 中文名称
+FLOW_MAP = {
+    1: "扫描",
+    2: "图像处理",
+    3: "自检全检",
+    4: "PDF处理"
+}
+
 # 工作时间定义
 WORK_START_MORNING = time(8, 30)
 WORK_END_MORNING = time(12, 0)
 WORK_START_AFTERNOON = time(13, 0)
 WORK_END_AFTERNOON = time(18, 0)
 
+# 一天内的工作时段（按先后顺序）
+WORK_PERIODS = [
+    (WORK_START_MORNING, WORK_END_MORNING),
+    (WORK_START_AFTERNOON, WORK_END_AFTERNOON),
+]
+
+NS_PER_SECOND = 10 ** 9
+NS_PER_DAY = 86400 * NS_PER_SECOND
+
 def is_workday(dt: datetime) -> bool:
     """是否为周一 ~ 周六"""
     return dt.weekday() < 6
 
+def calendar_params() -> dict:
+    """"
+    工作日历相关的全部参数，用于缓存失效判断（配置了排班日历时包含其配置的哈希）
+    """
+    from calendars import active_calendar
+
+    params = {
+        "work_periods": [(a.isoformat(), b.isoformat()) for a, b in WORK_PERIODS],
+        "is_workday": inspect.getsource(is_workday),
+        "workday_mask": inspect.getsource(_workday_mask),
+    }
+    calendar = active_calendar()
+    if calendar is not None:
+        params["shift_calendar"] = calendar.digest
+    return params
+
 def _calc_overlap(st1, ed1, st2, ed2):
     """"
     计算两个时间区间重叠的秒数
@@ -63,3 +98,147 @@ def calc_work_hours(st: datetime, ed: datetime) -> float:
         cur_date += timedelta(days=1)
 
     return round(total_seconds / 3600, 6)
+
+
+# ======================
+# 向量化版本：累计工作时间轴
+# ======================
+def _time_to_ns(t: time) -> int:
+    """当天 00:00 起算的纳秒数"""
+    seconds = t.hour * 3600 + t.minute * 60 + t.second
+    return seconds * NS_PER_SECOND + t.microsecond * 1000
+
+
+# 工作时段（当天纳秒偏移），以及一个工作日的总工作纳秒数
+_PERIODS_NS = [(_time_to_ns(a), _time_to_ns(b)) for a, b in WORK_PERIODS]
+_WORKDAY_NS = sum(b - a for a, b in _PERIODS_NS)
+
+# 已构建的时间轴：覆盖 [first_day, first_day + len(is_work))，单位为“纪元日”
+_timeline = {
+    "first_day": 0,
+    "is_work": np.zeros(0, dtype=bool),
+    "cum_ns": np.zeros(1, dtype=np.int64),
+}
+
+def _workday_mask(days: np.ndarray) -> np.ndarray:
+    """
+    纪元日 -> 是否工作日（与 is_workday 一致：周一 ~ 周六）
+    1970-01-01 为周四（weekday = 3）
+    """
+    return (days + 3) % 7 < 6
+
+def _ensure_timeline(first_day: int, last_day: int) -> dict:
+    """
+    确保时间轴覆盖 [first_day, last_day]，不足时重建
+    cum_ns[i] = first_day 起到第 i 天 00:00 为止累计的工作纳秒数
+    """
+    tl = _timeline
+    cur_first = tl["first_day"]
+    cur_last = cur_first + len(tl["is_work"]) - 1
+    if len(tl["is_work"]) and cur_first <= first_day and last_day <= cur_last:
+        return tl
+
+    if len(tl["is_work"]):
+        first_day = min(first_day, cur_first)
+        last_day = max(last_day, cur_last)
+
+    days = np.arange(first_day, last_day + 1, dtype=np.int64)
+    is_work = _workday_mask(days)
+    day_ns = np.where(is_work, _WORKDAY_NS, 0).astype(np.int64)
+
+    tl["first_day"] = first_day
+    tl["is_work"] = is_work
+    tl["cum_ns"] = np.concatenate([[0], np.cumsum(day_ns)]).astype(np.int64)
+    return tl
+
+def _intraday_work_ns(tod_ns: np.ndarray) -> np.ndarray:
+    """当天 00:00 到 tod 之间的工作纳秒数（不考虑是否工作日）"""
+    total = np.zeros(tod_ns.shape, dtype=np.int64)
+    for p_start, p_end in _PERIODS_NS:
+        total += np.clip(tod_ns - p_start, 0, p_end - p_start)
+    return total
+
+def _to_epoch_ns(values) -> np.ndarray:
+    """任意日期时间序列 -> datetime64[ns] 数组"""
+    return np.asarray(pd.to_datetime(values), dtype="datetime64[ns]").ravel()
+
+def calc_work_hours_array(st, ed, operators=None) -> np.ndarray:
+    """"
+    calc_work_hours 的向量化版本：整列计算 start ~ end 之间的有效工作时长（单位：h）
+
+    借助“纪元起累计工作纳秒数”时间轴，每个区间只需两次查表 + 一次相减，
+    结果与逐行调用 calc_work_hours 一致（缺失值或 start >= end 时为 0）
+
+    operators: 可选，各行的人员编号；配置了排班日历（calendars.configure_calendar）时
+               按各人员的班次计算，否则忽略
+    """
+    from calendars import active_calendar
+
+    calendar = active_calendar()
+    if calendar is not None:
+        return calendar.work_hours(st, ed, operators)
+
+    st = _to_epoch_ns(st)
+    ed = _to_epoch_ns(ed)
+    if st.shape != ed.shape:
+        raise ValueError("st 与 ed 长度不一致")
+
+    valid = ~(np.isnat(st) | np.isnat(ed))
+    st_ns = st.view(np.int64)
+    ed_ns = ed.view(np.int64)
+    valid &= st_ns < ed_ns
+
+    hours = np.zeros(st.shape, dtype=np.float64)
+    if not valid.any():
+        return hours
+
+    st_ns = st_ns[valid]
+    ed_ns = ed_ns[valid]
+    st_day = st_ns // NS_PER_DAY
+    ed_day = ed_ns // NS_PER_DAY
+
+    tl = _ensure_timeline(int(st_day.min()), int(ed_day.max()))
+
+    def cum_work_ns(t_ns, day):
+        idx = day - tl["first_day"]
+        intraday = _intraday_work_ns(t_ns - day * NS_PER_DAY)
+        return tl["cum_ns"][idx] + np.where(tl["is_work"][idx], intraday, 0)
+
+    work_ns = cum_work_ns(ed_ns, ed_day) - cum_work_ns(st_ns, st_day)
+    hours[valid] = work_ns_to_hours(work_ns)
+    return hours
+
+def work_ns_to_hours(work_ns) -> np.ndarray:
+    """工作纳秒数 -> 小时，保留 6 位小数"""
+    return np.round(np.asarray(work_ns) / NS_PER_SECOND / 3600, 6)
+
+def hours_to_micro(hours) -> np.ndarray:
+    """"
+    工时（小时，保留 6 位小数）-> 微小时整数
+
+    工时合计按整数求和再除以 1e6：结果与求和顺序无关，分块 / 上卷后再相加也不会有浮点误差
+    """
+    return np.rint(np.asarray(hours, dtype=np.float64) * 1e6).astype(np.int64)
+
+def work_periods_ns() -> list:
+    """一天内各工作时段 [(开始, 结束), ...]，单位为当天 00:00 起算的纳秒"""
+    return list(_PERIODS_NS)
+
+def work_calendar_table(first_day: int, last_day: int) -> pd.DataFrame:
+    """"
+    [first_day, last_day]（纪元日）的工作日历表，每天一行：
+    - day:     纪元日（1970-01-01 为 0）
+    - is_work: 是否工作日（1 / 0）
+    - cum_ns:  时间轴起点到当天 00:00 累计的工作纳秒数（与 calc_work_hours_array 同一时间轴）
+
+    供 SQL 引擎查表计算有效工作时长：任意时刻的累计工作纳秒数 =
+    当天 cum_ns + （工作日时）当天 00:00 到该时刻落在 work_periods_ns 内的纳秒数
+    """
+    tl = _ensure_timeline(first_day, last_day)
+    start = first_day - tl["first_day"]
+    stop = last_day - tl["first_day"] + 1
+    return pd.DataFrame({
+        "day": np.arange(first_day, last_day + 1, dtype=np.int64),
+        "is_work": tl["is_work"][start:stop].astype(np.int8),
+        "cum_ns": tl["cum_ns"][start:stop],
+    })